@@ -1,7 +1,33 @@
-from application.common.console_io import clear_scr
-from application.main import App
+from __future__ import annotations
 
-app: App = App()
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from application.common.console_io import clear_scr
+    from application.main import App
+
+    app: App
 
 __version__: str = "0.1.0"
 __all__: list[str] = ["app", "clear_scr"]
+
+
+# The Flask app (and its database) is only built when first asked for, so
+# lightweight subpackages such as the collector can be imported on hosts
+# that never run the server. Nothing is imported eagerly either, so the
+# gevent entry point can patch the standard library first
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    if name == "clear_scr":
+        from application.common.console_io import clear_scr  # noqa: PLC0415
+
+        globals()["clear_scr"] = clear_scr
+        return clear_scr
+
+    if name == "app":
+        from application.main import App  # noqa: PLC0415
+
+        globals()["app"] = instance = App()
+        return instance
+
+    err_msg: str = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(err_msg)
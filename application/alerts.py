@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import json
+import operator
+import queue
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Final
+
+import requests
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+    from logging import Logger
+    from pathlib import Path
+
+    from application.common._types import JSON
+    from application.ingest import MetricRow, SnapshotRow
+    from application.storage import StorageBackend
+
+    type RuleKey = tuple[str | None, str]
+
+OPERATORS: Final[dict[str, Callable[[float, float], bool]]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+RULE_KINDS: Final[tuple[str, ...]] = ("threshold", "rate")
+ANY_ORIGIN: Final[str] = "*"
+
+
+# "threshold" compares each value; "rate" compares the change per second
+# across the last `window` seconds of values. Either fires once `count`
+# consecutive snapshots breach, and resolves on the first one that does not
+@dataclass(frozen=True, slots=True)
+class Rule:
+    name: str
+    metric: str
+    origin: str | None
+    kind: str
+    op: str
+    threshold: float
+    count: int = 1
+    window: float = 0.0
+    compare: Callable[[float, float], bool] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "compare", OPERATORS[self.op])
+
+    @staticmethod
+    def from_config(cfg: dict[str, Any]) -> Rule:
+        name: str = cfg.get("name") or f"{cfg.get('metric')} {cfg.get('op')}"
+        kind: str = cfg.get("kind", "threshold")
+        err_msg: str
+
+        if not cfg.get("metric"):
+            err_msg = f"Alert rule {name!r} has no metric"
+            raise ValueError(err_msg)
+        if kind not in RULE_KINDS:
+            err_msg = f"Alert rule {name!r} has unknown kind {kind!r}"
+            raise ValueError(err_msg)
+        if cfg.get("op") not in OPERATORS:
+            err_msg = f"Alert rule {name!r} has unknown operator {cfg.get('op')!r}"
+            raise ValueError(err_msg)
+        if kind == "rate" and not cfg.get("window"):
+            err_msg = f"Alert rule {name!r} needs a window (seconds)"
+            raise ValueError(err_msg)
+
+        origin: str | None = cfg.get("origin", ANY_ORIGIN)
+        return Rule(
+            name=name,
+            metric=cfg["metric"],
+            origin=None if origin == ANY_ORIGIN else origin,
+            kind=kind,
+            op=cfg["op"],
+            threshold=float(cfg["threshold"]),
+            count=max(int(cfg.get("for", 1)), 1),
+            window=float(cfg.get("window", 0.0)),
+        )
+
+
+# Per rule and origin: consecutive breaches, and (rate rules) the values in
+# the window as (epoch seconds, value), bounded so a flood of snapshots
+# with close timestamps cannot grow it without limit
+@dataclass(slots=True)
+class RuleState:
+    breaches: int = 0
+    samples: deque[tuple[float, float]] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Alert:
+    rule: Rule
+    origin: str
+    value: float
+    since: dt
+
+    def to_json(self) -> JSON:
+        return {
+            "rule": self.rule.name,
+            "origin": self.origin,
+            "metric": self.rule.metric,
+            "kind": self.rule.kind,
+            "condition": f"{self.rule.op} {self.rule.threshold:g}",
+            "value": self.value,
+            "since": self.since.isoformat(),
+        }
+
+
+class WebhookSink:
+    DEFAULT_QUEUE_SIZE: Final[int] = 1000
+    DEFAULT_TIMEOUT: Final[float] = 5.0
+
+    url: str
+    logger: Logger
+    timeout: float
+    queue_size: int
+    dropped: int
+
+    def __init__(self, url: str, logger: Logger, cfg: dict[str, Any]) -> None:
+        self.url = url
+        self.logger = logger
+        self.timeout = cfg.get("timeout", WebhookSink.DEFAULT_TIMEOUT)
+        self.queue_size = cfg.get("queue_size", WebhookSink.DEFAULT_QUEUE_SIZE)
+        self.dropped = 0
+        self._queue: queue.Queue[JSON | None] = queue.Queue(self.queue_size)
+        self._thread: threading.Thread | None = None
+
+    # Also called after fork, as the sender thread does not survive it
+    def start(self) -> None:
+        self._queue = queue.Queue(self.queue_size)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="alert-webhook",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def close(self, timeout: float | None = None) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    # Never blocks the ingest path; events beyond the queue are dropped
+    def send(self, event: JSON) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        session: requests.Session = requests.Session()
+
+        while (event := self._queue.get()) is not None:
+            try:
+                session.post(self.url, json=event, timeout=self.timeout)
+            except requests.RequestException as e:  # noqa: PERF203
+                self.logger.warning("Alert webhook failed: %s", e)
+
+
+# Evaluated by an ingest listener, in the writing thread. Rules are indexed
+# by (origin, metric name), with (None, name) for rules on any origin, so a
+# metric costs two lookups plus the rules that match it. State is kept in
+# memory, so only one process may evaluate: under several workers that is
+# the parent, fed by an AlertFeed, and the workers follow() what it
+# publishes
+class AlertEngine:
+    DEFAULT_MAX_SAMPLES: Final[int] = 1024
+    RECENT_EVENTS: Final[int] = 100
+
+    rules: tuple[Rule, ...]
+    logger: Logger
+    sink: WebhookSink | None
+    max_samples: int
+
+    def __init__(
+        self,
+        rules: list[Rule],
+        logger: Logger,
+        *,
+        sink: WebhookSink | None = None,
+        max_samples: int | None = None,
+    ) -> None:
+        self.rules = tuple(rules)
+        self.logger = logger
+        self.sink = sink
+        self.max_samples = (
+            AlertEngine.DEFAULT_MAX_SAMPLES if max_samples is None else max_samples
+        )
+
+        names: set[str] = set()
+        for rule in self.rules:
+            if rule.name in names:
+                err_msg: str = f"Duplicate alert rule name {rule.name!r}"
+                raise ValueError(err_msg)
+            names.add(rule.name)
+
+        index: dict[RuleKey, list[Rule]] = {}
+        for rule in self.rules:
+            index.setdefault((rule.origin, rule.metric), []).append(rule)
+        self._index: dict[RuleKey, tuple[Rule, ...]] = {
+            key: tuple(rules) for key, rules in index.items()
+        }
+
+        self._states: dict[tuple[str, str], RuleState] = {}
+        self._active: dict[tuple[str, str], Alert] = {}
+        self._recent: deque[JSON] = deque(maxlen=AlertEngine.RECENT_EVENTS)
+        self._lock: threading.Lock = threading.Lock()
+        self._published: Path | None = None
+
+    @staticmethod
+    def from_config(cfg: dict[str, Any], logger: Logger) -> AlertEngine:
+        webhook: dict[str, Any] = cfg.get("webhook") or {}
+        sink: WebhookSink | None = None
+        if webhook.get("url"):
+            sink = WebhookSink(webhook["url"], logger, webhook)
+
+        return AlertEngine(
+            [Rule.from_config(rule) for rule in cfg.get("rules", [])],
+            logger,
+            sink=sink,
+            max_samples=cfg.get("max_samples"),
+        )
+
+    # Stops evaluating here; alerts are read from what the evaluating
+    # process publishes to `path` instead
+    def follow(self, path: Path) -> None:
+        self._published = path
+
+    def evaluate(self, rows: list[SnapshotRow]) -> None:
+        if not self._index or self._published is not None:
+            return
+
+        with self._lock:
+            for row in rows:
+                for metric in row.metrics:
+                    for key in ((row.origin, metric.name), (None, metric.name)):
+                        for rule in self._index.get(key, ()):
+                            self._check(rule, row, metric)
+
+    def _check(self, rule: Rule, row: SnapshotRow, metric: MetricRow) -> None:
+        key: tuple[str, str] = (rule.name, row.origin)
+        state: RuleState | None = self._states.get(key)
+        if state is None:
+            state = self._states[key] = RuleState()
+
+        value: float | None = (
+            metric.value
+            if rule.kind == "threshold"
+            else self._rate(rule, row, metric, state)
+        )
+        if value is None:
+            return
+
+        if not rule.compare(value, rule.threshold):
+            state.breaches = 0
+            alert: Alert | None = self._active.pop(key, None)
+            if alert is not None:
+                self._emit("resolved", alert, value, row.timestamp)
+            return
+
+        state.breaches += 1
+        if state.breaches >= rule.count and key not in self._active:
+            self._active[key] = Alert(rule, row.origin, value, row.timestamp)
+            self._emit("firing", self._active[key], value, row.timestamp)
+
+    def _rate(
+        self,
+        rule: Rule,
+        row: SnapshotRow,
+        metric: MetricRow,
+        state: RuleState,
+    ) -> float | None:
+        if state.samples is None:
+            state.samples = deque(maxlen=self.max_samples)
+
+        samples: deque[tuple[float, float]] = state.samples
+        at: float = row.timestamp.timestamp()
+        samples.append((at, metric.value))
+        while samples[0][0] < at - rule.window:
+            samples.popleft()
+
+        first_at, first = samples[0]
+        if at <= first_at:
+            return None
+        return (metric.value - first) / (at - first_at)
+
+    def _emit(self, status: str, alert: Alert, value: float, at: dt) -> None:
+        event: JSON = {
+            "status": status,
+            **alert.to_json(),
+            "value": value,
+            "at": at.isoformat(),
+        }
+        self._recent.append(event)
+
+        log: Callable[..., None] = (
+            self.logger.warning if status == "firing" else self.logger.info
+        )
+        log("Alert %s: %s on %s (%s)", status, alert.rule.name, alert.origin, value)
+
+        if self.sink is not None:
+            self.sink.send(event)
+
+    def active(self) -> list[JSON]:
+        with self._lock:
+            alerts: list[Alert] = list(self._active.values())
+        return [a.to_json() for a in sorted(alerts, key=lambda a: a.since)]
+
+    def recent(self) -> list[JSON]:
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def to_json(self) -> JSON:
+        if self._published is not None:
+            try:
+                return json.loads(self._published.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return {
+                    "generated": None,
+                    "rules": len(self.rules),
+                    "active": [],
+                    "recent": [],
+                }
+
+        return {
+            "generated": utc_now().isoformat(),
+            "rules": len(self.rules),
+            "active": self.active(),
+            "recent": self.recent(),
+        }
+
+
+# Feeds the evaluating process every snapshot committed by any process,
+# tailing the database by id, and publishes its alerts to `path` (replaced
+# whole, so readers never see a partial file) after polls that found rows
+class AlertFeed:
+    DEFAULT_INTERVAL: Final[float] = 1.0
+    DEFAULT_BATCH_SIZE: Final[int] = 500
+
+    engine: AlertEngine
+    storage: StorageBackend
+    logger: Logger
+    path: Path
+    interval: float
+    batch_size: int
+
+    def __init__(
+        self,
+        engine: AlertEngine,
+        storage: StorageBackend,
+        logger: Logger,
+        path: Path,
+        cfg: dict[str, Any],
+    ) -> None:
+        self.engine = engine
+        self.storage = storage
+        self.logger = logger
+        self.path = path
+        self.interval = cfg.get("interval", AlertFeed.DEFAULT_INTERVAL)
+        self.batch_size = cfg.get("batch_size", AlertFeed.DEFAULT_BATCH_SIZE)
+        self._after: int = 0
+        self._until: int = 0
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run,
+            name="alert-feed",
+            daemon=True,
+        )
+
+    # Rows already in the database were evaluated as they were written
+    def start(self) -> None:
+        self._after = self._until = self.storage.newest_id()
+        self.publish()
+        self._thread.start()
+
+    def close(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    # Reads up to the newest id seen by the previous poll: a batch may
+    # commit after one with a higher id (Postgres), but not a poll later
+    def poll_once(self) -> int:
+        until: int = self._until
+        self._until = self.storage.newest_id()
+        evaluated: int = 0
+
+        while self._after < until:
+            rows: list[SnapshotRow] = self.storage.snapshots_between(
+                self._after,
+                until,
+                self.batch_size,
+            )
+            if not rows:
+                break
+            self.engine.evaluate(rows)
+            self._after = rows[-1].id
+            evaluated += len(rows)
+
+        self._after = max(self._after, until)
+        if evaluated:
+            self.publish()
+        return evaluated
+
+    def publish(self) -> None:
+        tmp: Path = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.engine.to_json()), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception:  # noqa: PERF203
+                self.logger.exception("Alert feed poll failed")
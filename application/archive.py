@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime as dt
+from datetime import timedelta
+from datetime import timezone as tz
+from itertools import accumulate, groupby
+from typing import TYPE_CHECKING, Any, Final
+
+from sqlalchemy import delete, func, select
+
+from application.common.util import as_utc
+from application.models import Device, Metric, MetricDefinition, MetricSnapshot
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from logging import Logger
+    from pathlib import Path
+
+    from sqlalchemy import ColumnElement
+    from sqlalchemy.engine import Connection, Engine, Row
+
+    from application.storage import StorageBackend
+
+    type GroupKey = tuple[int, int]
+    type Columns = tuple[array[int], array[float]]
+
+# One immutable file per UTC day, <root>/<YYYY>/<YYYY-MM-DD>.seg:
+#
+#   prelude  magic, version, day (epoch us), index offset, index entries
+#   blocks   one per (device, metric definition): zlib over the byte-shuffled
+#            delta-encoded int64 epoch-us timestamps, then the byte-shuffled
+#            float64 values, all little-endian
+#   index    per block: device id, definition id, rows, first and last
+#            timestamp, offset and length; sorted by (device, definition)
+#
+# Readers mmap the file and decompress only the blocks a query needs
+MAGIC: Final[bytes] = b"CSEG"
+VERSION: Final[int] = 1
+PRELUDE: Final[struct.Struct] = struct.Struct("<4sHxxqQI")
+ENTRY: Final[struct.Struct] = struct.Struct("<iiIqqQI")
+SUFFIX: Final[str] = ".seg"
+EPOCH: Final[dt] = dt(1970, 1, 1, tzinfo=tz.utc)
+ONE_DAY: Final[timedelta] = timedelta(days=1)
+ONE_US: Final[timedelta] = timedelta(microseconds=1)
+
+
+class SegmentReader:
+    path: Path
+    mtime_ns: int
+    day: int
+    index: dict[GroupKey, tuple[int, int, int, int, int]]
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as file:
+            self.mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+            self._map: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.day, offset, count = PRELUDE.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            err_msg: str = f"Not a version {VERSION} segment: {path}"
+            raise ValueError(err_msg)
+
+        # key -> (rows, first us, last us, offset, length)
+        self.index = {}
+        for i in range(count):
+            device, definition, *entry = ENTRY.unpack_from(
+                self._map,
+                offset + i * ENTRY.size,
+            )
+            self.index[device, definition] = tuple(entry)
+
+    def read(self, key: GroupKey) -> Columns:
+        rows, _first, _last, offset, length = self.index[key]
+        return _decode(self._map[offset : offset + length], rows)
+
+    # Samples with start_us <= timestamp < end_us
+    def scan(
+        self, key: GroupKey, start_us: int, end_us: int
+    ) -> Iterator[tuple[int, float]]:
+        entry: tuple[int, int, int, int, int] | None = self.index.get(key)
+        if entry is None or entry[2] < start_us or entry[1] >= end_us:
+            return
+
+        timestamps, values = self.read(key)
+        lo: int = bisect_left(timestamps, start_us)
+        hi: int = bisect_left(timestamps, end_us)
+        yield from zip(timestamps[lo:hi], values[lo:hi], strict=True)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class Archive:
+    DEFAULT_COMPRESSION_LEVEL: Final[int] = 6
+    MAX_OPEN_SEGMENTS: Final[int] = 64
+
+    root: Path
+    compression_level: int
+
+    def __init__(self, root: Path, *, compression_level: int | None = None) -> None:
+        self.root = root
+        self.compression_level = (
+            Archive.DEFAULT_COMPRESSION_LEVEL
+            if compression_level is None
+            else compression_level
+        )
+        self._readers: OrderedDict[Path, SegmentReader] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def path_for(self, day: dt) -> Path:
+        return self.root / f"{day:%Y}" / f"{day:%Y-%m-%d}{SUFFIX}"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.root.glob(f"*/*{SUFFIX}"))
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob(f"*/*{SUFFIX}"))
+
+    # Open readers are kept (LRU) and reopened when the file was replaced,
+    # which in other processes is only noticed here
+    def reader(self, day: dt) -> SegmentReader | None:
+        path: Path = self.path_for(day)
+        try:
+            mtime_ns: int = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            reader: SegmentReader | None = self._readers.get(path)
+            if reader is not None and reader.mtime_ns == mtime_ns:
+                self._readers.move_to_end(path)
+                return reader
+            if reader is not None:
+                reader.close()
+
+            reader = self._readers[path] = SegmentReader(path)
+            while len(self._readers) > Archive.MAX_OPEN_SEGMENTS:
+                self._readers.popitem(last=False)[1].close()
+            return reader
+
+    def scan(  # noqa: PLR0913
+        self,
+        conn: Connection,
+        origin: str,
+        metric: str,
+        start: dt,
+        end: dt,
+        *,
+        unit: str | None = None,
+    ) -> list[tuple[int, float]]:
+        days: list[dt] = list(_days(as_utc(start), as_utc(end)))
+        readers: list[SegmentReader] = [
+            reader for day in days if (reader := self.reader(day)) is not None
+        ]
+        if not readers:
+            return []
+
+        device: int | None = conn.execute(
+            select(Device.id).where(Device.name == origin),
+        ).scalar_one_or_none()
+        definitions: Any = select(MetricDefinition.id).where(
+            MetricDefinition.name == metric,
+        )
+        if unit is not None:
+            definitions = definitions.where(MetricDefinition.unit == unit)
+        definition_ids: list[int] = list(conn.execute(definitions).scalars())
+        if device is None or not definition_ids:
+            return []
+
+        start_us: int = _epoch_us(start)
+        end_us: int = _epoch_us(end)
+        # Rounded to the millisecond, as the backends' epoch_ms() does
+        points: list[tuple[int, float]] = [
+            ((ts + 500) // 1000, value)
+            for reader in readers
+            for definition in definition_ids
+            for ts, value in reader.scan((device, definition), start_us, end_us)
+        ]
+        if len(definition_ids) > 1:
+            points.sort(key=lambda p: p[0])
+        return points
+
+    # Writes the day's groups, sorted by key, merged with any segment
+    # already there (late rows archived in a later run). Written to a
+    # temporary file and renamed over the old one, so readers never see
+    # a partial segment. Returns the rows the segment now holds
+    def write_day(self, day: dt, groups: Iterable[tuple[GroupKey, Columns]]) -> int:
+        path: Path = self.path_for(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp: Path = path.with_suffix(".tmp")
+        existing: SegmentReader | None = self.reader(day)
+
+        rows: int = 0
+        entries: list[bytes] = []
+        with tmp.open("wb") as file:
+            file.write(PRELUDE.pack(MAGIC, VERSION, _epoch_us(day), 0, 0))
+
+            for (device, definition), (timestamps, values) in _merge(existing, groups):
+                block: bytes = _encode(timestamps, values, self.compression_level)
+                entries.append(
+                    ENTRY.pack(
+                        device,
+                        definition,
+                        len(timestamps),
+                        timestamps[0],
+                        timestamps[-1],
+                        file.tell(),
+                        len(block),
+                    ),
+                )
+                file.write(block)
+                rows += len(timestamps)
+
+            offset: int = file.tell()
+            file.write(b"".join(entries))
+            file.seek(0)
+            file.write(
+                PRELUDE.pack(MAGIC, VERSION, _epoch_us(day), offset, len(entries))
+            )
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Closed first: Windows cannot replace a mapped file
+        self._evict(path)
+        tmp.replace(path)
+        return rows
+
+    def _evict(self, path: Path) -> None:
+        with self._lock:
+            reader: SegmentReader | None = self._readers.pop(path, None)
+        if reader is not None:
+            reader.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+
+# Moves whole days older than `after_days` out of metric/metric_snapshot
+# and into the archive, oldest first. Run by the retention job (so by one
+# process only), before its purges; a day is deleted from the database only
+# once its segment is on disk, and only up to the newest snapshot id that
+# went into it, so rows arriving meanwhile wait for the next run
+class Archiver:
+    DEFAULT_CHUNK_SIZE: Final[int] = 500
+
+    storage: StorageBackend
+    archive: Archive
+    logger: Logger
+    after_days: float
+    chunk_size: int
+    chunk_pause: float
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        archive: Archive,
+        logger: Logger,
+        cfg: dict[str, Any],
+    ) -> None:
+        self.storage = storage
+        self.archive = archive
+        self.logger = logger
+        self.after_days = cfg.get("after_days", 30)
+        self.chunk_size = cfg.get("chunk_size", Archiver.DEFAULT_CHUNK_SIZE)
+        self.chunk_pause = cfg.get("chunk_pause", 0.0)
+
+    # Start of the first day kept in the database
+    def cutoff(self, now: dt) -> dt:
+        return _day(now - timedelta(days=self.after_days))
+
+    def run_once(self, now: dt, stop: threading.Event | None = None) -> int:
+        cutoff: dt = self.cutoff(now)
+        archived: int = 0
+
+        while stop is None or not stop.is_set():
+            day: dt | None = self._oldest_day()
+            if day is None or day >= cutoff:
+                break
+
+            rows, deleted = self._archive_day(day)
+            archived += rows
+            # Nothing left the database, so the same day would come up again
+            if not deleted:
+                self.logger.warning("Archiving %s deleted no rows", f"{day:%Y-%m-%d}")
+                break
+
+        return archived
+
+    def _oldest_day(self) -> dt | None:
+        with self.storage.reader.connect() as conn:
+            oldest: dt | None = conn.execute(
+                select(func.min(MetricSnapshot.timestamp)),
+            ).scalar_one()
+        return None if oldest is None else _day(as_utc(oldest))
+
+    # Returns the metrics archived and the rows deleted
+    def _archive_day(self, day: dt) -> tuple[int, int]:
+        start: float = time.perf_counter()
+        engine: Engine = self.storage.writer
+        in_day: tuple[ColumnElement[bool], ...] = (
+            MetricSnapshot.timestamp >= day,
+            MetricSnapshot.timestamp < day + ONE_DAY,
+        )
+        archived: int = 0
+
+        def groups(rows: Iterable[Row]) -> Iterator[tuple[GroupKey, Columns]]:
+            nonlocal archived
+            for key, samples in groupby(rows, key=lambda r: (r[0], r[1])):
+                timestamps: array[int] = array("q")
+                values: array[float] = array("d")
+                for _device, _definition, timestamp, value in samples:
+                    timestamps.append(_epoch_us(as_utc(timestamp)))
+                    values.append(value)
+                archived += len(timestamps)
+                yield key, (timestamps, values)
+
+        with self.storage.reader.connect() as conn:
+            # Taken over all the day's snapshots, metric-less ones included,
+            # so every one of them is deleted below
+            newest_id: int | None = conn.execute(
+                select(func.max(MetricSnapshot.id)).where(*in_day),
+            ).scalar_one()
+            if newest_id is None:
+                return 0, 0
+
+            rows: Iterable[Row] = conn.execution_options(yield_per=10_000).execute(
+                select(
+                    MetricSnapshot.device_id,
+                    Metric.definition_id,
+                    MetricSnapshot.timestamp,
+                    Metric.value,
+                )
+                .join(Metric, Metric.snapshot_id == MetricSnapshot.id)
+                .where(*in_day, MetricSnapshot.id <= newest_id)
+                .order_by(
+                    MetricSnapshot.device_id,
+                    Metric.definition_id,
+                    MetricSnapshot.timestamp,
+                ),
+            )
+            self.archive.write_day(day, groups(rows))
+
+        deleted: int = self._delete_day(engine, day, newest_id)
+        self.logger.info(
+            "Archived %s: %d metrics, %d rows deleted in %.2fs",
+            f"{day:%Y-%m-%d}",
+            archived,
+            deleted,
+            time.perf_counter() - start,
+        )
+        return archived, deleted
+
+    def _delete_day(self, engine: Engine, day: dt, newest_id: int) -> int:
+        deleted: int = 0
+
+        while True:
+            with engine.begin() as conn:
+                ids: list[int] = list(
+                    conn.execute(
+                        select(MetricSnapshot.id)
+                        .where(
+                            MetricSnapshot.timestamp >= day,
+                            MetricSnapshot.timestamp < day + ONE_DAY,
+                            MetricSnapshot.id <= newest_id,
+                        )
+                        .limit(self.chunk_size),
+                    ).scalars(),
+                )
+                if not ids:
+                    return deleted
+
+                deleted += conn.execute(
+                    delete(Metric).where(Metric.snapshot_id.in_(ids)),
+                ).rowcount
+                deleted += conn.execute(
+                    delete(MetricSnapshot).where(MetricSnapshot.id.in_(ids)),
+                ).rowcount
+
+            time.sleep(self.chunk_pause)
+
+
+def _merge(
+    existing: SegmentReader | None,
+    groups: Iterable[tuple[GroupKey, Columns]],
+) -> Iterator[tuple[GroupKey, Columns]]:
+    old: list[GroupKey] = sorted(existing.index) if existing is not None else []
+    i: int = 0
+
+    for key, new in groups:
+        columns: Columns = new
+        while i < len(old) and old[i] < key:
+            yield old[i], existing.read(old[i])  # type: ignore[union-attr]
+            i += 1
+
+        if i < len(old) and old[i] == key:
+            # Exact duplicates only come from a run interrupted between
+            # writing the segment and deleting the rows
+            merged: list[tuple[int, float]] = sorted(
+                {
+                    *zip(*existing.read(key), strict=True),  # type: ignore[union-attr]
+                    *zip(*columns, strict=True),
+                },
+            )
+            columns = (
+                array("q", (t for t, _ in merged)),
+                array("d", (v for _, v in merged)),
+            )
+            i += 1
+
+        if columns[0]:
+            yield key, columns
+
+    for key in old[i:]:
+        yield key, existing.read(key)  # type: ignore[union-attr]
+
+
+def _encode(timestamps: array[int], values: array[float], level: int) -> bytes:
+    deltas: array[int] = array(
+        "q",
+        (b - a for a, b in zip((0, *timestamps), timestamps, strict=False)),
+    )
+    values = array("d", values)
+    if sys.byteorder == "big":
+        deltas.byteswap()
+        values.byteswap()
+    return zlib.compress(_shuffle(deltas.tobytes()) + _shuffle(values.tobytes()), level)
+
+
+def _decode(block: bytes, rows: int) -> Columns:
+    raw: bytes = zlib.decompress(block)
+    deltas: array[int] = array("q", _unshuffle(raw[: rows * 8]))
+    values: array[float] = array("d", _unshuffle(raw[rows * 8 :]))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+        values.byteswap()
+    return array("q", accumulate(deltas)), values
+
+
+# Byte planes: all first bytes, then all second bytes, and so on. Close
+# timestamps and values share their high bytes, which then compress well
+def _shuffle(data: bytes, width: int = 8) -> bytes:
+    return b"".join(data[i::width] for i in range(width))
+
+
+def _unshuffle(data: bytes, width: int = 8) -> bytes:
+    n: int = len(data) // width
+    out: bytearray = bytearray(len(data))
+    for i in range(width):
+        out[i::width] = data[i * n : (i + 1) * n]
+    return bytes(out)
+
+
+def _day(value: dt) -> dt:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _days(start: dt, end: dt) -> Iterator[dt]:
+    day: dt = _day(start)
+    while day < end:
+        yield day
+        day += ONE_DAY
+
+
+def _epoch_us(value: dt) -> int:
+    return (as_utc(value) - EPOCH) // ONE_US
@@ -1,3 +1,4 @@
+import logging
 from json import load
 from logging.config import dictConfig
 from pathlib import Path
@@ -5,16 +6,36 @@ from typing import Final
 
 from flask import Flask
 
+from application.config.logging_config import LogPipeline
+
 
 class AppBase(Flask):
     CONFIG_PATH: Final[str] = "config/config.json"
+    CONFIG_SECTIONS: Final[tuple[str, ...]] = (
+        "ingest",
+        "rollup",
+        "retention",
+        "archive",
+        "stream",
+        "server",
+        "storage",
+        "instrumentation",
+        "render_cache",
+        "alerts",
+        "commands",
+        "stats",
+    )
+    # Pooled connections kept beyond one per request thread, for the
+    # write-behind, retention and latest-sync threads
+    POOL_RESERVED: Final[int] = 3
     root_dir: Path
+    log_pipeline: LogPipeline | None
 
-    def __init__(self, import_name: str) -> None:
+    def __init__(self, import_name: str, overrides: dict | None = None) -> None:
         super().__init__(import_name)
         self.root_dir = Path(self.root_path)
         self._init_routes()
-        self._init_config()
+        self._init_config(overrides or {})
 
     def _init_routes(self) -> None:
         for attr in dir(self):
@@ -24,7 +45,7 @@ class AppBase(Flask):
                 for route in func.routes:
                     self.route(route, **func.kwargs)(func)
 
-    def _init_config(self) -> None:
+    def _init_config(self, overrides: dict) -> None:
         path: Path = self.root_dir / AppBase.CONFIG_PATH
 
         if not path.exists():
@@ -34,9 +55,17 @@ class AppBase(Flask):
         with Path.open(path) as file:
             cfg: dict = load(file)
 
+        for section, values in overrides.items():
+            cfg.setdefault(section, {}).update(values)
+
         self._init_logging_config(cfg["logging"])
         self._init_flask_config(cfg["flask"])
 
+        for section in AppBase.CONFIG_SECTIONS:
+            self._init_section_config(section, cfg.get(section, {}))
+
+        self._init_pool_config()
+
     def _init_logging_config(self, cfg: dict) -> None:
         log_file_output: Path = self.root_dir / cfg["handlers"]["file"]["filename"]
 
@@ -44,7 +73,31 @@ class AppBase(Flask):
             log_file_output.parent.mkdir(parents=True)
 
         cfg["handlers"]["file"]["filename"] = str(log_file_output)
+        queue_cfg: dict = cfg.pop("queue", {})
         dictConfig(cfg)
 
+        # Handlers are configured as usual, then moved behind the queue so
+        # request threads never wait on console or file I/O
+        self.log_pipeline = None
+        if queue_cfg.get("enabled", False):
+            self.log_pipeline = LogPipeline.install(logging.getLogger(), queue_cfg)
+
     def _init_flask_config(self, cfg: dict) -> None:
         self.config.update(cfg)
+
+    def _init_section_config(self, section: str, cfg: dict) -> None:
+        self.config[section.upper()] = cfg
+
+    def _init_pool_config(self) -> None:
+        # Sized so every server thread can hold a connection without waiting
+        uri: str = self.config.get("SQLALCHEMY_DATABASE_URI", "")
+        if "SQLALCHEMY_ENGINE_OPTIONS" in self.config or ":memory:" in uri:
+            return
+
+        threads: int = self.config["SERVER"].get("threads", 1)
+        self.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": threads + AppBase.POOL_RESERVED,
+            "max_overflow": threads,
+            "pool_timeout": 30,
+            "pool_recycle": 3600,
+        }
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Iterable
+    from datetime import datetime as dt
+
+    from application.ingest import SnapshotRow
+
+    # Snapshot id and timestamp
+    type FragmentKey = tuple[int, dt]
+
+
+class LatestCache:
+    def __init__(self) -> None:
+        self._latest: dict[str, SnapshotRow] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def update(self, rows: list[SnapshotRow]) -> None:
+        with self._lock:
+            for row in rows:
+                current: SnapshotRow | None = self._latest.get(row.origin)
+
+                if current is None or _key(row) > _key(current):
+                    self._latest[row.origin] = row
+
+    def newer(self, rows: list[SnapshotRow]) -> list[SnapshotRow]:
+        with self._lock:
+            return [
+                row
+                for row in rows
+                if row.origin not in self._latest
+                or _key(row) > _key(self._latest[row.origin])
+            ]
+
+    def snapshots(self) -> list[SnapshotRow]:
+        with self._lock:
+            return [self._latest[origin] for origin in sorted(self._latest)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._latest.clear()
+
+
+def _key(row: SnapshotRow) -> tuple[dt, int]:
+    return row.timestamp, row.id or 0
+
+
+# Rendered pages keyed by route and query string, valid for the data
+# generation they were rendered at; every ingest (and retention purge) bumps
+# the generation. Snapshot rows never change once written, so their rendered
+# history rows are kept across generations, by id and timestamp: SQLite
+# reuses the ids of purged rows once the table has been emptied. Pages
+# carry a strong ETag (a digest of the body), so identical renders, in any
+# worker, revalidate. A size of 0 turns that cache off
+class RenderCache:
+    max_pages: int
+    max_fragments: int
+    generation: int
+
+    def __init__(self, *, max_pages: int, max_fragments: int) -> None:
+        self.max_pages = max_pages
+        self.max_fragments = max_fragments
+        self.generation = 0
+        self._pages: OrderedDict[Hashable, tuple[int, str, str]] = OrderedDict()
+        self._fragments: OrderedDict[FragmentKey, str] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    # Ingest/retention listener; the argument (rows, purge count) is unused
+    def bump(self, *_: Any) -> None:  # noqa: ANN401
+        with self._lock:
+            self.generation += 1
+
+    def page(self, key: Hashable, generation: int) -> tuple[str, str] | None:
+        with self._lock:
+            entry: tuple[int, str, str] | None = self._pages.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._pages.move_to_end(key)
+            return entry[1], entry[2]
+
+    # `generation` must be read before the data the body was rendered from,
+    # so a bump in between leaves the entry already stale
+    def store_page(self, key: Hashable, generation: int, body: str) -> tuple[str, str]:
+        etag: str = hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+        if self.max_pages:
+            with self._lock:
+                current: tuple[int, str, str] | None = self._pages.get(key)
+                if current is not None and current[0] > generation:
+                    return etag, body
+                self._pages[key] = (generation, etag, body)
+                self._pages.move_to_end(key)
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+        return etag, body
+
+    def fragments(self, keys: Iterable[FragmentKey]) -> dict[FragmentKey, str]:
+        with self._lock:
+            found: dict[FragmentKey, str] = {}
+            for key in keys:
+                fragment: str | None = self._fragments.get(key)
+                if fragment is not None:
+                    self._fragments.move_to_end(key)
+                    found[key] = fragment
+            return found
+
+    def store_fragment(self, key: FragmentKey, fragment: str) -> str:
+        if self.max_fragments:
+            with self._lock:
+                self._fragments[key] = fragment
+                while len(self._fragments) > self.max_fragments:
+                    self._fragments.popitem(last=False)
+        return fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._fragments.clear()
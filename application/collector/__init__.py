@@ -0,0 +1,31 @@
+from application.collector.agent import (
+    Collector,
+    CollectorConfig,
+    Uploader,
+    UploadError,
+)
+from application.collector.buffer import Batch, DiskSpool, SnapshotBuffer
+from application.collector.scheduler import SourceScheduler
+from application.collector.sources import (
+    SOURCE_TYPES,
+    HttpJsonSource,
+    PsutilSource,
+    Source,
+    load_sources,
+)
+
+__all__: list[str] = [
+    "SOURCE_TYPES",
+    "Batch",
+    "Collector",
+    "CollectorConfig",
+    "DiskSpool",
+    "HttpJsonSource",
+    "PsutilSource",
+    "SnapshotBuffer",
+    "Source",
+    "SourceScheduler",
+    "UploadError",
+    "Uploader",
+    "load_sources",
+]
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import socket
+import threading
+from dataclasses import dataclass, field
+from json import dumps
+from pathlib import Path
+from typing import TYPE_CHECKING, Final
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from application.collector.buffer import DiskSpool, SnapshotBuffer
+from application.collector.commands import CommandPoller
+from application.collector.scheduler import SourceScheduler
+from application.collector.sources import PsutilSource
+from application.common import wire
+from application.common.wire import COMPACT_CONTENT_TYPE, JSON_CONTENT_TYPE
+
+if TYPE_CHECKING:
+    from logging import Logger
+
+    from application.collector.sources import Source
+    from application.common._types import JSON
+
+USER_AGENT: Final[str] = "cotc-collector/0.1.0"
+
+
+@dataclass(frozen=True, slots=True)
+class CollectorConfig:
+    url: str
+    origin: str = field(default_factory=socket.gethostname)
+    interval: float = 1.0  # Seconds between psutil samples and snapshot merges
+    upload_interval: float = 10.0  # Seconds between uploads
+    batch_size: int = 500  # Keep at or below the server's ingest.max_batch_size
+    max_memory: int = 10_000  # Snapshots held in memory before spilling
+    spool_dir: Path = field(default_factory=lambda: Path.home() / ".cotc" / "spool")
+    max_spool_segments: int = 1000
+    content_type: str = JSON_CONTENT_TYPE
+    encoding: str = "gzip"
+    timeout: float = 10.0
+    max_backoff: float = 300.0
+    commands: bool = True  # Long-poll the server for commands to run
+    command_timeout: float = 60.0  # Seconds the server holds each poll
+
+
+class UploadError(Exception):
+    retry_after: float | None
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Uploader:
+    RETRY_STATUSES: Final[frozenset[int]] = frozenset({408, 429, 500, 502, 503, 504})
+
+    cfg: CollectorConfig
+    session: requests.Session
+
+    def __init__(self, cfg: CollectorConfig) -> None:
+        self.cfg = cfg
+
+        # One pooled keep-alive connection reused for every upload
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.headers.update(
+            {
+                "Content-Type": cfg.content_type,
+                "Content-Encoding": cfg.encoding,
+                "User-Agent": USER_AGENT,
+            },
+        )
+
+    def encode(self, snapshots: list[JSON]) -> bytes:
+        body: bytes = (
+            wire.encode(snapshots)
+            if self.cfg.content_type == COMPACT_CONTENT_TYPE
+            else dumps(snapshots, separators=(",", ":")).encode()
+        )
+        return wire.compress(body, self.cfg.encoding)
+
+    # True when the server stored (or queued) the batch, False when it
+    # rejected it as invalid; raises UploadError when it should be retried
+    def send(self, snapshots: list[JSON]) -> bool:
+        try:
+            response: requests.Response = self.session.post(
+                self.cfg.url,
+                data=self.encode(snapshots),
+                timeout=self.cfg.timeout,
+            )
+        except requests.RequestException as e:
+            raise UploadError(str(e)) from e
+
+        if response.ok:
+            return True
+
+        if response.status_code in Uploader.RETRY_STATUSES:
+            retry_after: str | None = response.headers.get("Retry-After")
+            err_msg: str = f"Server returned {response.status_code}"
+            raise UploadError(
+                err_msg,
+                float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+
+        return False
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class Collector:
+    cfg: CollectorConfig
+    logger: Logger
+    scheduler: SourceScheduler
+    buffer: SnapshotBuffer
+    uploader: Uploader
+    commands: CommandPoller | None
+    uploaded: int
+    rejected: int
+    restart_requested: bool
+
+    def __init__(
+        self,
+        cfg: CollectorConfig,
+        logger: Logger,
+        sources: list[Source] | None = None,
+    ) -> None:
+        self.cfg = cfg
+        self.logger = logger
+        self.scheduler = SourceScheduler(
+            sources or [PsutilSource(cfg.origin, interval=cfg.interval)],
+            self._collect,
+            logger,
+            flush_interval=cfg.interval,
+        )
+        self.buffer = SnapshotBuffer(
+            DiskSpool(cfg.spool_dir, logger, max_segments=cfg.max_spool_segments),
+            max_memory=cfg.max_memory,
+            batch_size=cfg.batch_size,
+        )
+        self.uploader = Uploader(cfg)
+        self.commands = (
+            CommandPoller(
+                cfg,
+                logger,
+                {"ping": self._ping, "restart": self._restart},
+            )
+            if cfg.commands
+            else None
+        )
+        self.uploaded = 0
+        self.rejected = 0
+        self.restart_requested = False
+        self._failures: int = 0
+        self._stop: threading.Event = threading.Event()
+        self._wake: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._upload_loop,
+            name="collector-upload",
+            daemon=True,
+        )
+
+    def run(self) -> None:
+        self._thread.start()
+        if self.commands is not None:
+            self.commands.start()
+
+        try:
+            asyncio.run(self.scheduler.run())
+        finally:
+            self.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self.scheduler.stop()
+        if self.commands is not None:
+            self.commands.stop()
+
+    def close(self) -> None:
+        self.stop()
+        if self._thread.is_alive():
+            self._thread.join(self.cfg.timeout)
+
+        # Last attempt to deliver, then keep whatever is left for next start
+        self.flush()
+        self.buffer.spill()
+        self.uploader.close()
+        if self.commands is not None:
+            # A parked poll is abandoned rather than waited out, but a
+            # restart waits for its acknowledgement to go out
+            self.commands.close(self.cfg.timeout if self.restart_requested else 0)
+
+    def flush(self) -> float:
+        while (batch := self.buffer.take()) is not None:
+            try:
+                accepted: bool = self.uploader.send(batch.snapshots)
+            except UploadError as e:
+                self.buffer.restore(batch)
+                return self._backoff(e)
+
+            self._failures = 0
+            self.buffer.done(batch)
+
+            if accepted:
+                self.uploaded += len(batch.snapshots)
+            else:
+                self.rejected += len(batch.snapshots)
+                self.logger.error(
+                    "Server rejected %d snapshots, dropping",
+                    len(batch.snapshots),
+                )
+
+        return 0.0
+
+    def _ping(self, _args: JSON) -> str:
+        return "pong"
+
+    # Acknowledged first; the CLI re-executes the collector once it has
+    # shut down (and flushed) cleanly
+    def _restart(self, _args: JSON) -> str:
+        self.restart_requested = True
+        self.stop()
+        return "restarting"
+
+    def _collect(self, snapshot: JSON) -> None:
+        self.buffer.append(snapshot)
+        if len(self.buffer) >= self.cfg.batch_size:
+            self._wake.set()
+
+    def _backoff(self, error: UploadError) -> float:
+        self._failures += 1
+
+        # Jittered so a fleet does not retry in lockstep after an outage;
+        # a server-sent Retry-After is treated as a lower bound
+        delay: float
+        if error.retry_after is not None:
+            delay = error.retry_after * random.uniform(1.0, 1.5)  # noqa: S311
+        else:
+            ceiling: float = min(2.0**self._failures, self.cfg.max_backoff)
+            delay = random.uniform(ceiling / 2, ceiling)  # noqa: S311
+        self.logger.warning("Upload failed (%s), retrying in %.1fs", error, delay)
+        return delay
+
+    def _upload_loop(self) -> None:
+        delay: float = 0.0
+
+        while not self._stop.is_set():
+            if delay:
+                self._stop.wait(delay)
+            else:
+                self._wake.wait(self.cfg.upload_interval)
+                self._wake.clear()
+
+            if self._stop.is_set():
+                return
+
+            try:
+                delay = self.flush()
+            except Exception:
+                self.logger.exception("Upload loop failed")
+                delay = self.cfg.upload_interval
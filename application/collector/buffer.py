@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from json import JSONDecodeError, dumps, loads
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from logging import Logger
+    from pathlib import Path
+
+    from application.common._types import JSON
+
+
+@dataclass(frozen=True, slots=True)
+class Batch:
+    snapshots: list[JSON]
+    segment: Path | None = None  # Spool file the batch was read from, if any
+
+
+# Directory of JSON-lines segment files, one upload batch per file. Names
+# are zero-padded sequence numbers so lexical order is write order
+class DiskSpool:
+    SUFFIX: Final[str] = ".jsonl"
+
+    path: Path
+    logger: Logger
+    max_segments: int
+    dropped: int
+
+    def __init__(self, path: Path, logger: Logger, *, max_segments: int) -> None:
+        self.path = path
+        self.logger = logger
+        self.max_segments = max_segments
+        self.dropped = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._seq: int = max((int(p.stem) for p in self.segments()), default=0)
+
+    def __len__(self) -> int:
+        return len(self.segments())
+
+    def segments(self) -> list[Path]:
+        return sorted(self.path.glob(f"*{DiskSpool.SUFFIX}"))
+
+    def write(self, snapshots: list[JSON]) -> None:
+        self._seq += 1
+        tmp: Path = self.path / f"{self._seq:012d}.tmp"
+
+        with tmp.open("w", encoding="utf-8") as file:
+            file.writelines(
+                dumps(snapshot, separators=(",", ":")) + "\n" for snapshot in snapshots
+            )
+
+        # Rename last so a crash mid-write never leaves a truncated segment
+        tmp.replace(tmp.with_suffix(DiskSpool.SUFFIX))
+
+        segments: list[Path] = self.segments()
+        for old in segments[: max(len(segments) - self.max_segments, 0)]:
+            self.logger.warning("Spool full, dropping segment %s", old.name)
+            old.unlink(missing_ok=True)
+            self.dropped += 1
+
+    def oldest(self) -> Batch | None:
+        for segment in self.segments():
+            try:
+                with segment.open(encoding="utf-8") as file:
+                    snapshots: list[JSON] = [
+                        loads(line) for line in file if line.strip()
+                    ]
+                return Batch(snapshots, segment)
+            except (OSError, JSONDecodeError):  # noqa: PERF203
+                self.logger.exception("Unreadable spool segment %s", segment.name)
+                segment.replace(segment.with_suffix(".bad"))
+
+        return None
+
+    def remove(self, segment: Path) -> None:
+        segment.unlink(missing_ok=True)
+
+
+# Snapshots wait in memory until uploaded. Batches that cannot be delivered
+# go back to the front of the queue; once more than max_memory snapshots are
+# waiting, everything is spilled to the disk spool, which is drained first
+class SnapshotBuffer:
+    spool: DiskSpool
+    max_memory: int
+    batch_size: int
+    pending: deque[JSON]
+
+    def __init__(self, spool: DiskSpool, *, max_memory: int, batch_size: int) -> None:
+        self.spool = spool
+        self.max_memory = max_memory
+        self.batch_size = batch_size
+        self.pending = deque()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def append(self, snapshot: JSON) -> None:
+        with self._lock:
+            self.pending.append(snapshot)
+            if len(self.pending) > self.max_memory:
+                self._spill()
+
+    def take(self) -> Batch | None:
+        batch: Batch | None = self.spool.oldest()
+        if batch is not None:
+            return batch
+
+        with self._lock:
+            if not self.pending:
+                return None
+            return Batch(
+                [
+                    self.pending.popleft()
+                    for _ in range(min(len(self.pending), self.batch_size))
+                ],
+            )
+
+    def done(self, batch: Batch) -> None:
+        if batch.segment is not None:
+            self.spool.remove(batch.segment)
+
+    def restore(self, batch: Batch) -> None:
+        if batch.segment is not None:
+            return
+
+        with self._lock:
+            self.pending.extendleft(reversed(batch.snapshots))
+            if len(self.pending) > self.max_memory:
+                self._spill()
+
+    def spill(self) -> None:
+        with self._lock:
+            self._spill()
+
+    def _spill(self) -> None:
+        while self.pending:
+            self.spool.write(
+                [
+                    self.pending.popleft()
+                    for _ in range(min(len(self.pending), self.batch_size))
+                ],
+            )
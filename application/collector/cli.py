@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from application.collector.agent import Collector, CollectorConfig
+from application.collector.sources import load_sources
+from application.common import wire
+from application.common.wire import COMPACT_CONTENT_TYPE, JSON_CONTENT_TYPE
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+FORMATS: dict[str, str] = {"json": JSON_CONTENT_TYPE, "compact": COMPACT_CONTENT_TYPE}
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    defaults: CollectorConfig = CollectorConfig(url="")
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="cotc-collector",
+        description="Sample host metrics and upload them to a cotc server.",
+    )
+    parser.add_argument("url", help="server ingest URL, e.g. http://host:5000/metrics")
+    parser.add_argument("--origin", default=defaults.origin)
+    parser.add_argument("--interval", type=float, default=defaults.interval)
+    parser.add_argument(
+        "--upload-interval", type=float, default=defaults.upload_interval
+    )
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--max-memory", type=int, default=defaults.max_memory)
+    parser.add_argument(
+        "--sources",
+        type=Path,
+        help="JSON list of source specs; defaults to psutil for this host",
+    )
+    parser.add_argument("--spool-dir", type=Path, default=defaults.spool_dir)
+    parser.add_argument(
+        "--max-spool-segments",
+        type=int,
+        default=defaults.max_spool_segments,
+    )
+    parser.add_argument("--format", choices=tuple(FORMATS), default="json")
+    parser.add_argument("--encoding", choices=wire.ENCODINGS, default=defaults.encoding)
+    parser.add_argument("--timeout", type=float, default=defaults.timeout)
+    parser.add_argument(
+        "--no-commands",
+        action="store_true",
+        help="do not poll the server for commands",
+    )
+    parser.add_argument(
+        "--command-timeout",
+        type=float,
+        default=defaults.command_timeout,
+        help="seconds the server holds each command poll",
+    )
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args: argparse.Namespace = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="[%(levelname)s] %(asctime)s :: %(message)s",
+    )
+
+    cfg: CollectorConfig = CollectorConfig(
+        url=args.url,
+        origin=args.origin,
+        interval=args.interval,
+        upload_interval=args.upload_interval,
+        batch_size=args.batch_size,
+        max_memory=args.max_memory,
+        spool_dir=args.spool_dir,
+        max_spool_segments=args.max_spool_segments,
+        content_type=FORMATS[args.format],
+        encoding=args.encoding,
+        timeout=args.timeout,
+        commands=not args.no_commands,
+        command_timeout=args.command_timeout,
+    )
+    collector: Collector = Collector(
+        cfg,
+        logging.getLogger("cotc.collector"),
+        load_sources(args.sources) if args.sources is not None else None,
+    )
+
+    def shutdown(*_: Any) -> None:  # noqa: ANN401
+        collector.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    collector.logger.info(
+        "Collecting %r every %ss -> %s", cfg.origin, cfg.interval, cfg.url
+    )
+    collector.run()
+    collector.logger.info(
+        "Stopped: %d uploaded, %d rejected, %d buffered",
+        collector.uploaded,
+        collector.rejected,
+        len(collector.buffer) + len(collector.buffer.spool),
+    )
+
+    if collector.restart_requested:
+        collector.logger.info("Restarting on server command")
+        os.execv(  # noqa: S606
+            sys.executable,
+            [sys.executable, "-m", "application.collector", *sys.argv[1:]],
+        )
+    return 0
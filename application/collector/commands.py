@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import random
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Final
+from urllib.parse import quote
+
+import requests
+
+if TYPE_CHECKING:
+    from logging import Logger
+
+    from application.collector.agent import CollectorConfig
+    from application.common._types import JSON
+
+    type CommandHandler = Callable[[JSON], Any]
+
+
+# Long-polls the server's /commands/<origin> for commands sent to this
+# device, runs the matching handler and acknowledges each with its result.
+# One request is parked at a time, so an idle device costs the server a
+# single held connection rather than a poll every second
+class CommandPoller:
+    # Extra seconds to wait beyond the server-side hold before giving up
+    READ_MARGIN: Final[float] = 10.0
+
+    cfg: CollectorConfig
+    logger: Logger
+    handlers: dict[str, CommandHandler]
+    url: str
+    session: requests.Session
+
+    def __init__(
+        self,
+        cfg: CollectorConfig,
+        logger: Logger,
+        handlers: dict[str, CommandHandler],
+    ) -> None:
+        self.cfg = cfg
+        self.logger = logger
+        self.handlers = handlers
+        # Next to the ingest endpoint: http://host/metrics -> /commands/<origin>
+        self.url = f"{cfg.url.rsplit('/', 1)[0]}/commands/{quote(cfg.origin, safe='')}"
+        # Its own session, so a parked poll never holds up an upload
+        self.session = requests.Session()
+        self._failures: int = 0
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run,
+            name="collector-commands",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def close(self, timeout: float | None = None) -> None:
+        self.stop()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self.session.close()
+
+    def poll(self) -> list[JSON]:
+        response: requests.Response = self.session.get(
+            self.url,
+            params={"timeout": self.cfg.command_timeout},
+            timeout=(self.cfg.timeout, self.cfg.command_timeout + self.READ_MARGIN),
+        )
+        response.raise_for_status()
+        return response.json().get("commands", [])
+
+    def handle(self, command: JSON) -> None:
+        handler: CommandHandler | None = self.handlers.get(command["command"])
+        ok: bool = handler is not None
+        result: Any = None
+
+        if handler is None:
+            result = f"Unknown command {command['command']!r}"
+        else:
+            try:
+                result = handler(command.get("args") or {})
+            except Exception as e:
+                self.logger.exception("Command %r failed", command["command"])
+                ok, result = False, str(e)
+
+        self.logger.info(
+            "Command %r (%s): %s", command["command"], command["id"], result
+        )
+        self.session.post(
+            f"{self.url}/{command['id']}/ack",
+            json={"status": "ok" if ok else "failed", "result": result},
+            timeout=self.cfg.timeout,
+        ).raise_for_status()
+
+    # As for uploads: jittered, with a server-sent Retry-After (a 503 when
+    # too many polls are parked) as the lower bound
+    def _backoff(self, error: requests.RequestException) -> float:
+        retry_after: str | None = (
+            None
+            if error.response is None
+            else error.response.headers.get("Retry-After")
+        )
+        if retry_after and retry_after.isdigit():
+            return float(retry_after) * random.uniform(1.0, 1.5)  # noqa: S311
+
+        ceiling: float = min(2.0**self._failures, self.cfg.max_backoff)
+        return random.uniform(ceiling / 2, ceiling)  # noqa: S311
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                for command in self.poll():
+                    self.handle(command)
+                self._failures = 0
+            except requests.RequestException as e:  # noqa: PERF203
+                self._failures += 1
+                delay: float = self._backoff(e)
+                self.logger.warning(
+                    "Command poll failed (%s), retrying in %.1fs",
+                    e,
+                    delay,
+                )
+                self._stop.wait(delay)
+            except Exception:
+                self.logger.exception("Command loop failed")
+                self._stop.wait(self.cfg.max_backoff)
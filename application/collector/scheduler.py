@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import random
+import threading
+from typing import TYPE_CHECKING, Callable, Final
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from application.collector.sources import Source
+    from application.common._types import JSON
+
+    type MetricKey = tuple[str, str]
+
+
+# Polls every source on its own fixed-rate timer. Each poll is a separate
+# task, so a slow or hung source only ever holds up itself: its overlapping
+# polls are capped by max_in_flight, and each is cut off at its timeout.
+# Readings are merged per origin and emitted as snapshot payloads
+class SourceScheduler:
+    DEFAULT_MAX_IN_FLIGHT: Final[int] = 32
+
+    sources: list[Source]
+    emit: Callable[[JSON], None]
+    logger: Logger
+    flush_interval: float
+    max_in_flight: int
+    stats: dict[str, dict[str, int]]
+
+    def __init__(
+        self,
+        sources: list[Source],
+        emit: Callable[[JSON], None],
+        logger: Logger,
+        *,
+        flush_interval: float,
+        max_in_flight: int | None = None,
+    ) -> None:
+        self.sources = sources
+        self.emit = emit
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self.max_in_flight = (
+            SourceScheduler.DEFAULT_MAX_IN_FLIGHT
+            if max_in_flight is None
+            else max_in_flight
+        )
+        self.stats = {
+            source.name: {"polls": 0, "failures": 0, "timeouts": 0, "skipped": 0}
+            for source in sources
+        }
+        self._failures: dict[Source, int] = dict.fromkeys(sources, 0)
+        self._pending: dict[str, dict[MetricKey, float]] = {}
+        self._stamps: dict[str, dt] = {}
+        self._stop_requested: threading.Event = threading.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped: asyncio.Event | None = None
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._limit: asyncio.Semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        if self._stop_requested.is_set():
+            return
+
+        tasks: list[asyncio.Task] = [
+            asyncio.create_task(self._schedule(source), name=source.name)
+            for source in self.sources
+        ]
+
+        try:
+            while not self._stopped.is_set():
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._stopped.wait(), self.flush_interval)
+                self.flush()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.flush()
+            self._loop = None
+
+    # Safe to call from any thread, including signal handlers
+    def stop(self) -> None:
+        self._stop_requested.set()
+        loop: asyncio.AbstractEventLoop | None = self._loop
+        if loop is not None and self._stopped is not None:
+            # The loop may close between the check and the call
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(self._stopped.set)
+
+    def flush(self, origin: str | None = None) -> None:
+        for o in [origin] if origin is not None else list(self._pending):
+            metrics: dict[MetricKey, float] | None = self._pending.pop(o, None)
+            if not metrics:
+                continue
+
+            self.emit(
+                {
+                    "origin": o,
+                    "timestamp": self._stamps.pop(o).isoformat(),
+                    "metrics": [
+                        {"name": name, "value": value, "unit": unit}
+                        for (name, unit), value in metrics.items()
+                    ],
+                },
+            )
+
+    def merge(self, origin: str, metrics: list[JSON]) -> None:
+        pending: dict[MetricKey, float] = self._pending.setdefault(origin, {})
+
+        # A second reading of a metric already waiting would overwrite it,
+        # so the waiting snapshot goes out first and no sample is lost
+        if any((m["name"], m["unit"]) in pending for m in metrics):
+            self.flush(origin)
+            pending = self._pending.setdefault(origin, {})
+
+        pending.update(((m["name"], m["unit"]), m["value"]) for m in metrics)
+        self._stamps[origin] = utc_now()
+
+    async def _schedule(self, source: Source) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        in_flight: set[asyncio.Task] = set()
+        deadline: float = loop.time()
+
+        try:
+            while True:
+                if len(in_flight) < source.max_in_flight:
+                    task: asyncio.Task = asyncio.create_task(self._poll(source))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                else:
+                    self.stats[source.name]["skipped"] += 1
+
+                deadline += source.interval
+                failures: int = self._failures[source]
+                if failures:
+                    deadline = max(deadline, loop.time() + self._backoff(source))
+
+                # Skip ticks missed while the loop was busy instead of
+                # firing them back to back
+                now: float = loop.time()
+                if deadline < now:
+                    deadline += (
+                        (now - deadline) // source.interval + 1
+                    ) * source.interval
+
+                await asyncio.sleep(deadline - loop.time())
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _poll(self, source: Source) -> None:
+        stats: dict[str, int] = self.stats[source.name]
+        stats["polls"] += 1
+
+        try:
+            async with self._limit:
+                metrics: list[JSON] = await asyncio.wait_for(
+                    source.poll(),
+                    source.timeout,
+                )
+        except TimeoutError:
+            stats["timeouts"] += 1
+            self._failures[source] += 1
+            self.logger.warning("%r timed out after %ss", source, source.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats["failures"] += 1
+            self._failures[source] += 1
+            self.logger.exception("%r poll failed", source)
+        else:
+            self._failures[source] = 0
+            self.merge(source.origin, metrics)
+
+    def _backoff(self, source: Source) -> float:
+        ceiling: float = min(
+            source.interval * 2.0 ** self._failures[source],
+            source.max_backoff,
+        )
+        return random.uniform(ceiling / 2, ceiling)  # noqa: S311
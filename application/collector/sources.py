@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+from abc import ABC, abstractmethod
+from json import load
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar, Final
+
+import psutil
+import requests
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from application.common._types import JSON
+
+BYTES_PER_MB: Final[float] = 1_000_000.0
+
+
+# A source produces the metrics for one origin each time it is polled. The
+# scheduler owns timing: interval, timeout, backoff and the in-flight limit
+# are per-source settings it reads from here
+class Source(ABC):
+    DEFAULT_TIMEOUT: Final[float] = 10.0
+    DEFAULT_MAX_BACKOFF: Final[float] = 300.0
+
+    kind: ClassVar[str]
+
+    origin: str
+    interval: float
+    timeout: float
+    max_in_flight: int
+    max_backoff: float
+
+    def __init__(
+        self,
+        origin: str,
+        *,
+        interval: float,
+        timeout: float | None = None,
+        max_in_flight: int = 1,
+        max_backoff: float | None = None,
+    ) -> None:
+        self.origin = origin
+        self.interval = interval
+        self.timeout = Source.DEFAULT_TIMEOUT if timeout is None else timeout
+        self.max_in_flight = max_in_flight
+        self.max_backoff = (
+            Source.DEFAULT_MAX_BACKOFF if max_backoff is None else max_backoff
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}[Origin={self.origin!r}]"
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}:{self.origin}"
+
+    # Returns {"name", "value", "unit"} dicts, as in a snapshot's metrics list
+    @abstractmethod
+    async def poll(self) -> list[JSON]: ...
+
+    @classmethod
+    def from_config(cls, cfg: JSON) -> Source:
+        return cls(**cfg)
+
+
+class PsutilSource(Source):
+    kind = "psutil"
+
+    def __init__(self, origin: str | None = None, **kwargs: Any) -> None:  # noqa: ANN401
+        super().__init__(origin or socket.gethostname(), **kwargs)
+        psutil.cpu_percent(interval=None)  # First call only sets the baseline
+
+    # Both calls are cheap, non-blocking reads of /proc (or the OS
+    # equivalent), so they run on the event loop rather than in a thread
+    async def poll(self) -> list[JSON]:
+        return [
+            {
+                "name": "CPU Usage",
+                "value": psutil.cpu_percent(interval=None),
+                "unit": "%",
+            },
+            {
+                "name": "RAM Usage",
+                "value": psutil.virtual_memory().used / BYTES_PER_MB,
+                "unit": "MB",
+            },
+        ]
+
+
+# Polls a JSON HTTP endpoint and picks metrics out by dotted path, e.g.
+# {"Temperature": {"path": "main.temp", "unit": "°C"}} for OpenWeather
+class HttpJsonSource(Source):
+    kind = "http_json"
+
+    url: str
+    metrics: Mapping[str, JSON]
+    params: JSON
+    session: requests.Session
+
+    def __init__(
+        self,
+        origin: str,
+        url: str,
+        metrics: Mapping[str, JSON],
+        *,
+        params: JSON | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        super().__init__(origin, **kwargs)
+        self.url = url
+        self.metrics = metrics
+        self.params = params or {}
+        self.session = requests.Session()
+
+    async def poll(self) -> list[JSON]:
+        # requests is blocking; a worker thread keeps the loop free for the
+        # other sources. The request timeout matches the scheduler's, so the
+        # thread does not outlive an abandoned poll for long
+        response: requests.Response = await asyncio.to_thread(
+            self.session.get,
+            self.url,
+            params=self.params,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body: Any = response.json()
+
+        return [
+            {
+                "name": name,
+                "value": float(_lookup(body, spec["path"])),
+                "unit": spec.get("unit", ""),
+            }
+            for name, spec in self.metrics.items()
+        ]
+
+
+SOURCE_TYPES: Final[dict[str, type[Source]]] = {
+    PsutilSource.kind: PsutilSource,
+    HttpJsonSource.kind: HttpJsonSource,
+}
+
+
+def load_sources(path: Path) -> list[Source]:
+    with Path.open(path, encoding="utf-8") as file:
+        specs: list[JSON] = load(file)
+
+    sources: list[Source] = []
+    for spec in specs:
+        kind: str = spec.pop("type")
+        if kind not in SOURCE_TYPES:
+            err_msg: str = f"Unknown source type {kind!r} in {path}"
+            raise ValueError(err_msg)
+        sources.append(SOURCE_TYPES[kind].from_config(spec))
+
+    return sources
+
+
+def _lookup(body: Any, path: str) -> Any:  # noqa: ANN401
+    value: Any = body
+    for key in path.split("."):
+        value = value[int(key)] if isinstance(value, list) else value[key]
+    return value
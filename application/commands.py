@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Final
+
+from sqlalchemy import and_, func, insert, or_, select, update
+
+from application.common.util import as_utc, utc_now
+from application.models import Device, DeviceCommand
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from sqlalchemy import ColumnElement
+    from sqlalchemy.engine import Row
+
+    from application.common._types import JSON
+    from application.storage import StorageBackend
+    from application.validation import CommandPayload
+
+COLUMNS: Final[tuple[Any, ...]] = (
+    DeviceCommand.id,
+    Device.name,
+    DeviceCommand.command,
+    DeviceCommand.args,
+    DeviceCommand.status,
+    DeviceCommand.attempts,
+    DeviceCommand.result,
+    DeviceCommand.created_at,
+    DeviceCommand.expires_at,
+    DeviceCommand.delivered_at,
+    DeviceCommand.acked_at,
+)
+
+
+# Per-origin command queues, persisted in device_command and handed out to
+# long-polling collectors. A poll parks on its origin's Event and is woken
+# by enqueue() in this process, or by sync() for commands enqueued through
+# another worker; the database is only read when there is something to find
+# (plus once per poll, for commands queued while the device was away).
+# Parked polls cost a thread each under gthread workers, a greenlet under
+# gevent ones, which is what to run when many devices stay connected
+class CommandHub:
+    DEFAULT_POLL_TIMEOUT: Final[float] = 30.0
+    DEFAULT_MAX_POLL_TIMEOUT: Final[float] = 300.0
+    DEFAULT_MAX_WAITERS: Final[int] = 10000
+    DEFAULT_REDELIVER_AFTER: Final[float] = 300.0
+    DEFAULT_BATCH_SIZE: Final[int] = 10
+
+    storage: StorageBackend
+    logger: Logger
+    poll_timeout: float
+    max_poll_timeout: float
+    max_waiters: int
+    redeliver_after: timedelta
+    batch_size: int
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        logger: Logger,
+        cfg: dict[str, Any],
+    ) -> None:
+        self.storage = storage
+        self.logger = logger
+        self.poll_timeout = cfg.get("poll_timeout", CommandHub.DEFAULT_POLL_TIMEOUT)
+        self.max_poll_timeout = cfg.get(
+            "max_poll_timeout",
+            CommandHub.DEFAULT_MAX_POLL_TIMEOUT,
+        )
+        self.max_waiters = cfg.get("max_waiters", CommandHub.DEFAULT_MAX_WAITERS)
+        self.redeliver_after = timedelta(
+            seconds=cfg.get("redeliver_after", CommandHub.DEFAULT_REDELIVER_AFTER),
+        )
+        self.batch_size = cfg.get("batch_size", CommandHub.DEFAULT_BATCH_SIZE)
+        # origin -> (event, parked polls)
+        self._waiters: dict[str, tuple[threading.Event, int]] = {}
+        self._parked: int = 0
+        self._watermark: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._sync_stop: threading.Event = threading.Event()
+
+    def __len__(self) -> int:
+        return self._parked
+
+    def enqueue(self, payload: CommandPayload) -> JSON:
+        device_id: int = self.storage.dims.device_ids([payload.origin])[payload.origin]
+        now: dt = utc_now()
+
+        with self.storage.writer.begin() as conn:
+            command_id: int = conn.execute(
+                insert(DeviceCommand)
+                .values(
+                    device_id=device_id,
+                    command=payload.command,
+                    args=payload.args,
+                    status="pending",
+                    attempts=0,
+                    created_at=now,
+                    expires_at=(
+                        None
+                        if payload.ttl is None
+                        else now + timedelta(seconds=payload.ttl)
+                    ),
+                )
+                .returning(DeviceCommand.id),
+            ).scalar_one()
+
+        self.wake(payload.origin)
+        self.logger.info("Command %r queued for %s", payload.command, payload.origin)
+        return self.get(command_id) or {}
+
+    def wake(self, origin: str) -> None:
+        with self._lock:
+            waiter: tuple[threading.Event, int] | None = self._waiters.get(origin)
+        if waiter is not None:
+            waiter[0].set()
+
+    # The commands claimed for `origin`, waiting up to `timeout` seconds for
+    # one to arrive; None when too many polls are already parked
+    def poll(self, origin: str, timeout: float, limit: int) -> list[JSON] | None:
+        event: threading.Event | None = self._park(origin)
+        if event is None:
+            return None
+
+        deadline: float = time.monotonic() + timeout
+        try:
+            while True:
+                # Cleared before looking, so an enqueue after the claim
+                # finds nothing still wakes the wait below
+                event.clear()
+                commands: list[JSON] = self.claim(origin, limit)
+                remaining: float = deadline - time.monotonic()
+                if commands or remaining <= 0:
+                    return commands
+                event.wait(remaining)
+        finally:
+            self._unpark(origin)
+
+    def claim(self, origin: str, limit: int) -> list[JSON]:
+        now: dt = utc_now()
+
+        # Looked up on the reader first; most polls find nothing and so
+        # never queue for the writer
+        with self.storage.reader.connect() as conn:
+            ids: list[int] = list(
+                conn.execute(
+                    select(DeviceCommand.id)
+                    .join(Device, Device.id == DeviceCommand.device_id)
+                    .where(Device.name == origin, self._claimable(now))
+                    .order_by(DeviceCommand.id)
+                    .limit(limit),
+                ).scalars(),
+            )
+
+        if not ids:
+            return []
+
+        # Re-checked in the UPDATE, so concurrent polls never both claim one
+        with self.storage.writer.begin() as conn:
+            claimed: list[int] = list(
+                conn.execute(
+                    update(DeviceCommand)
+                    .where(DeviceCommand.id.in_(ids), self._claimable(now))
+                    .values(
+                        status="delivered",
+                        delivered_at=now,
+                        attempts=DeviceCommand.attempts + 1,
+                    )
+                    .returning(DeviceCommand.id),
+                ).scalars(),
+            )
+
+        return self.find(ids=sorted(claimed)) if claimed else []
+
+    def _claimable(self, now: dt) -> ColumnElement[bool]:
+        return and_(
+            or_(
+                DeviceCommand.status == "pending",
+                and_(
+                    DeviceCommand.status == "delivered",
+                    DeviceCommand.delivered_at < now - self.redeliver_after,
+                ),
+            ),
+            or_(DeviceCommand.expires_at.is_(None), DeviceCommand.expires_at > now),
+        )
+
+    def ack(
+        self,
+        origin: str,
+        command_id: int,
+        *,
+        ok: bool,
+        result: Any = None,  # noqa: ANN401
+    ) -> JSON | None:
+        with self.storage.writer.begin() as conn:
+            acked: int | None = conn.execute(
+                update(DeviceCommand)
+                .where(
+                    DeviceCommand.id == command_id,
+                    DeviceCommand.status == "delivered",
+                    DeviceCommand.device_id
+                    == select(Device.id).where(Device.name == origin).scalar_subquery(),
+                )
+                .values(
+                    status="acked" if ok else "failed",
+                    result=result,
+                    acked_at=utc_now(),
+                )
+                .returning(DeviceCommand.id),
+            ).scalar_one_or_none()
+
+        return None if acked is None else self.get(acked)
+
+    def get(self, command_id: int) -> JSON | None:
+        found: list[JSON] = self.find(ids=[command_id])
+        return found[0] if found else None
+
+    def find(
+        self,
+        *,
+        ids: list[int] | None = None,
+        origin: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+    ) -> list[JSON]:
+        query: Any = (
+            select(*COLUMNS)
+            .join(Device, Device.id == DeviceCommand.device_id)
+            .order_by(DeviceCommand.id.desc() if ids is None else DeviceCommand.id)
+            .limit(limit)
+        )
+        if ids is not None:
+            query = query.where(DeviceCommand.id.in_(ids))
+        if origin is not None:
+            query = query.where(Device.name == origin)
+        if status is not None:
+            query = query.where(DeviceCommand.status == status)
+
+        with self.storage.reader.connect() as conn:
+            return [_to_json(row) for row in conn.execute(query).all()]
+
+    # Only needed with several worker processes
+    def start_sync(self, interval: float) -> None:
+        with self.storage.reader.connect() as conn:
+            self._watermark = conn.execute(
+                select(func.coalesce(func.max(DeviceCommand.id), 0)),
+            ).scalar_one()
+
+        def run() -> None:
+            while not self._sync_stop.wait(interval):
+                try:
+                    self.sync()
+                except Exception:  # noqa: PERF203
+                    self.logger.exception("Command sync failed")
+
+        threading.Thread(target=run, name="command-sync", daemon=True).start()
+
+    def stop_sync(self) -> None:
+        self._sync_stop.set()
+
+    # Wakes parked polls for commands enqueued by other processes since the
+    # last call; one indexed query per interval, and none while nobody waits
+    def sync(self) -> int:
+        with self._lock:
+            origins: set[str] = set(self._waiters)
+        if not origins:
+            return 0
+
+        with self.storage.reader.connect() as conn:
+            rows: list[Row] = list(
+                conn.execute(
+                    select(DeviceCommand.id, Device.name)
+                    .join(Device, Device.id == DeviceCommand.device_id)
+                    .where(DeviceCommand.id > self._watermark),
+                ),
+            )
+
+        for command_id, origin in rows:
+            self._watermark = max(self._watermark, command_id)
+            if origin in origins:
+                self.wake(origin)
+        return len(rows)
+
+    def _park(self, origin: str) -> threading.Event | None:
+        with self._lock:
+            if self._parked >= self.max_waiters:
+                return None
+            event, count = self._waiters.get(origin, (threading.Event(), 0))
+            self._waiters[origin] = (event, count + 1)
+            self._parked += 1
+            return event
+
+    def _unpark(self, origin: str) -> None:
+        with self._lock:
+            event, count = self._waiters[origin]
+            if count == 1:
+                del self._waiters[origin]
+            else:
+                self._waiters[origin] = (event, count - 1)
+            self._parked -= 1
+
+
+def _to_json(row: Row) -> JSON:
+    (
+        command_id,
+        origin,
+        command,
+        args,
+        status,
+        attempts,
+        result,
+        created_at,
+        expires_at,
+        delivered_at,
+        acked_at,
+    ) = row
+
+    if (
+        status in {"pending", "delivered"}
+        and expires_at is not None
+        and as_utc(expires_at) <= utc_now()
+    ):
+        status = "expired"
+
+    return {
+        "id": command_id,
+        "origin": origin,
+        "command": command,
+        "args": args,
+        "status": status,
+        "attempts": attempts,
+        "result": result,
+        "created_at": _iso(created_at),
+        "expires_at": _iso(expires_at),
+        "delivered_at": _iso(delivered_at),
+        "acked_at": _iso(acked_at),
+    }
+
+
+def _iso(value: dt | None) -> str | None:
+    return None if value is None else as_utc(value).isoformat()
@@ -1,12 +1,24 @@
 from application.common._types import JSON
-from application.common.console_io import clear_scr, print_snapshots
-from application.common.util import app_route, utc_now
+from application.common.console_io import ConsoleEcho, clear_scr, print_snapshots
+from application.common.util import (
+    app_route,
+    as_utc,
+    decode_cursor,
+    encode_cursor,
+    parse_time,
+    utc_now,
+)
 
 __version__: str = "0.1.0"
 __all__: list[str] = [
     "JSON",
+    "ConsoleEcho",
     "app_route",
+    "as_utc",
     "clear_scr",
+    "decode_cursor",
+    "encode_cursor",
+    "parse_time",
     "print_snapshots",
     "utc_now",
 ]
@@ -1,13 +1,23 @@
+from __future__ import annotations
+
+import contextlib
 import os
+import queue
+import threading
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
 
-from application.models import MetricSnapshot
+    from application.ingest import SnapshotRow
+    from application.models import MetricSnapshot
 
 
 def clear_scr() -> None:
     os.system("cls" if os.name == "nt" else "clear")  # noqa: S605
 
 
-def print_snapshots(snapshots: list[MetricSnapshot]) -> None:
+def print_snapshots(snapshots: Sequence[MetricSnapshot | SnapshotRow]) -> None:
     print("\n\033[1;92m===========================\033[0;0m\n")
 
     for snapshot in snapshots:
@@ -21,3 +31,34 @@ def print_snapshots(snapshots: list[MetricSnapshot]) -> None:
             print(f"        {metric}")
 
     print("\n\033[1;92m============================\033[0;0m\n")
+
+
+# Echoes ingested snapshots to the terminal from a background thread, so the
+# screen clear (a shell fork) and printing never run on the request path.
+# Best effort: when the terminal falls behind, batches are dropped
+class ConsoleEcho:
+    MAX_PENDING: Final[int] = 64
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue[Sequence[MetricSnapshot | SnapshotRow]] = queue.Queue(
+            ConsoleEcho.MAX_PENDING
+        )
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run,
+            name="console-echo",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def show(self, snapshots: Sequence[MetricSnapshot | SnapshotRow]) -> None:
+        with contextlib.suppress(queue.Full):
+            self._queue.put_nowait(snapshots)
+
+    def _run(self) -> None:
+        while True:
+            snapshots: Sequence[MetricSnapshot | SnapshotRow] = self._queue.get()
+            clear_scr()
+            print_snapshots(snapshots)
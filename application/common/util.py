@@ -10,15 +10,42 @@ def utc_now() -> dt:
     return dt.now(tz.utc)
 
 
+def as_utc(value: dt) -> dt:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=tz.utc)
+    return value.astimezone(tz.utc)
+
+
+def parse_time(value: str) -> dt:
+    return as_utc(dt.fromisoformat(value))
+
+
+def encode_cursor(timestamp: dt, row_id: int) -> str:
+    return f"{timestamp.isoformat()},{row_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[dt, int]:
+    timestamp, sep, row_id = cursor.rpartition(",")
+
+    if not sep:
+        err_msg: str = f"Invalid cursor: {cursor!r}"
+        raise ValueError(err_msg)
+
+    return parse_time(timestamp), int(row_id)
+
+
 def app_route(*args: str, **kwargs: Any) -> Callable:  # noqa: ANN401
     def decorator(func: Callable) -> Callable:
         func.routes = args  # type: ignore  # noqa: PGH003
         func.kwargs = kwargs  # type: ignore  # noqa: PGH003
 
         @wraps(func)
-        def wrapper(self: Any) -> str:  # noqa: ANN401
+        def wrapper(self: Any, **view_args: Any) -> Any:  # noqa: ANN401
             current_app.logger.info("Route accessed: %s", args)
-            return func(self)
+            instruments: Any = getattr(self, "instruments", None)
+            if instruments is None:
+                return func(self, **view_args)
+            return instruments.call_route(func, self, **view_args)
 
         return wrapper
 
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import gzip
+import io
+import math
+import struct
+import zlib
+from datetime import datetime as dt
+from datetime import timedelta
+from datetime import timezone as tz
+from typing import TYPE_CHECKING, Final
+
+from application.common.util import parse_time
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from application.common._types import JSON
+
+    type WireMetric = tuple[str, float, str]
+    type WireSnapshot = tuple[str, dt, list[WireMetric]]
+
+JSON_CONTENT_TYPE: Final[str] = "application/json"
+COMPACT_CONTENT_TYPE: Final[str] = "application/x-cotc-snapshots"
+
+# Compact snapshot layout (all integers little-endian):
+#
+#   header      "CTC1", u32 string count, u32 definition count,
+#               u32 snapshot count
+#   strings     per string: u16 byte length, UTF-8 bytes
+#   definitions per metric: u32 name string index, u32 unit string index
+#   snapshots   per snapshot: u32 origin string index, i64 epoch
+#               microseconds (UTC), u16 metric count, then per metric:
+#               u32 definition index, f64 value
+#
+# Origins, names and units are sent once per payload and every metric
+# refers to its (name, unit) definition by index, so a collector's
+# repeated metric keys cost 12 bytes per sample instead of a JSON object
+MAGIC: Final[bytes] = b"CTC1"
+HEADER: Final[struct.Struct] = struct.Struct("<4sIII")
+STRING_LENGTH: Final[struct.Struct] = struct.Struct("<H")
+DEFINITION: Final[struct.Struct] = struct.Struct("<II")
+SNAPSHOT: Final[struct.Struct] = struct.Struct("<IqH")
+METRIC: Final[struct.Struct] = struct.Struct("<Id")
+
+EPOCH: Final[dt] = dt(1970, 1, 1, tzinfo=tz.utc)
+
+ENCODINGS: Final[tuple[str, ...]] = (
+    ("identity", "gzip", "zstd") if zstandard is not None else ("identity", "gzip")
+)
+
+
+class UnsupportedEncodingError(ValueError):
+    pass
+
+
+class PayloadTooLargeError(ValueError):
+    pass
+
+
+def encode(snapshots: Iterable[JSON]) -> bytes:
+    strings: dict[str, int] = {}
+    definitions: dict[tuple[int, int], int] = {}
+    records: list[bytes] = []
+    n_snapshots: int = 0
+
+    def intern(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    for snapshot in snapshots:
+        timestamp: dt | str = snapshot["timestamp"]
+        if isinstance(timestamp, str):
+            timestamp = parse_time(timestamp)
+
+        metrics: list[JSON] = snapshot["metrics"]
+        records.append(
+            SNAPSHOT.pack(
+                intern(snapshot["origin"]),
+                (timestamp - EPOCH) // timedelta(microseconds=1),
+                len(metrics),
+            ),
+        )
+        records.extend(
+            METRIC.pack(
+                definitions.setdefault(
+                    (intern(m["name"]), intern(m["unit"])),
+                    len(definitions),
+                ),
+                m["value"],
+            )
+            for m in metrics
+        )
+        n_snapshots += 1
+
+    parts: list[bytes] = [
+        HEADER.pack(MAGIC, len(strings), len(definitions), n_snapshots),
+    ]
+    for value in strings:
+        data: bytes = value.encode()
+        parts.extend((STRING_LENGTH.pack(len(data)), data))
+    parts.extend(DEFINITION.pack(name, unit) for name, unit in definitions)
+    parts.extend(records)
+
+    return b"".join(parts)
+
+
+def decode(data: bytes) -> list[WireSnapshot]:
+    try:
+        return _decode(memoryview(data))
+    except (struct.error, IndexError, UnicodeDecodeError, OverflowError) as e:
+        err_msg: str = f"Malformed compact payload: {e}"
+        raise ValueError(err_msg) from e
+
+
+def _decode(buf: memoryview) -> list[WireSnapshot]:
+    magic, n_strings, n_definitions, n_snapshots = HEADER.unpack_from(buf)
+    err_msg: str
+
+    if magic != MAGIC:
+        err_msg = f"Invalid compact payload magic: {bytes(magic)!r}"
+        raise ValueError(err_msg)
+
+    offset: int = HEADER.size
+    strings: list[str] = []
+
+    for _ in range(n_strings):
+        (length,) = STRING_LENGTH.unpack_from(buf, offset)
+        offset += STRING_LENGTH.size
+        end: int = offset + length
+        if end > len(buf):
+            err_msg = "String table overruns payload"
+            raise ValueError(err_msg)
+        strings.append(str(buf[offset:end], "utf-8"))
+        offset = end
+
+    definitions: list[tuple[str, str]] = []
+    for name, unit in DEFINITION.iter_unpack(
+        buf[offset : offset + n_definitions * DEFINITION.size],
+    ):
+        definitions.append((strings[name], strings[unit]))
+    if len(definitions) != n_definitions:
+        err_msg = "Definition table overruns payload"
+        raise ValueError(err_msg)
+    offset += n_definitions * DEFINITION.size
+
+    snapshots: list[WireSnapshot] = []
+
+    for _ in range(n_snapshots):
+        origin, micros, n_metrics = SNAPSHOT.unpack_from(buf, offset)
+        offset += SNAPSHOT.size
+        end = offset + n_metrics * METRIC.size
+        if end > len(buf):
+            err_msg = "Metric records overrun payload"
+            raise ValueError(err_msg)
+
+        snapshots.append(
+            (
+                strings[origin],
+                EPOCH + timedelta(microseconds=micros),
+                _metrics(buf[offset:end], definitions),
+            ),
+        )
+        offset = end
+
+    if offset != len(buf):
+        err_msg = f"{len(buf) - offset} trailing bytes after compact payload"
+        raise ValueError(err_msg)
+
+    return snapshots
+
+
+def _metrics(buf: memoryview, definitions: list[tuple[str, str]]) -> list[WireMetric]:
+    metrics: list[WireMetric] = []
+
+    for definition, value in METRIC.iter_unpack(buf):
+        name, unit = definitions[definition]
+        # As for JSON payloads: NaN and infinities are not storable
+        if not math.isfinite(value):
+            err_msg: str = f"Non-finite value for metric {name!r}"
+            raise ValueError(err_msg)
+        metrics.append((name, value, unit))
+
+    return metrics
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(data)
+    if encoding == "identity":
+        return data
+
+    err_msg: str = f"Unsupported Content-Encoding: {encoding!r}"
+    raise UnsupportedEncodingError(err_msg)
+
+
+def decompress(data: bytes, encoding: str | None, max_size: int) -> bytes:
+    # Reads at most max_size + 1 bytes so a small compressed body cannot
+    # expand into an arbitrarily large buffer
+    out: bytes
+    err_msg: str
+
+    if encoding in {None, "", "identity"}:
+        out = data
+    elif encoding in {"gzip", "x-gzip"}:
+        try:
+            out = zlib.decompressobj(wbits=31).decompress(data, max_size + 1)
+        except zlib.error as e:
+            err_msg = f"Invalid gzip body: {e}"
+            raise ValueError(err_msg) from e
+    elif encoding == "zstd" and zstandard is not None:
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as r:
+                out = r.read(max_size + 1)
+        except zstandard.ZstdError as e:
+            err_msg = f"Invalid zstd body: {e}"
+            raise ValueError(err_msg) from e
+    else:
+        err_msg = f"Unsupported Content-Encoding: {encoding!r}"
+        raise UnsupportedEncodingError(err_msg)
+
+    if len(out) > max_size:
+        err_msg = f"Decoded body exceeds maximum of {max_size} bytes"
+        raise PayloadTooLargeError(err_msg)
+
+    return out
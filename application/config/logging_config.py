@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import atexit
+import copy
 import datetime as dt
 import json
 import logging
-from typing import Final
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from typing import Any, Final
 
 
 class StdFormatter(logging.Formatter):
@@ -14,32 +20,55 @@ class StdFormatter(logging.Formatter):
         logging.ERROR: "\033[1;91m",
         logging.CRITICAL: "\033[1;91m",
     }
+    COLOR_START: Final[str] = "<colorstart>"
+    COLOR_END: Final[str] = "<colorend>"
+    COLOR_RESET: Final[str] = "\033[0;0m"
 
     fmt: str | None
 
     def __init__(self, *, fmt: str | None = None, datefmt: str | None = None) -> None:
-        super().__init__()
-        self.fmt: str | None = fmt
-        self.datefmt: str | None = "%H:%M:%S" if datefmt is None else datefmt
+        self.fmt = fmt
+        datefmt = "%H:%M:%S" if datefmt is None else datefmt
+        super().__init__(self._plain(fmt), datefmt=datefmt)
+
+        # One formatter per level, built once rather than per record
+        self._formatters: dict[int, logging.Formatter] = {
+            level: logging.Formatter(self._colored(fmt, color), datefmt=datefmt)
+            for level, color in StdFormatter.COLORS.items()
+        }
 
     def format(self, record: logging.LogRecord) -> str:
-        if self.fmt is not None:
-            cslen: int = len("<colorstart>")
-            celen: int = len("<colorend>")
+        formatter: logging.Formatter | None = self._formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
+
+    @staticmethod
+    def _colored(fmt: str | None, color: str) -> str | None:
+        if fmt is None:
+            return None
 
-            cs: int = self.fmt.find("<colorstart>")
-            ce: int = self.fmt.find("<colorend>")
+        cs: int = fmt.find(StdFormatter.COLOR_START)
+        ce: int = fmt.find(StdFormatter.COLOR_END)
 
-            if cs != -1 and ce != -1:
-                fmt = (
-                    f"{self.fmt[:cs]}"
-                    f"{StdFormatter.COLORS[record.levelno]}"
-                    f"{self.fmt[cs + cslen : ce]}"
-                    "\033[0;0m"
-                    f"{self.fmt[ce + celen :]}"
-                )
+        if cs == -1 or ce == -1:
+            return fmt
+
+        return (
+            f"{fmt[:cs]}{color}"
+            f"{fmt[cs + len(StdFormatter.COLOR_START) : ce]}"
+            f"{StdFormatter.COLOR_RESET}"
+            f"{fmt[ce + len(StdFormatter.COLOR_END) :]}"
+        )
 
-        return logging.Formatter(fmt, datefmt=self.datefmt).format(record)
+    @staticmethod
+    def _plain(fmt: str | None) -> str | None:
+        if fmt is None:
+            return None
+        return fmt.replace(StdFormatter.COLOR_START, "").replace(
+            StdFormatter.COLOR_END,
+            "",
+        )
 
 
 class JsonFormatter(logging.Formatter):
@@ -47,26 +76,36 @@ class JsonFormatter(logging.Formatter):
 
     def __init__(self, *, keys: dict[str, str] | None = None) -> None:
         super().__init__()
-        self.keys: dict[str, str] = keys if keys is not None else {}
+        self.keys = keys if keys is not None else {}
+        # "message" and "timestamp" are computed; the rest map output keys
+        # to LogRecord attributes
+        self._message: bool = "message" in self.keys
+        self._timestamp: bool = "timestamp" in self.keys
+        self._fields: tuple[tuple[str, str], ...] = tuple(
+            (key, attr)
+            for key, attr in self.keys.items()
+            if key not in {"message", "timestamp"}
+        )
 
     def format(self, record: logging.LogRecord) -> str:
-        entry: dict[str, str] = {}
+        entry: dict[str, Any] = {}
 
-        if self.keys.pop("message", None) is not None:
+        if self._message:
             entry["message"] = record.getMessage()
 
-        if self.keys.pop("timestamp", None) is not None:
+        if self._timestamp:
             entry["timestamp"] = dt.datetime.fromtimestamp(
                 record.created,
                 tz=dt.timezone.utc,
             ).isoformat()
 
-        entry.update(
-            {key: getattr(record, val) for key, val in self.keys.items()},
-        )
+        for key, attr in self._fields:
+            entry[key] = getattr(record, attr, None)
 
         if record.exc_info is not None:
             entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
 
         if record.stack_info is not None:
             entry["stack_info"] = self.formatStack(record.stack_info)
@@ -77,3 +116,143 @@ class JsonFormatter(logging.Formatter):
 class DismissErrorsFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
         return record.levelno < logging.WARNING
+
+
+# Token bucket per message template (e.g. "Route accessed: %s"), for records
+# at or below `max_level`: up to `burst` at once, then `rate` per second.
+# The next record let through notes how many were dropped in between
+class RateLimitFilter(logging.Filter):
+    rate: float
+    burst: float
+    max_level: int
+
+    def __init__(
+        self,
+        *,
+        rate: float,
+        burst: float,
+        max_level: int | str = logging.INFO,
+    ) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = (
+            logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        )
+        self._buckets: dict[tuple[str, str], tuple[float, float]] = {}
+        self._suppressed: dict[tuple[str, str], int] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        key: tuple[str, str] = (record.name, str(record.msg))
+        now: float = time.monotonic()
+
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+
+            self._buckets[key] = (tokens - 1, now)
+            suppressed: int = self._suppressed.pop(key, 0)
+
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+
+class LogQueueHandler(QueueHandler):
+    # Bounded and non-blocking: a full queue drops the record rather than
+    # stall the logging thread
+    dropped: int
+
+    def __init__(self, queue: Queue) -> None:
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    # The base class bakes the traceback into the message; keep it in
+    # exc_text instead so formatters can still report it separately
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Moves the root logger's configured handlers behind a queue, so formatting
+# and I/O (console, rotating file) happen on one background thread and the
+# calling thread only filters and enqueues
+class LogPipeline:
+    DEFAULT_QUEUE_SIZE: Final[int] = 10000
+
+    handler: LogQueueHandler
+    listener: QueueListener
+    queue_size: int
+
+    def __init__(
+        self,
+        handlers: list[logging.Handler],
+        *,
+        queue_size: int | None = None,
+        filters: list[logging.Filter] | None = None,
+    ) -> None:
+        self.queue_size = (
+            LogPipeline.DEFAULT_QUEUE_SIZE if queue_size is None else queue_size
+        )
+        queue: Queue = Queue(self.queue_size)
+        self.handler = LogQueueHandler(queue)
+        for log_filter in filters or []:
+            self.handler.addFilter(log_filter)
+        self.listener = QueueListener(queue, *handlers, respect_handler_level=True)
+
+    @staticmethod
+    def install(logger: logging.Logger, cfg: dict[str, Any]) -> LogPipeline:
+        filters: list[logging.Filter] = []
+        if cfg.get("rate_limit"):
+            filters.append(RateLimitFilter(**cfg["rate_limit"]))
+
+        pipeline: LogPipeline = LogPipeline(
+            list(logger.handlers),
+            queue_size=cfg.get("queue_size"),
+            filters=filters,
+        )
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(pipeline.handler)
+
+        pipeline.start()
+        atexit.register(pipeline.stop)
+        return pipeline
+
+    def start(self) -> None:
+        self.listener.start()
+
+    # Flushes what is queued, then stops the thread
+    def stop(self) -> None:
+        if self.listener._thread is not None:  # noqa: SLF001
+            self.listener.stop()
+
+    # The listener thread does not survive fork(); records queued in the
+    # parent were (or will be) written by the parent, so start afresh
+    def after_fork(self) -> None:
+        queue: Queue = Queue(self.queue_size)
+        self.handler.queue = queue
+        self.listener.queue = queue
+        self.listener._thread = None  # noqa: SLF001
+        self.listener.start()
@@ -1,35 +1,102 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+import atexit
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final
 
+from flask import has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from requests import status_codes
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.orm import selectinload
 
-from application.models import Base, Metric, MetricSnapshot
+from application.archive import Archive, Archiver
+from application.cache import LatestCache
+from application.common.console_io import print_snapshots
+from application.common.wire import JSON_CONTENT_TYPE
+from application.ingest import BatchIngester, SnapshotRow, WriteBehindQueue
+from application.models import Base, Device, MetricSnapshot
+from application.retention import RetentionJob
+from application.storage import create_backend
 
 if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from datetime import datetime as dt
     from types import TracebackType
 
+    from flask import Response
     from flask.ctx import AppContext
+    from sqlalchemy.engine import Engine, Row
+    from sqlalchemy.orm import Query
+    from sqlalchemy.sql.elements import UnaryExpression
 
     from application.base import AppBase
+    from application.series import Series
+    from application.storage import StorageBackend
 
 
 class DB(SQLAlchemy):
+    QUERY_COUNT_KEY: Final[str] = "cotc.query_count"
+
     app: AppBase
+    storage: StorageBackend
+    reader: Engine
+    writer: Engine
+    ingester: BatchIngester
+    latest: LatestCache
+    write_behind: WriteBehindQueue | None
+    archive: Archive | None
+    retention: RetentionJob | None
 
     def __init__(self, app: AppBase) -> None:
         super().__init__(app)
         self.app = app
-        self.context: AppContext | None = None
+        # Per-thread stack, so concurrent (and nested) `with db:` blocks
+        # each exit the context they entered
+        self._contexts: threading.local = threading.local()
+        self._sync_stop: threading.Event = threading.Event()
 
         with self:
+            self.storage = create_backend(
+                self.engine,
+                app.config["STORAGE"],
+                resolutions=app.config["ROLLUP"].get("resolutions"),
+            )
+            self.reader = self.storage.reader
+            self.writer = self.storage.writer
+
             Base.metadata.bind = self.engine
             Base.query = self.session.query_property()
+            self.ingester = BatchIngester(
+                self.storage,
+                app.logger,
+                max_batch_size=app.config["INGEST"].get("max_batch_size"),
+            )
+            self.latest = LatestCache()
+            self.ingester.subscribe(self.latest.update)
             self.init()
+            self._warm_latest()
+
+            if app.debug:
+                self._init_query_counter()
+
+        self.write_behind = None
+        if app.config["INGEST"].get("mode") == "async":
+            self._init_write_behind(app.config["INGEST"])
+
+        self.archive = None
+        if app.config["ARCHIVE"].get("enabled"):
+            self._init_archive(app.config["ARCHIVE"])
+
+        self.retention = None
+        if app.config["RETENTION"].get("enabled"):
+            self._init_retention(app.config["RETENTION"])
 
     def __enter__(self) -> AppContext:
-        self.context = self.app.app_context()
-        return self.context.__enter__()
+        context: AppContext = self.app.app_context()
+        self._context_stack().append(context)
+        return context.__enter__()
 
     def __exit__(
         self,
@@ -37,39 +104,214 @@ class DB(SQLAlchemy):
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        if self.context is not None:
-            self.context.__exit__(exc_type, exc_val, exc_tb)
-        self.context = None
+        stack: list[AppContext] = self._context_stack()
+        if stack:
+            stack.pop().__exit__(exc_type, exc_val, exc_tb)
+
+    def _context_stack(self) -> list[AppContext]:
+        stack: list[AppContext] | None = getattr(self._contexts, "stack", None)
+        if stack is None:
+            stack = self._contexts.stack = []
+        return stack
+
+    def after_fork(self, *, sync_latest: bool) -> None:
+        # Pooled connections and background threads do not survive fork();
+        # drop the inherited connections without closing the parent's, and
+        # restart the per-process ingest writer. Retention stays with the
+        # parent so only one process ever purges
+        self.reader.dispose(close=False)
+        self.writer.dispose(close=False)
+        self._contexts = threading.local()
+
+        if self.write_behind is not None:
+            self._init_write_behind(self.app.config["INGEST"])
+
+        self.retention = None
+
+        interval: float | None = self.app.config["SERVER"].get("latest_sync_interval")
+        if sync_latest and interval:
+            self._init_latest_sync(interval)
 
     def init(self) -> None:
-        if self.app.debug:
-            Base.metadata.create_all(self.engine)
-        self.app.logger.info("Database initialized")
-
-    def add_snapshot(self, json: dict[str, Any]) -> tuple[dict[str, str], int]:
-        try:
-            snapshot: MetricSnapshot = MetricSnapshot.from_json(json)
-        except (ValueError, TypeError) as e:
-            self.app.logger.exception("Error parsing JSON data")
-            return {"status": "error", "message": str(e)}, 400
+        self.storage.setup(self.app.logger)
+        self.app.logger.info("Database initialized (%r)", self.storage)
+
+    def _warm_latest(self) -> None:
+        self.latest.update(self.newest())
+        self.app.logger.info("Latest cache warmed for %d origins", len(self.latest))
+
+    def _init_latest_sync(self, interval: float) -> None:
+        # Each worker process only sees its own ingests; polling the newest
+        # row per origin keeps its latest cache (and its stream clients)
+        # at most `interval` seconds behind the others
+        def run() -> None:
+            while not self._sync_stop.wait(interval):
+                try:
+                    self.sync_latest()
+                except Exception:  # noqa: PERF203
+                    self.app.logger.exception("Latest cache sync failed")
+
+        threading.Thread(target=run, name="latest-sync", daemon=True).start()
+        atexit.register(self._sync_stop.set)
+
+    def sync_latest(self) -> int:
+        rows: list[SnapshotRow] = self.latest.newer(self.newest())
+        if rows:
+            self.ingester.notify(rows)
+        return len(rows)
+
+    def newest(self) -> list[SnapshotRow]:
+        return self.storage.latest()
+
+    def _init_query_counter(self) -> None:
+        # Counted on the request rather than `g`, as `with self` pushes a
+        # fresh app context (and so a fresh `g`) inside each route
+        def count_query(*_: Any) -> None:  # noqa: ANN401
+            if has_request_context():
+                environ: dict[str, Any] = request.environ
+                environ[DB.QUERY_COUNT_KEY] = environ.get(DB.QUERY_COUNT_KEY, 0) + 1
+
+        for engine in {self.reader, self.writer}:
+            event.listen(engine, "before_cursor_execute", count_query)
+
+        @self.app.after_request
+        def add_query_count(response: Response) -> Response:
+            count: int = request.environ.get(DB.QUERY_COUNT_KEY, 0)
+            response.headers["X-Query-Count"] = str(count)
+            self.app.logger.debug("Queries executed: %d", count)
+            return response
+
+    def _init_write_behind(self, cfg: dict[str, Any]) -> None:
+        self.write_behind = WriteBehindQueue(
+            self.ingester,
+            self.app.logger,
+            max_size=cfg["queue_size"],
+            flush_size=cfg["flush_size"],
+            flush_interval=cfg["flush_interval"],
+        )
+        self.write_behind.start()
+        atexit.register(self.write_behind.close)
+        self.app.logger.info("Write-behind ingest enabled")
+
+    def _init_archive(self, cfg: dict[str, Any]) -> None:
+        self.archive = Archive(
+            Path(self.app.instance_path) / cfg.get("path", "archive"),
+            compression_level=cfg.get("compression_level"),
+        )
+        self.storage.archive = self.archive
+        atexit.register(self.archive.close)
+        self.app.logger.info("Archive enabled (%s)", self.archive.root)
+
+    # Archiving is part of the retention run, so also stays with the parent
+    def _init_retention(self, cfg: dict[str, Any]) -> None:
+        archiver: Archiver | None = None
+        if self.archive is not None:
+            archiver = Archiver(
+                self.storage,
+                self.archive,
+                self.app.logger,
+                self.app.config["ARCHIVE"],
+            )
+
+        self.retention = RetentionJob(
+            self.storage,
+            self.app.logger,
+            cfg,
+            archiver=archiver,
+        )
+        self.retention.start()
+        atexit.register(self.retention.close)
+        self.app.logger.info("Retention job enabled")
+
+    def add_snapshot(self, json: dict[str, Any]) -> tuple[dict[str, Any], int]:
+        return self.add_snapshots([json])
+
+    def add_snapshots(
+        self,
+        json: bytes | str | Any,  # noqa: ANN401
+        content_type: str = JSON_CONTENT_TYPE,
+    ) -> tuple[dict[str, Any], int]:
+        ret: tuple[dict[str, Any], int] = (
+            self.ingester.ingest(json, content_type)
+            if self.write_behind is None
+            else self.write_behind.ingest(json, content_type)
+        )
+
+        if ret[1] == status_codes.codes.accepted:
+            self.app.logger.info("JSON data queued for database")
+        elif ret[1] != status_codes.codes.ok:
+            self.app.logger.error("Error ingesting JSON data: %s", ret[0])
         else:
-            with self:
-                self._addncom(snapshot)
-                for metric_data in json["metrics"]:
-                    metric: Metric = Metric.from_json(metric_data, snapshot.id)
-                    self._addncom(metric)
-
-        self.app.logger.info("JSON data saved to database")
-        return {"status": "success"}, 200
-
-    def get(self, n: int | None = None, *, desc: bool = False) -> list[MetricSnapshot]:
-        return (
-            self.session.query(MetricSnapshot)
-            .order_by(MetricSnapshot.id.desc() if desc else MetricSnapshot.id.asc())
-            .limit(n)
-            .all()
+            self.app.logger.info("JSON data saved to database")
+
+        return ret
+
+    def get(  # noqa: PLR0913
+        self,
+        n: int | None = None,
+        *,
+        desc: bool = False,
+        before: tuple[dt, int] | None = None,
+        origin: str | None = None,
+        start: dt | None = None,
+        end: dt | None = None,
+        metrics: bool = True,
+    ) -> list[MetricSnapshot]:
+        query: Query[MetricSnapshot] = self.session.query(MetricSnapshot)
+
+        if origin is not None:
+            query = query.filter(
+                MetricSnapshot.device_id
+                == select(Device.id).where(Device.name == origin).scalar_subquery(),
+            )
+        if start is not None:
+            query = query.filter(MetricSnapshot.timestamp >= start)
+        if end is not None:
+            query = query.filter(MetricSnapshot.timestamp < end)
+        if before is not None:
+            query = query.filter(
+                tuple_(MetricSnapshot.timestamp, MetricSnapshot.id) < before,
+            )
+
+        order: tuple[UnaryExpression, ...] = (
+            (MetricSnapshot.timestamp.desc(), MetricSnapshot.id.desc())
+            if desc
+            else (MetricSnapshot.timestamp.asc(), MetricSnapshot.id.asc())
         )
+        if metrics:
+            query = query.options(selectinload(MetricSnapshot.metrics))
+        return query.order_by(*order).limit(n).all()
+
+    # For snapshots fetched with `metrics=False`: one query fills in the
+    # metrics of all of them (they are the same objects, via the session)
+    def load_metrics(self, snapshots: Sequence[MetricSnapshot]) -> None:
+        if not snapshots:
+            return
+        self.session.query(MetricSnapshot).options(
+            selectinload(MetricSnapshot.metrics),
+        ).filter(MetricSnapshot.id.in_([s.id for s in snapshots])).all()
+
+    def rollup(
+        self,
+        origin: str,
+        name: str,
+        start: dt,
+        end: dt,
+        points: int,
+    ) -> tuple[int, Sequence[Row]]:
+        return self.storage.rollup(origin, name, start, end, points)
+
+    def series(  # noqa: PLR0913
+        self,
+        origin: str,
+        metric: str,
+        start: dt,
+        end: dt,
+        *,
+        step: int | None = None,
+        unit: str | None = None,
+    ) -> Series:
+        return self.storage.range(origin, metric, start, end, step=step, unit=unit)
 
-    def _addncom(self, data: Metric | MetricSnapshot) -> None:
-        self.session.add(data)
-        self.session.commit()
+    def print_last(self, n: int) -> None:
+        print_snapshots(self.get(n, desc=True))
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any, Callable
+
+from sqlalchemy import select, tuple_
+
+from application.models import Device, MetricDefinition
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from sqlalchemy import Insert
+    from sqlalchemy.engine import Engine
+
+    type DefinitionKey = tuple[str, str]
+
+
+# Name -> id cache for the device and metric definition tables. Misses are
+# inserted in their own short transaction, so cached ids are always committed
+# (and never rolled back along with a failed ingest batch)
+class Dimensions:
+    engine: Engine
+    insert: Callable[[Any], Insert]
+
+    # `insert` builds the dialect's INSERT, the one with ON CONFLICT support
+    def __init__(self, engine: Engine, insert: Callable[[Any], Insert]) -> None:
+        self.engine = engine
+        self.insert = insert
+        self._devices: dict[str, int] = {}
+        self._definitions: dict[DefinitionKey, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def device_ids(self, names: Iterable[str]) -> dict[str, int]:
+        with self._lock:
+            wanted: set[str] = set(names)
+            missing: set[str] = wanted - self._devices.keys()
+
+            if missing:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        self.insert(Device).on_conflict_do_nothing(),
+                        [{"name": name} for name in missing],
+                    )
+                    self._devices.update(
+                        conn.execute(
+                            select(Device.name, Device.id).where(
+                                Device.name.in_(missing),
+                            ),
+                        ).all(),
+                    )
+
+            return {name: self._devices[name] for name in wanted}
+
+    def definition_ids(self, keys: Iterable[DefinitionKey]) -> dict[DefinitionKey, int]:
+        with self._lock:
+            wanted: set[DefinitionKey] = set(keys)
+            missing: set[DefinitionKey] = wanted - self._definitions.keys()
+
+            if missing:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        self.insert(MetricDefinition).on_conflict_do_nothing(),
+                        [{"name": name, "unit": unit} for name, unit in missing],
+                    )
+                    self._definitions.update(
+                        ((name, unit), definition_id)
+                        for name, unit, definition_id in conn.execute(
+                            select(
+                                MetricDefinition.name,
+                                MetricDefinition.unit,
+                                MetricDefinition.id,
+                            ).where(
+                                tuple_(
+                                    MetricDefinition.name,
+                                    MetricDefinition.unit,
+                                ).in_(missing),
+                            ),
+                        )
+                    )
+
+            return {key: self._definitions[key] for key in wanted}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._devices.clear()
+            self._definitions.clear()
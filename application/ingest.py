@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Callable, Final
+
+from application.common import wire
+from application.common.util import as_utc
+from application.common.wire import COMPACT_CONTENT_TYPE, JSON_CONTENT_TYPE
+from application.validation import PayloadError, validate_snapshots
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from application.common._types import JSON
+    from application.common.wire import WireSnapshot
+    from application.instrumentation import Instrumentation
+    from application.models import MetricSnapshot
+    from application.storage import StorageBackend
+    from application.validation import SnapshotPayload
+
+
+@dataclass(frozen=True, slots=True)
+class MetricRow:
+    name: str
+    value: float
+    unit: str
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotRow:
+    origin: str
+    timestamp: dt
+    metrics: tuple[MetricRow, ...]
+    id: int | None = None
+
+    @staticmethod
+    def from_model(snapshot: MetricSnapshot) -> SnapshotRow:
+        return SnapshotRow(
+            origin=snapshot.origin,
+            timestamp=as_utc(snapshot.timestamp),
+            metrics=tuple(
+                MetricRow(name=m.name, value=m.value, unit=m.unit)
+                for m in snapshot.metrics
+            ),
+            id=snapshot.id,
+        )
+
+    @staticmethod
+    def from_wire(snapshot: WireSnapshot) -> SnapshotRow:
+        origin, timestamp, metrics = snapshot
+        return SnapshotRow(
+            origin=origin,
+            timestamp=timestamp,
+            metrics=tuple(
+                MetricRow(name, value, unit) for name, value, unit in metrics
+            ),
+        )
+
+    def to_json(self) -> JSON:
+        return {
+            "id": self.id,
+            "origin": self.origin,
+            "timestamp": self.timestamp.isoformat(),
+            "metrics": [[m.name, m.value, m.unit] for m in self.metrics],
+        }
+
+    @staticmethod
+    def from_payload(payload: SnapshotPayload) -> SnapshotRow:
+        return SnapshotRow(
+            origin=payload.origin,
+            timestamp=payload.timestamp,
+            metrics=tuple(
+                MetricRow(name=m.name, value=m.value, unit=m.unit)
+                for m in payload.metrics
+            ),
+        )
+
+
+type IngestListener = Callable[[list[SnapshotRow]], None]
+
+
+class BatchIngester:
+    DEFAULT_MAX_BATCH_SIZE: Final[int] = 1000
+
+    storage: StorageBackend
+    logger: Logger
+    max_batch_size: int
+    listeners: list[IngestListener]
+    instruments: Instrumentation | None
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        logger: Logger,
+        *,
+        max_batch_size: int | None = None,
+    ) -> None:
+        self.storage = storage
+        self.logger = logger
+        self.max_batch_size = (
+            BatchIngester.DEFAULT_MAX_BATCH_SIZE
+            if max_batch_size is None
+            else max_batch_size
+        )
+        self.listeners = []
+        self.instruments = None
+
+    def subscribe(self, listener: IngestListener) -> None:
+        self.listeners.append(listener)
+
+    def ingest(
+        self,
+        payload: bytes | str | Any,  # noqa: ANN401
+        content_type: str = JSON_CONTENT_TYPE,
+    ) -> tuple[JSON, int]:
+        rows, error = self.validate(payload, content_type)
+
+        if error is not None:
+            return error
+
+        results: list[JSON] = [
+            {"index": i, "status": "success", "id": snapshot_id}
+            for i, snapshot_id in enumerate(self.write(rows))
+        ]
+        return {"status": "success", "results": results}, 200
+
+    def validate(
+        self,
+        payload: bytes | str | Any,  # noqa: ANN401
+        content_type: str = JSON_CONTENT_TYPE,
+    ) -> tuple[list[SnapshotRow], tuple[JSON, int] | None]:
+        try:
+            rows: list[SnapshotRow] = self.decode(payload, content_type)
+        except PayloadError as e:
+            error: JSON = {"status": "error", "message": str(e)}
+            if e.results:
+                error["results"] = e.results
+            return [], self._rejected(error, 400)
+
+        if len(rows) > self.max_batch_size:
+            msg: str = (
+                f"Batch of {len(rows)} snapshots exceeds "
+                f"maximum of {self.max_batch_size}"
+            )
+            return [], self._rejected({"status": "error", "message": msg}, 413)
+
+        return rows, None
+
+    def _rejected(self, error: JSON, status: int) -> tuple[JSON, int]:
+        if self.instruments is not None:
+            self.instruments.observe_rejected(status)
+        return error, status
+
+    @staticmethod
+    def decode(
+        payload: bytes | str | Any,  # noqa: ANN401
+        content_type: str = JSON_CONTENT_TYPE,
+    ) -> list[SnapshotRow]:
+        if content_type == COMPACT_CONTENT_TYPE:
+            try:
+                return [SnapshotRow.from_wire(s) for s in wire.decode(payload)]
+            except ValueError as e:
+                raise PayloadError(str(e)) from e
+
+        return [SnapshotRow.from_payload(s) for s in validate_snapshots(payload)]
+
+    def write(self, rows: list[SnapshotRow]) -> list[int]:
+        if not rows:
+            return []
+
+        start: float = time.perf_counter()
+        ids: list[int] = self.storage.write(rows)
+
+        if self.instruments is not None:
+            self.instruments.observe_write(
+                len(rows),
+                sum(len(r.metrics) for r in rows),
+                time.perf_counter() - start,
+            )
+
+        self.notify(
+            [
+                replace(row, id=snapshot_id)
+                for row, snapshot_id in zip(rows, ids, strict=True)
+            ],
+        )
+        return ids
+
+    def notify(self, rows: list[SnapshotRow]) -> None:
+        for listener in self.listeners:
+            try:
+                listener(rows)
+            except Exception:  # noqa: PERF203
+                self.logger.exception("Ingest listener %r failed", listener)
+
+
+class WriteBehindQueue:
+    ingester: BatchIngester
+    logger: Logger
+    max_size: int
+    flush_size: int
+    flush_interval: float
+    pending: deque[SnapshotRow]
+    dropped: int
+
+    def __init__(
+        self,
+        ingester: BatchIngester,
+        logger: Logger,
+        *,
+        max_size: int,
+        flush_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.ingester = ingester
+        self.logger = logger
+        self.max_size = max_size
+        self.flush_size = min(flush_size, ingester.max_batch_size)
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.dropped = 0
+        self._closed: bool = False
+        self._cond: threading.Condition = threading.Condition()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run,
+            name="ingest-writer",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def ingest(
+        self,
+        payload: bytes | str | Any,  # noqa: ANN401
+        content_type: str = JSON_CONTENT_TYPE,
+    ) -> tuple[JSON, int]:
+        rows, error = self.ingester.validate(payload, content_type)
+
+        if error is not None:
+            return error
+
+        if not self.submit(rows):
+            return {"status": "error", "message": "Ingest queue is full"}, 503
+
+        results: list[JSON] = [
+            {"index": i, "status": "queued"} for i in range(len(rows))
+        ]
+        return {"status": "accepted", "results": results}, 202
+
+    def submit(self, rows: list[SnapshotRow]) -> bool:
+        with self._cond:
+            if self._closed or len(self.pending) + len(rows) > self.max_size:
+                return False
+
+            self.pending.extend(rows)
+
+            if len(self.pending) >= self.flush_size:
+                self._cond.notify()
+
+        return True
+
+    def close(self, timeout: float | None = None) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+        if self.pending:
+            self.logger.error("Ingest queue closed with %d rows", len(self.pending))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self.pending) >= self.flush_size,
+                    timeout=self.flush_interval,
+                )
+                batch: list[SnapshotRow] = [
+                    self.pending.popleft()
+                    for _ in range(min(len(self.pending), self.flush_size))
+                ]
+                done: bool = self._closed and not self.pending
+
+            if batch:
+                self._flush(batch)
+
+            if done:
+                return
+
+    def _flush(self, batch: list[SnapshotRow]) -> None:
+        try:
+            self.ingester.write(batch)
+        except Exception:
+            self.dropped += len(batch)
+            self.logger.exception("Failed to flush %d queued snapshots", len(batch))
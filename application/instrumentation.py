@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Final
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from pathlib import Path
+
+    from flask import Response
+    from sqlalchemy.engine import Connection, Engine
+
+    type Labels = tuple[str, ...]
+    type Samples = Callable[[], Iterable[tuple[Labels, float]]]
+
+LATENCY_BUCKETS: Final[tuple[float, ...]] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS: Final[tuple[float, ...]] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+CONTENT_TYPE: Final[str] = "text/plain; version=0.0.4; charset=utf-8"
+PROFILE_HEADER: Final[str] = "X-Profile"
+PROFILE_TOP: Final[int] = 40
+QUERY_START_KEY: Final[str] = "cotc.query_start"
+
+STATEMENT: Final[re.Pattern[str]] = re.compile(
+    r'^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+"?(\w+))?',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class Histogram:
+    name: str
+    help: str
+    labels: Labels
+    buckets: tuple[float, ...]
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: per-bucket (non-cumulative) counts, then sum
+        self._series: dict[Labels, tuple[list[int], list[float]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index: int = bisect_left(self.buckets, value)
+        with self._lock:
+            series: tuple[list[int], list[float]] | None = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+
+        with self._lock:
+            snapshot: list[tuple[Labels, list[int], float]] = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._series.items()
+            ]
+
+        for labels, counts, total in sorted(snapshot):
+            pairs: list[tuple[str, str]] = list(zip(self.labels, labels, strict=True))
+            cumulative: int = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                le: str = bound if isinstance(bound, str) else repr(float(bound))
+                yield f"{self.name}_bucket{_labels([*pairs, ('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(pairs)} {total!r}"
+            yield f"{self.name}_count{_labels(pairs)} {cumulative}"
+
+
+class Counter:
+    name: str
+    help: str
+    labels: Labels
+
+    def __init__(self, name: str, help_text: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[Labels, float] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values: list[tuple[Labels, float]] = sorted(self._values.items())
+        for labels, value in values:
+            pairs: list[tuple[str, str]] = list(zip(self.labels, labels, strict=True))
+            yield f"{self.name}{_labels(pairs)} {_number(value)}"
+
+
+# Read at scrape time from state other components already keep (retention
+# stats, queue depths), so those components need no instrumentation calls
+class Collected:
+    name: str
+    help: str
+    kind: str
+    labels: Labels
+    samples: Samples
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        samples: Samples,
+        labels: Labels = (),
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.samples = samples
+        self.labels = labels
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.samples():
+            pairs: list[tuple[str, str]] = list(zip(self.labels, labels, strict=True))
+            yield f"{self.name}{_labels(pairs)} {_number(value)}"
+
+
+# Per-process: under gunicorn each worker keeps (and serves) its own
+# numbers, so scrape through a per-worker address or aggregate on the
+# Prometheus side by instance
+class Instrumentation:
+    request_seconds: Histogram
+    query_seconds: Histogram
+    ingest_batch_size: Histogram
+    ingest_write_seconds: Histogram
+    rows_written: Counter
+    ingest_rejected: Counter
+    profile_dir: Path
+
+    def __init__(self, profile_dir: Path) -> None:
+        self.profile_dir = profile_dir
+        self.request_seconds = Histogram(
+            "cotc_request_duration_seconds",
+            "Route handler time, including rendering",
+            ("route", "method", "status"),
+        )
+        self.query_seconds = Histogram(
+            "cotc_db_query_duration_seconds",
+            "SQL statement execution time",
+            ("engine", "operation", "table"),
+        )
+        self.ingest_batch_size = Histogram(
+            "cotc_ingest_batch_snapshots",
+            "Snapshots per ingest write",
+            buckets=SIZE_BUCKETS,
+        )
+        self.ingest_write_seconds = Histogram(
+            "cotc_ingest_write_duration_seconds",
+            "Time to write one ingest batch, rollups included",
+        )
+        self.rows_written = Counter(
+            "cotc_ingest_rows_total",
+            "Rows written by ingest",
+            ("table",),
+        )
+        self.ingest_rejected = Counter(
+            "cotc_ingest_rejected_total",
+            "Ingest batches rejected before writing",
+            ("status",),
+        )
+        self._metrics: list[Histogram | Counter | Collected] = [
+            self.request_seconds,
+            self.query_seconds,
+            self.ingest_batch_size,
+            self.ingest_write_seconds,
+            self.rows_written,
+            self.ingest_rejected,
+        ]
+
+    def collect(self, metric: Collected) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+    # One start time per connection, as a connection runs one statement at a
+    # time. after_cursor_execute does not fire for a statement that raised;
+    # its start is simply overwritten by the next one
+    def instrument_engine(self, engine: Engine, name: str) -> None:
+        def before(conn: Connection, *_: Any) -> None:  # noqa: ANN401
+            conn.info[QUERY_START_KEY] = time.perf_counter()
+
+        def after(conn: Connection, _cursor: Any, statement: str, *_: Any) -> None:  # noqa: ANN401
+            start: float | None = conn.info.pop(QUERY_START_KEY, None)
+            if start is not None:
+                elapsed: float = time.perf_counter() - start
+                self.query_seconds.observe(elapsed, name, *_classify(statement))
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+
+    def observe_write(self, snapshots: int, metrics: int, seconds: float) -> None:
+        self.ingest_batch_size.observe(snapshots)
+        self.ingest_write_seconds.observe(seconds)
+        self.rows_written.inc(snapshots, "metric_snapshot")
+        self.rows_written.inc(metrics, "metric")
+
+    def observe_rejected(self, status: int) -> None:
+        self.ingest_rejected.inc(1, str(status))
+
+    # Called by the app_route wrapper. In debug, an X-Profile header runs the
+    # handler under cProfile: the stats are saved for snakeviz & co., and
+    # "X-Profile: text" returns the top entries instead of the response
+    def call_route(
+        self,
+        func: Callable[..., Any],
+        app: Any,  # noqa: ANN401
+        **view_args: Any,  # noqa: ANN401
+    ) -> Response:
+        profile: str | None = request.headers.get(PROFILE_HEADER)
+        profiler: cProfile.Profile | None = (
+            cProfile.Profile() if profile and current_app.debug else None
+        )
+
+        start: float = time.perf_counter()
+        if profiler is None:
+            response: Response = current_app.make_response(func(app, **view_args))
+        else:
+            response = current_app.make_response(
+                profiler.runcall(func, app, **view_args),
+            )
+        elapsed: float = time.perf_counter() - start
+
+        rule: str = request.url_rule.rule if request.url_rule else request.path
+        self.request_seconds.observe(
+            elapsed,
+            rule,
+            request.method,
+            str(response.status_code),
+        )
+
+        if profiler is not None:
+            return self._profiled(profiler, response, rule, text=profile == "text")
+        return response
+
+    def _profiled(
+        self,
+        profiler: cProfile.Profile,
+        response: Response,
+        rule: str,
+        *,
+        text: bool,
+    ) -> Response:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        slug: str = re.sub(r"\W+", "_", rule).strip("_") or "root"
+        path: Path = self.profile_dir / f"{utc_now():%Y%m%dT%H%M%S%f}-{slug}.prof"
+        profiler.dump_stats(path)
+
+        if text:
+            out: io.StringIO = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(
+                PROFILE_TOP,
+            )
+            response = current_app.response_class(out.getvalue(), mimetype="text/plain")
+
+        response.headers["X-Profile-File"] = str(path)
+        return response
+
+
+@lru_cache(maxsize=1024)
+def _classify(statement: str) -> tuple[str, str]:
+    match: re.Match[str] | None = STATEMENT.match(statement)
+    if match is None:
+        return "other", ""
+    return match.group(1).lower(), (match.group(2) or "").lower()
+
+
+def _labels(pairs: Sequence[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
@@ -1,52 +1,679 @@
-from json import loads
-from typing import TYPE_CHECKING, Any
+from __future__ import annotations
 
-from flask import render_template, request
+import atexit
+import math
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Final, TypeVar
+
+from flask import Response, render_template, request, url_for
 from requests import status_codes
 
+from application.alerts import AlertEngine, AlertFeed
 from application.base import AppBase
-from application.common.console_io import clear_scr, print_snapshots
-from application.common.util import app_route
+from application.cache import RenderCache
+from application.commands import CommandHub
+from application.common import wire
+from application.common.console_io import ConsoleEcho
+from application.common.util import (
+    app_route,
+    decode_cursor,
+    encode_cursor,
+    parse_time,
+    utc_now,
+)
+from application.common.wire import (
+    COMPACT_CONTENT_TYPE,
+    JSON_CONTENT_TYPE,
+    PayloadTooLargeError,
+    UnsupportedEncodingError,
+)
 from application.db import DB
+from application.instrumentation import CONTENT_TYPE, Collected, Instrumentation
+from application.stats import StatsEngine, correlate
+from application.stream import StreamHub
+from application.validation import PayloadError, validate_command
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from datetime import datetime as dt
+
+    from application.cache import FragmentKey
+    from application.ingest import SnapshotRow
     from application.models import MetricSnapshot
+    from application.series import Series
+    from application.stats import Arrays
+    from application.stream import Subscription
+
+T = TypeVar("T")
 
 
 class App(AppBase):
+    HISTORY_PAGE_SIZE: Final[int] = 50
+    HISTORY_MAX_PAGE_SIZE: Final[int] = 500
+    SERIES_DEFAULT_SPAN: Final[timedelta] = timedelta(days=1)
+    INGEST_CONTENT_TYPES: Final[tuple[str, ...]] = (
+        JSON_CONTENT_TYPE,
+        COMPACT_CONTENT_TYPE,
+    )
+    INGEST_MAX_BODY_SIZE: Final[int] = 16 * 1024 * 1024
+    RENDER_CACHE_PAGES: Final[int] = 256
+    RENDER_CACHE_FRAGMENTS: Final[int] = 5000
+    COMMANDS_PAGE_SIZE: Final[int] = 100
+    STATS_MAX_CORRELATIONS: Final[int] = 8
+    POLL_THREADS: Final[int] = 64
+    STEP_OUT_OF_RANGE: Final[str] = (
+        "step must be positive and at most the requested span"
+    )
+
     db: DB
+    stream: StreamHub
+    renders: RenderCache
+    alerts: AlertEngine
+    alert_feed: AlertFeed | None
+    commands: CommandHub
+    stats: StatsEngine
+    echo: ConsoleEcho | None
+    instruments: Instrumentation | None
 
-    def __init__(self) -> None:
-        super().__init__(__name__)
+    def __init__(self, overrides: dict | None = None) -> None:
+        super().__init__(__name__, overrides)
+        self.instruments = None
+        self.alert_feed = None
         self.db = DB(self)
+        self._init_stream(self.config["STREAM"])
+        self._init_render_cache(self.config["RENDER_CACHE"])
+        self._init_alerts(self.config["ALERTS"])
+        self._init_commands(self.config["COMMANDS"])
+        self._init_stats(self.config["STATS"])
+
+        if self.config["INSTRUMENTATION"].get("enabled"):
+            self._init_instruments(self.config["INSTRUMENTATION"])
+
+        # Terminal output is a development aid only
+        self.echo = None
+        if self.debug and self.config["SERVER"].get("console_echo"):
+            self.echo = ConsoleEcho()
+            self.echo.start()
+            self.db.ingester.subscribe(self.echo.show)
+
+    # Under thread-per-request servers (gthread workers, waitress) each open
+    # /stream response and each parked /commands poll holds a thread until
+    # it ends. Streams get a quarter of `threads`, so the rest always serves
+    # everything else; parked polls get `poll_threads` of their own on top
+    # (server_threads()), so each process parks that many devices at once
+    # and turns the next ones away with a 503 and Retry-After. None under
+    # gevent, where they are greenlets instead
+    def _long_lived_slots(self) -> tuple[int, int] | None:
+        server: dict[str, Any] = self.config["SERVER"]
+        if server.get("worker_class", "gthread") == "gevent":
+            return None
+
+        streams: int = max(server.get("threads", 1) // 4, 1)
+        return streams, server.get("poll_threads", App.POLL_THREADS)
+
+    # Threads per process for the server to run
+    def server_threads(self) -> int:
+        slots: tuple[int, int] | None = self._long_lived_slots()
+        threads: int = self.config["SERVER"].get("threads", 1)
+        return threads if slots is None else threads + slots[1]
+
+    def _init_stream(self, cfg: dict[str, Any]) -> None:
+        slots: tuple[int, int] | None = self._long_lived_slots()
+        if slots is not None:
+            cfg = {**cfg, "max_clients": min(cfg.get("max_clients", 100), slots[0])}
+
+        self.stream = StreamHub(cfg)
+        self.db.ingester.subscribe(self.stream.publish)
+
+    def _init_render_cache(self, cfg: dict[str, Any]) -> None:
+        self.renders = RenderCache(
+            max_pages=cfg.get("max_pages", App.RENDER_CACHE_PAGES),
+            max_fragments=cfg.get("max_fragments", App.RENDER_CACHE_FRAGMENTS),
+        )
+        # Subscribed after the latest cache, so pages are only invalidated
+        # once the new data is readable. Under several workers, the others
+        # bump when their latest sync picks the rows up
+        self.db.ingester.subscribe(self.renders.bump)
+        if self.db.retention is not None:
+            self.db.retention.subscribe(self.renders.bump)
+
+    def _init_alerts(self, cfg: dict[str, Any]) -> None:
+        self.alerts = AlertEngine.from_config(cfg, self.logger)
+        self.db.ingester.subscribe(self.alerts.evaluate)
+
+        if self.alerts.sink is not None:
+            self.alerts.sink.start()
+            atexit.register(self.alerts.sink.close)
+
+        if self.alerts.rules:
+            self.logger.info("Alerting enabled (%d rules)", len(self.alerts.rules))
+
+    def _alerts_path(self) -> Path:
+        feed: dict[str, Any] = self.config["ALERTS"].get("feed", {})
+        return Path(self.instance_path) / feed.get("path", "alerts.json")
+
+    def _init_commands(self, cfg: dict[str, Any]) -> None:
+        slots: tuple[int, int] | None = self._long_lived_slots()
+        if slots is not None:
+            cfg = {
+                **cfg,
+                "max_waiters": min(
+                    cfg.get("max_waiters", CommandHub.DEFAULT_MAX_WAITERS),
+                    slots[1],
+                ),
+            }
+
+        self.commands = CommandHub(self.db.storage, self.logger, cfg)
+
+    def _init_stats(self, cfg: dict[str, Any]) -> None:
+        self.stats = StatsEngine(self.db.storage, self.logger, cfg)
+        self.db.ingester.subscribe(self.stats.bump)
+        if self.db.retention is not None:
+            self.db.retention.subscribe(self.stats.bump_all)
+
+    def _init_instruments(self, cfg: dict[str, Any]) -> None:
+        instruments: Instrumentation = Instrumentation(
+            self.root_dir / cfg.get("profile_dir", "logs/profiles"),
+        )
+
+        if cfg.get("sql_timing", True):
+            instruments.instrument_engine(self.db.reader, "reader")
+            if self.db.writer is not self.db.reader:
+                instruments.instrument_engine(self.db.writer, "writer")
+
+        self.db.ingester.instruments = instruments
+
+        def retention() -> Iterable[tuple[tuple[str, ...], float]]:
+            if self.db.retention is None:
+                return []
+            stats: dict[str, Any] = self.db.retention.stats
+            return [
+                ((key,), stats[key])
+                for key in ("runs", "rows_purged", "seconds", "bytes_reclaimed")
+            ]
+
+        def write_behind() -> Iterable[tuple[tuple[str, ...], float]]:
+            queue: Any = self.db.write_behind
+            if queue is None:
+                return []
+            return [(("pending",), len(queue.pending)), (("dropped",), queue.dropped)]
+
+        instruments.collect(
+            Collected(
+                "cotc_retention_total",
+                "Retention job totals since start",
+                "counter",
+                retention,
+                ("stat",),
+            ),
+        )
+        instruments.collect(
+            Collected(
+                "cotc_write_behind_rows",
+                "Rows waiting in the write-behind queue",
+                "gauge",
+                write_behind,
+                ("state",),
+            ),
+        )
+        instruments.collect(
+            Collected(
+                "cotc_stream_clients",
+                "Connected /stream clients",
+                "gauge",
+                lambda: [((), len(self.stream))],
+            ),
+        )
+        instruments.collect(
+            Collected(
+                "cotc_command_polls",
+                "Parked /commands long-polls",
+                "gauge",
+                lambda: [((), len(self.commands))],
+            ),
+        )
+        instruments.collect(
+            Collected(
+                "cotc_latest_origins",
+                "Origins in the latest-snapshot cache",
+                "gauge",
+                lambda: [((), len(self.db.latest))],
+            ),
+        )
+        self.instruments = instruments
+
+    # In the parent, before it forks `workers` processes. With more than
+    # one, alerts are evaluated here, like retention, from what the
+    # workers commit; they serve the published result (after_fork)
+    def before_fork(self, *, workers: int) -> None:
+        if workers > 1 and self.alerts.rules:
+            self.alert_feed = AlertFeed(
+                self.alerts,
+                self.db.storage,
+                self.logger,
+                self._alerts_path(),
+                self.config["ALERTS"].get("feed", {}),
+            )
+            self.alert_feed.start()
+            atexit.register(self.alert_feed.close)
+
+    def after_fork(self, *, workers: int) -> None:
+        if self.log_pipeline is not None:
+            self.log_pipeline.after_fork()
+        self.db.after_fork(sync_latest=workers > 1)
+        if workers > 1:
+            self.alerts.follow(self._alerts_path())
+        elif self.alerts.sink is not None:
+            self.alerts.sink.start()
+
+        # Commands enqueued through another worker wake this one's polls
+        interval: float | None = self.config["COMMANDS"].get("sync_interval")
+        if workers > 1 and interval:
+            self.commands.start_sync(interval)
+            atexit.register(self.commands.stop_sync)
+
+        if self.echo is not None:
+            self.echo.start()
 
     @app_route("/", "/latest")
-    def route_latest(self) -> str:
-        with self.db:
-            snapshots: list[MetricSnapshot] = self.db.get(2, desc=True)
-            print_snapshots(snapshots)
+    def route_latest(self) -> Response:
+        def render() -> str:
+            snapshots: list[SnapshotRow] = self.db.latest.snapshots()
             return render_template("latest.html", snapshots=snapshots)
 
+        return self._cached_page(render)
+
+    @app_route("/stream")
+    def route_stream(self) -> Response | tuple[dict[str, Any], int, dict[str, str]]:
+        sub: Subscription | None = self.stream.subscribe(self.db.latest.snapshots())
+
+        if sub is None:
+            return (
+                {"status": "error", "message": "Too many stream clients"},
+                503,
+                {"Retry-After": str(self.config["STREAM"]["retry_after"])},
+            )
+
+        def events() -> Iterator[bytes]:
+            try:
+                yield from sub.events(self.stream.heartbeat)
+            finally:
+                self.stream.unsubscribe(sub)
+
+        return Response(
+            events(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @app_route("/all", "/history")
-    def route_history(self) -> str:
+    def route_history(self) -> Response | tuple[dict[str, str], int]:
+        try:
+            limit: int = max(
+                min(
+                    int(request.args.get("limit", App.HISTORY_PAGE_SIZE)),
+                    App.HISTORY_MAX_PAGE_SIZE,
+                ),
+                1,
+            )
+            before: tuple[dt, int] | None = self._arg("before", decode_cursor)
+            start: dt | None = self._arg("from", parse_time)
+            end: dt | None = self._arg("to", parse_time)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        return self._cached_page(
+            lambda: self._render_history(limit, before, start, end),
+        )
+
+    def _render_history(
+        self,
+        limit: int,
+        before: tuple[dt, int] | None,
+        start: dt | None,
+        end: dt | None,
+    ) -> str:
         with self.db:
-            return render_template("history.html", snapshots=self.db.get(desc=True))
+            snapshots: list[MetricSnapshot] = self.db.get(
+                limit + 1,
+                desc=True,
+                before=before,
+                origin=request.args.get("origin"),
+                start=start,
+                end=end,
+                metrics=False,
+            )
+
+            older_url: str | None = None
+            if len(snapshots) > limit:
+                snapshots = snapshots[:limit]
+                older_url = url_for(
+                    request.endpoint or "route_history",
+                    **{
+                        **request.args,
+                        "before": encode_cursor(
+                            snapshots[-1].timestamp,
+                            snapshots[-1].id,
+                        ),
+                    },
+                )
+
+            newest_url: str | None = None
+            if before is not None:
+                args: dict[str, str] = dict(request.args)
+                args.pop("before")
+                newest_url = url_for(request.endpoint or "route_history", **args)
+
+            # Only rows not rendered before need their metrics loaded
+            keys: list[FragmentKey] = [(s.id, s.timestamp) for s in snapshots]
+            rows: dict[FragmentKey, str] = self.renders.fragments(keys)
+            missing: list[MetricSnapshot] = [
+                s for s, key in zip(snapshots, keys, strict=True) if key not in rows
+            ]
+            self.db.load_metrics(missing)
+            for s in missing:
+                rows[s.id, s.timestamp] = self.renders.store_fragment(
+                    (s.id, s.timestamp),
+                    render_template("history_row.html", s=s),
+                )
+
+            return render_template(
+                "history.html",
+                rows=[rows[key] for key in keys],
+                older_url=older_url,
+                newest_url=newest_url,
+            )
+
+    @app_route("/api/series")
+    def route_series(self) -> Response | tuple[dict[str, Any], int]:
+        origin: str | None = request.args.get("origin")
+        metric: str | None = request.args.get("metric")
+
+        if origin is None or metric is None:
+            return {"status": "error", "message": "origin and metric are required"}, 400
+
+        try:
+            end: dt = self._arg("to", parse_time) or utc_now()
+            start: dt = self._arg("from", parse_time) or end - App.SERIES_DEFAULT_SPAN
+            step: int | None = self._arg("step", int)
+        except (ValueError, OverflowError) as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        if step is not None and not 0 < step <= (end - start).total_seconds():
+            return {"status": "error", "message": App.STEP_OUT_OF_RANGE}, 400
+
+        series: Series = self.db.series(
+            origin,
+            metric,
+            start,
+            end,
+            step=step,
+            unit=request.args.get("unit"),
+        )
+
+        if (
+            request.args.get("format") == "binary"
+            or request.accept_mimetypes.best == "application/octet-stream"
+        ):
+            return Response(series.to_bytes(), mimetype="application/octet-stream")
+
+        return series.to_json(), 200
 
     @app_route("/metrics", methods=["POST"])
-    def route_json(self) -> tuple[dict[str, str], int]:
-        data_list: Any = request.json
-        json: dict[str, Any] = loads(data_list)
+    def route_json(self) -> tuple[dict[str, Any], int, dict[str, str]]:
+        content_type: str = request.mimetype or JSON_CONTENT_TYPE
+
+        if content_type not in App.INGEST_CONTENT_TYPES:
+            return (
+                {"status": "error", "message": f"Unsupported type {content_type!r}"},
+                415,
+                {"Accept-Post": ", ".join(App.INGEST_CONTENT_TYPES)},
+            )
+
+        # Raw body straight to the decoder: one parse, no intermediate dicts
+        try:
+            body: bytes = wire.decompress(
+                request.get_data(cache=False),
+                request.content_encoding,
+                self.config["INGEST"].get("max_body_size", App.INGEST_MAX_BODY_SIZE),
+            )
+        except UnsupportedEncodingError as e:
+            return (
+                {"status": "error", "message": str(e)},
+                415,
+                {"Accept-Encoding": ", ".join(wire.ENCODINGS)},
+            )
+        except PayloadTooLargeError as e:
+            return {"status": "error", "message": str(e)}, 413, {}
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400, {}
+
+        self.logger.info("Snapshot data received (%s)", content_type)
+
+        ret: tuple[dict[str, Any], int] = self.db.add_snapshots(body, content_type)
+
+        headers: dict[str, str] = {}
+
+        if ret[1] == status_codes.codes.service_unavailable:
+            headers["Retry-After"] = str(self.config["INGEST"]["retry_after"])
+
+        return *ret, headers
+
+    # Summary statistics for one series, plus its correlation with each
+    # `with` series: a metric of the same origin, or "metric@origin"
+    # (then usually with a `step`, so the timestamps line up)
+    @app_route("/api/stats")
+    def route_stats(self) -> tuple[dict[str, Any], int]:
+        if not StatsEngine.available():
+            return {
+                "status": "error",
+                "message": "numpy is not installed (install the 'analytics' extra)",
+            }, 501
+
+        origin: str | None = request.args.get("origin")
+        metric: str | None = request.args.get("metric")
+
+        if origin is None or metric is None:
+            return {"status": "error", "message": "origin and metric are required"}, 400
+
+        try:
+            to: dt | None = self._arg("to", parse_time)
+            end: dt = to or utc_now()
+            start: dt = self._arg("from", parse_time) or end - App.SERIES_DEFAULT_SPAN
+            step: int | None = self._arg("step", int)
+            options: dict[str, Any] = self._stats_options(end - start)
+        except (ValueError, OverflowError) as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        if step is not None and not 0 < step <= (end - start).total_seconds():
+            return {"status": "error", "message": App.STEP_OUT_OF_RANGE}, 400
+
+        unit: str | None = request.args.get("unit")
+        others: list[str] = request.args.getlist("with")[: App.STATS_MAX_CORRELATIONS]
+
+        # The unit only narrows the main series
+        def load(name: str, at: str, unit: str | None = None) -> Arrays:
+            return self.stats.load(
+                at,
+                name,
+                start,
+                end,
+                open_ended=to is None,
+                step=step,
+                unit=unit,
+            )
+
+        series: Arrays = load(metric, origin, unit)
+        correlations: list[dict[str, Any]] = []
+        for other in others:
+            other_metric, _, other_origin = other.rpartition("@")
+            if not other_metric:
+                other_metric, other_origin = other, origin
+
+            count, r = correlate(series, load(other_metric, other_origin))
+            correlations.append(
+                {
+                    "origin": other_origin,
+                    "metric": other_metric,
+                    "count": count,
+                    "r": r,
+                },
+            )
+
+        return {
+            "origin": origin,
+            "metric": metric,
+            "unit": unit,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "step": step,
+            **self.stats.summary(series, **options),
+            "correlations": correlations,
+        }, 200
+
+    @app_route("/api/alerts")
+    def route_alerts(self) -> tuple[dict[str, Any], int]:
+        return self.alerts.to_json(), 200
+
+    @app_route("/api/commands", methods=["POST"])
+    def route_enqueue_command(self) -> tuple[dict[str, Any], int]:
+        try:
+            command: dict[str, Any] = self.commands.enqueue(
+                validate_command(request.get_json(silent=True)),
+            )
+        except PayloadError as e:
+            error: dict[str, Any] = {"status": "error", "message": str(e)}
+            if e.results:
+                error["results"] = e.results
+            return error, 400
+
+        return {"status": "success", "command": command}, 201
+
+    @app_route("/api/commands")
+    def route_commands(self) -> tuple[dict[str, Any], int]:
+        try:
+            limit: int = min(
+                int(request.args.get("limit", App.COMMANDS_PAGE_SIZE)),
+                App.COMMANDS_PAGE_SIZE,
+            )
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+
+        commands: list[dict[str, Any]] = self.commands.find(
+            origin=request.args.get("origin"),
+            status=request.args.get("status"),
+            limit=max(limit, 1),
+        )
+        return {"status": "success", "commands": commands}, 200
+
+    # Long-poll: answers as soon as commands are queued for `origin`, or
+    # with an empty list once `timeout` seconds pass. Returned commands are
+    # marked delivered and come back on a later poll unless acknowledged
+    @app_route("/commands/<origin>")
+    def route_poll_commands(
+        self,
+        origin: str,
+    ) -> tuple[dict[str, Any], int, dict[str, str]]:
+        try:
+            timeout: float | None = self._arg("timeout", float)
+            limit: int | None = self._arg("limit", int)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400, {}
+
+        # NaN would slip through the clamp below and park the poll for good
+        if timeout is not None and not math.isfinite(timeout):
+            return {"status": "error", "message": "timeout must be finite"}, 400, {}
+
+        if timeout is None:
+            timeout = self.commands.poll_timeout
+        timeout = min(max(timeout, 0.0), self.commands.max_poll_timeout)
+
+        commands: list[dict[str, Any]] | None = self.commands.poll(
+            origin,
+            timeout,
+            max(limit or self.commands.batch_size, 1),
+        )
+
+        if commands is None:
+            return (
+                {"status": "error", "message": "Too many parked polls"},
+                503,
+                {"Retry-After": str(int(self.commands.poll_timeout))},
+            )
+        return {"status": "success", "commands": commands}, 200, {}
+
+    @app_route("/commands/<origin>/<int:command_id>/ack", methods=["POST"])
+    def route_ack_command(
+        self,
+        origin: str,
+        command_id: int,
+    ) -> tuple[dict[str, Any], int]:
+        body: Any = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return {"status": "error", "message": "Expected a JSON object"}, 400
+
+        command: dict[str, Any] | None = self.commands.ack(
+            origin,
+            command_id,
+            ok=body.get("status", "ok") == "ok",
+            result=body.get("result"),
+        )
+
+        if command is None:
+            return (
+                {"status": "error", "message": f"No delivered command {command_id}"},
+                404,
+            )
+        return {"status": "success", "command": command}, 200
+
+    @app_route("/internal/metrics")
+    def route_internal_metrics(self) -> Response | tuple[dict[str, str], int]:
+        if self.instruments is None:
+            return {"status": "error", "message": "Instrumentation is disabled"}, 404
+        return Response(self.instruments.render(), content_type=CONTENT_TYPE)
+
+    # Serves the cached render for this URL while the data generation is
+    # unchanged, rendering (and caching) it otherwise; conditional requests
+    # whose ETag still matches get a bodiless 304 either way
+    def _cached_page(self, render: Callable[[], str]) -> Response:
+        key: tuple[str | None, bytes] = (request.endpoint, request.query_string)
+        generation: int = self.renders.generation
+
+        page: tuple[str, str] | None = self.renders.page(key, generation)
+        if page is None:
+            page = self.renders.store_page(key, generation, render())
+
+        etag, body = page
+        response: Response = self.response_class(body, mimetype="text/html")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
-        clear_scr()
-        self.logger.info("JSON data received")
+    # percentiles, alpha and window for StatsEngine.summary(); ValueError
+    # when one is out of range. The window is bounded by the requested span
+    def _stats_options(self, span: timedelta) -> dict[str, Any]:
+        percentiles: list[float] | None = self._arg(
+            "percentiles",
+            lambda v: [float(p) for p in v.split(",")],
+        )
+        alpha: float | None = self._arg("alpha", float)
+        window: float | None = self._arg("window", float)
+        err_msg: str
 
-        if not isinstance(json, list):
-            return {"error": "Invalid JSON data"}, 400
+        if percentiles is not None and not all(0 <= p <= 100 for p in percentiles):  # noqa: PLR2004
+            err_msg = "percentiles must be between 0 and 100"
+            raise ValueError(err_msg)
+        if alpha is not None and not 0 < alpha <= 1:
+            err_msg = "alpha must be in (0, 1]"
+            raise ValueError(err_msg)
+        if window is not None and not 0 < window <= span.total_seconds():
+            err_msg = "window must be positive and at most the requested span"
+            raise ValueError(err_msg)
 
-        for snapshot in json:
-            ret: tuple[dict[str, str], int] = self.db.add_snapshot(snapshot)
-            if ret[1] != status_codes.codes.ok:
-                return ret
+        return {"percentiles": percentiles, "alpha": alpha, "window": window}
 
-        self.db.print_last(2)
-        return ret
+    @staticmethod
+    def _arg(name: str, parse: Callable[[str], T]) -> T | None:
+        value: str | None = request.args.get(name)
+        return None if value is None else parse(value)
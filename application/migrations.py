@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Final
+
+from sqlalchemy import inspect, text
+
+from application.common.util import parse_time
+from application.models import (
+    Base,
+    Device,
+    Metric,
+    MetricDefinition,
+    MetricRollup,
+    MetricSnapshot,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from logging import Logger
+
+    from sqlalchemy.engine import Connection, Engine
+
+# SQLAlchemy's storage format for DateTime columns on SQLite
+SQLITE_DATETIME_FORMAT: Final[str] = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def normalize_timestamps(conn: Connection) -> bool:
+    # Older rows stored ISO strings ("T" separator, UTC offset), which sort
+    # and compare differently from SQLAlchemy's DateTime format. Only SQLite
+    # stores DateTime as text
+    if conn.dialect.name != "sqlite" or not inspect(conn).has_table(
+        "metric_snapshot",
+    ):
+        return False
+
+    legacy: list[tuple[int, str]] = list(
+        conn.execute(
+            text(
+                "SELECT id, timestamp FROM metric_snapshot WHERE timestamp LIKE '%T%'",
+            ),
+        ).tuples(),
+    )
+
+    if not legacy:
+        return False
+
+    conn.execute(
+        text("UPDATE metric_snapshot SET timestamp = :timestamp WHERE id = :id"),
+        [
+            {
+                "id": row_id,
+                "timestamp": parse_time(timestamp).strftime(SQLITE_DATETIME_FORMAT),
+            }
+            for row_id, timestamp in legacy
+        ],
+    )
+    return True
+
+
+def normalize_dimensions(conn: Connection) -> bool:
+    # Moves the free-text origin and metric name/unit columns out into the
+    # device and metric_definition tables, keyed by integer foreign keys
+    if not _has_column(conn, "metric_snapshot", "origin"):
+        return False
+
+    for table in ("metric", "metric_snapshot"):
+        for index in inspect(conn).get_indexes(table):
+            conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+        conn.exec_driver_sql(f'ALTER TABLE "{table}" RENAME TO "_legacy_{table}"')
+
+    # Rollups keyed by name are rebuilt from the raw rows on the next start
+    if inspect(conn).has_table("metric_rollup"):
+        conn.exec_driver_sql('DROP TABLE "metric_rollup"')
+
+    Base.metadata.create_all(
+        conn,
+        tables=[
+            Device.__table__,
+            MetricDefinition.__table__,
+            MetricSnapshot.__table__,
+            Metric.__table__,
+            MetricRollup.__table__,
+        ],
+    )
+
+    conn.exec_driver_sql(
+        "INSERT INTO device (name) SELECT DISTINCT origin FROM _legacy_metric_snapshot",
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO metric_definition (name, unit) "
+        "SELECT DISTINCT name, unit FROM _legacy_metric",
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO metric_snapshot (id, device_id, timestamp) "
+        "SELECT s.id, d.id, s.timestamp FROM _legacy_metric_snapshot s "
+        "JOIN device d ON d.name = s.origin",
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO metric (id, definition_id, value, snapshot_id) "
+        "SELECT m.id, md.id, m.value, m.snapshot_id FROM _legacy_metric m "
+        "JOIN metric_definition md ON md.name = m.name AND md.unit = m.unit",
+    )
+    conn.exec_driver_sql("DROP TABLE _legacy_metric")
+    conn.exec_driver_sql("DROP TABLE _legacy_metric_snapshot")
+    return True
+
+
+MIGRATIONS: Final[tuple[Callable[[Connection], bool], ...]] = (
+    normalize_timestamps,
+    normalize_dimensions,
+)
+
+
+# Each step runs in a transaction of its own, together with the bump of
+# the schema version past it, so a step that fails leaves neither half its
+# changes nor a version claiming it ran. SQLite keeps the version in the
+# file header (user_version); elsewhere every step checks the schema
+def run_migrations(engine: Engine, logger: Logger) -> list[str]:
+    applied: list[str] = []
+
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        with _transaction(engine) as conn:
+            if _schema_version(conn) >= version:
+                continue
+            if migration(conn):
+                applied.append(migration.__name__)
+                logger.info("Applied migration %r", migration.__name__)
+            _set_schema_version(conn, version)
+
+    if applied and engine.dialect.name == "sqlite":
+        # Return the pages freed by rewritten tables to the filesystem
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql(
+                "VACUUM",
+            )
+
+    return applied
+
+
+@contextmanager
+def _transaction(engine: Engine) -> Iterator[Connection]:
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as conn:
+            yield conn
+        return
+
+    # pysqlite only opens a transaction before DML, so the DDL of a step
+    # (DROP INDEX, ALTER TABLE, CREATE TABLE) would each commit on its own.
+    # With the driver in autocommit the explicit BEGIN covers all of it
+    with engine.connect() as conn:
+        autocommit: Connection = conn.execution_options(isolation_level="AUTOCOMMIT")
+        autocommit.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield autocommit
+        except BaseException:
+            autocommit.exec_driver_sql("ROLLBACK")
+            raise
+        autocommit.exec_driver_sql("COMMIT")
+
+
+def _schema_version(conn: Connection) -> int:
+    if conn.dialect.name != "sqlite":
+        return 0
+    return conn.exec_driver_sql("PRAGMA user_version").scalar_one()
+
+
+def _set_schema_version(conn: Connection, version: int) -> None:
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(f"PRAGMA user_version = {version:d}")
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return inspect(conn).has_table(table) and any(
+        c["name"] == column for c in inspect(conn).get_columns(table)
+    )
@@ -1,26 +1,61 @@
 from __future__ import annotations
 
-from datetime import datetime as dt
-from typing import TYPE_CHECKING, Any
-
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from typing import Any
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 from application.common.util import utc_now
 
-if TYPE_CHECKING:
-    from application.common._types import JSON
-
 Base: Any = declarative_base()
 
 
+class Device(Base):
+    __tablename__ = "device"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+    def __repr__(self) -> str:
+        return f"Device[Name={self.name!r}]"
+
+
+class MetricDefinition(Base):
+    __tablename__ = "metric_definition"
+    __table_args__ = (
+        UniqueConstraint("name", "unit", name="uq_metric_definition_name_unit"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    unit = Column(String, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"MetricDefinition[Name={self.name!r}, Unit={self.unit!r}]"
+
+
 class MetricSnapshot(Base):
     __tablename__ = "metric_snapshot"
+    __table_args__ = (
+        Index("ix_metric_snapshot_timestamp_id", "timestamp", "id"),
+        Index("ix_metric_snapshot_device_timestamp_id", "device_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    origin = Column(String, nullable=False)
+    device_id = Column(Integer, ForeignKey("device.id"), nullable=False)
     timestamp = Column(DateTime, default=utc_now)
+    device = relationship("Device", lazy="joined")
     metrics = relationship(
         "Metric",
         backref="snapshot",
@@ -31,84 +66,106 @@ class MetricSnapshot(Base):
     def __repr__(self) -> str:
         return f"MetricSnapshot[Origin={self.origin!r}, Time={self.timestamp!r}]"
 
-    @staticmethod
-    def from_json(data: JSON) -> MetricSnapshot:
-        MetricSnapshot.validate_json(data)
-
-        return MetricSnapshot(
-            origin=data["origin"],
-            timestamp=dt.fromisoformat(data["timestamp"]),
-        )
-
-    @staticmethod
-    def validate_json(data: JSON) -> None:
-        types: dict[str, type] = MetricSnapshot.get_types()
-        err_msg: str
-
-        for key, key_type in types.items():
-            if key not in data:
-                err_msg = f"Missing required key: {key!r}"
-                raise ValueError(err_msg)
-            if not isinstance(data[key], key_type):
-                err_msg = f"Invalid type for key {key!r}: {data[key]!r}"
-                raise TypeError(err_msg)
-
-        for metric_data in data["metrics"]:
-            Metric.validate_json(metric_data)
-
-    @staticmethod
-    def get_types() -> dict[str, type]:
-        return {
-            "origin": str,
-            "timestamp": str,  # str as data received is str
-            "metrics": list,
-        }
+    @property
+    def origin(self) -> str:
+        return self.device.name
 
 
 class Metric(Base):
     __tablename__ = "metric"
+    __table_args__ = (
+        Index("ix_metric_snapshot_id", "snapshot_id"),
+        Index("ix_metric_definition_snapshot_id", "definition_id", "snapshot_id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    definition_id = Column(
+        Integer,
+        ForeignKey("metric_definition.id"),
+        nullable=False,
+    )
     value = Column(Float, nullable=False)
-    unit = Column(String, nullable=False)
     snapshot_id = Column(
         Integer,
         ForeignKey("metric_snapshot.id"),
         nullable=False,
     )
+    definition = relationship("MetricDefinition", lazy="joined")
 
     def __repr__(self) -> str:
         return f"Metric[Name={self.name!r}, Data='{self.value}{self.unit}']"
 
-    @staticmethod
-    def from_json(data: JSON, snapshot_id: Column[int]) -> Metric:
-        return Metric(
-            name=data["name"],
-            value=data["value"],
-            unit=data["unit"],
-            snapshot_id=snapshot_id,
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def unit(self) -> str:
+        return self.definition.unit
+
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollup"
+    __table_args__ = (
+        UniqueConstraint(
+            "device_id",
+            "definition_id",
+            "resolution",
+            "bucket",
+            name="uq_metric_rollup_device_definition_resolution_bucket",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey("device.id"), nullable=False)
+    definition_id = Column(
+        Integer,
+        ForeignKey("metric_definition.id"),
+        nullable=False,
+    )
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds
+    bucket = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    last = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"MetricRollup[Device={self.device_id}, Definition={self.definition_id}, "
+            f"Resolution={self.resolution}, Bucket={self.bucket!r}]"
         )
 
-    @staticmethod
-    def validate_json(data: JSON) -> None:
-        types: dict[str, type] = Metric.get_types()
-        err_msg: str
-
-        for key in Metric.get_types():
-            if key not in data:
-                err_msg = f"Missing required key: {key!r}"
-                raise ValueError(err_msg)
-            if not isinstance(data[key], types[key]):
-                err_msg = (
-                    f"Invalid type for {key!r}: {data[key]!r}; expected {types[key]!r}"
-                )
-                raise TypeError(err_msg)
-
-    @staticmethod
-    def get_types() -> dict[str, type]:
-        return {
-            "name": str,
-            "value": float,
-            "unit": str,
-        }
+    @property
+    def avg(self) -> float:
+        return self.sum / self.count
+
+
+# Commands for devices (e.g. restart an app), picked up by collectors via
+# long-poll. pending -> delivered (claimed by a poll; redelivered if not
+# acknowledged in time) -> acked | failed
+class DeviceCommand(Base):
+    __tablename__ = "device_command"
+    __table_args__ = (
+        Index("ix_device_command_device_status_id", "device_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey("device.id"), nullable=False)
+    command = Column(String, nullable=False)
+    args = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON)
+    created_at = Column(DateTime, nullable=False, default=utc_now)
+    expires_at = Column(DateTime)
+    delivered_at = Column(DateTime)
+    acked_at = Column(DateTime)
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceCommand[Device={self.device_id}, Command={self.command!r}, "
+            f"Status={self.status!r}]"
+        )
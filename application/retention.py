@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Final
+
+from sqlalchemy import delete, select
+
+from application.common.util import utc_now
+from application.models import Metric, MetricRollup, MetricSnapshot
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from sqlalchemy.engine import Engine
+
+    from application.archive import Archiver
+    from application.common._types import JSON
+    from application.storage import StorageBackend
+
+    type PurgeListener = Callable[[int], None]
+
+
+class RetentionJob:
+    DEFAULT_CHUNK_SIZE: Final[int] = 500
+
+    storage: StorageBackend
+    engine: Engine
+    logger: Logger
+    raw_days: float | None
+    rollup_days: float | None
+    interval: float
+    chunk_size: int
+    chunk_pause: float
+    vacuum_pages: int
+    stats: JSON
+    listeners: list[PurgeListener]
+    archiver: Archiver | None
+
+    # With an `archiver`, aged days are archived before anything is purged
+    def __init__(
+        self,
+        storage: StorageBackend,
+        logger: Logger,
+        cfg: dict[str, Any],
+        *,
+        archiver: Archiver | None = None,
+    ) -> None:
+        self.storage = storage
+        self.archiver = archiver
+        self.engine = storage.writer
+        self.logger = logger
+        self.raw_days = cfg.get("raw_days")
+        self.rollup_days = cfg.get("rollup_days")
+        self.interval = cfg.get("interval", 3600)
+        self.chunk_size = cfg.get("chunk_size", RetentionJob.DEFAULT_CHUNK_SIZE)
+        self.chunk_pause = cfg.get("chunk_pause", 0.0)
+        self.vacuum_pages = cfg.get("vacuum_pages", 0)
+        self.stats = {
+            "runs": 0,
+            "rows_purged": 0,
+            "rows_archived": 0,
+            "seconds": 0.0,
+            "bytes_reclaimed": 0,
+            "last_run": None,
+        }
+        self.listeners = []
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run,
+            name="retention",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    # Called with the number of rows purged (or archived), after runs that
+    # removed any
+    def subscribe(self, listener: PurgeListener) -> None:
+        self.listeners.append(listener)
+
+    def close(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def run_once(self) -> JSON:
+        start: float = time.perf_counter()
+        now: dt = utc_now()
+        purged: int = 0
+        archived: int = 0
+
+        if self.archiver is not None:
+            archived = self.archiver.run_once(now, self._stop)
+        if self.raw_days is not None:
+            cutoff: dt = now - timedelta(days=self.raw_days)
+            # Rows are archived rather than purged: never past the archiver
+            if self.archiver is not None:
+                cutoff = min(cutoff, self.archiver.cutoff(now))
+            purged += self._purge_snapshots(cutoff)
+        if self.rollup_days is not None:
+            purged += self._purge_rollups(now - timedelta(days=self.rollup_days))
+
+        reclaimed: int = self.storage.compact(self.vacuum_pages)
+        seconds: float = time.perf_counter() - start
+
+        self.stats["runs"] += 1
+        self.stats["rows_purged"] += purged
+        self.stats["rows_archived"] += archived
+        self.stats["seconds"] += seconds
+        self.stats["bytes_reclaimed"] += reclaimed
+        self.stats["last_run"] = now.isoformat()
+
+        result: JSON = {
+            "rows_purged": purged,
+            "rows_archived": archived,
+            "seconds": seconds,
+            "bytes_reclaimed": reclaimed,
+        }
+        self.logger.info("Retention run finished: %s", result)
+
+        # Archived rows count: the pages built from them have to go too
+        if purged or archived:
+            for listener in self.listeners:
+                try:
+                    listener(purged + archived)
+                except Exception:  # noqa: PERF203
+                    self.logger.exception("Retention listener %r failed", listener)
+
+        return result
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:  # noqa: PERF203
+                self.logger.exception("Retention run failed")
+
+    def _purge_snapshots(self, cutoff: dt) -> int:
+        purged: int = 0
+
+        while not self._stop.is_set():
+            with self.engine.begin() as conn:
+                ids: list[int] = list(
+                    conn.execute(
+                        select(MetricSnapshot.id)
+                        .where(MetricSnapshot.timestamp < cutoff)
+                        .order_by(MetricSnapshot.timestamp)
+                        .limit(self.chunk_size),
+                    ).scalars(),
+                )
+
+                if not ids:
+                    break
+
+                purged += conn.execute(
+                    delete(Metric).where(Metric.snapshot_id.in_(ids)),
+                ).rowcount
+                purged += conn.execute(
+                    delete(MetricSnapshot).where(MetricSnapshot.id.in_(ids)),
+                ).rowcount
+
+            time.sleep(self.chunk_pause)
+
+        return purged
+
+    def _purge_rollups(self, cutoff: dt) -> int:
+        purged: int = 0
+
+        while not self._stop.is_set():
+            with self.engine.begin() as conn:
+                ids: list[int] = list(
+                    conn.execute(
+                        select(MetricRollup.id)
+                        .where(MetricRollup.bucket < cutoff)
+                        .limit(self.chunk_size),
+                    ).scalars(),
+                )
+
+                if not ids:
+                    break
+
+                purged += conn.execute(
+                    delete(MetricRollup).where(MetricRollup.id.in_(ids)),
+                ).rowcount
+
+            time.sleep(self.chunk_pause)
+
+        return purged
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from datetime import datetime as dt
+from datetime import timezone as tz
+from typing import TYPE_CHECKING, Callable, Final
+
+from sqlalchemy import select
+
+from application.common.util import as_utc
+from application.models import (
+    Device,
+    Metric,
+    MetricDefinition,
+    MetricRollup,
+    MetricSnapshot,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from sqlalchemy.engine import Connection, Engine, Row
+
+    from application.common._types import JSON
+
+    type Sample = tuple[int, int, dt, float]
+    type BucketKey = tuple[int, int, int, dt]
+
+
+class RollupStore:
+    DEFAULT_RESOLUTIONS: Final[tuple[int, ...]] = (60, 3600, 86400)
+    BACKFILL_CHUNK_SIZE: Final[int] = 5000
+
+    resolutions: tuple[int, ...]
+    upsert: Callable[[Connection, list[JSON]], None]
+
+    # `upsert` merges aggregated buckets into metric_rollup; it is the
+    # storage backend's, as ON CONFLICT syntax and functions vary by dialect
+    def __init__(
+        self,
+        upsert: Callable[[Connection, list[JSON]], None],
+        resolutions: Iterable[int] | None = None,
+    ) -> None:
+        self.upsert = upsert
+        self.resolutions = tuple(
+            sorted(
+                RollupStore.DEFAULT_RESOLUTIONS if resolutions is None else resolutions,
+            ),
+        )
+
+    def update(self, conn: Connection, samples: Iterable[Sample]) -> None:
+        buckets: dict[BucketKey, JSON] = {}
+
+        for device_id, definition_id, timestamp, value in samples:
+            for resolution in self.resolutions:
+                key: BucketKey = (
+                    device_id,
+                    definition_id,
+                    resolution,
+                    bucket_start(timestamp, resolution),
+                )
+                agg: JSON | None = buckets.get(key)
+
+                if agg is None:
+                    buckets[key] = {
+                        "device_id": device_id,
+                        "definition_id": definition_id,
+                        "resolution": resolution,
+                        "bucket": key[3],
+                        "count": 1,
+                        "sum": value,
+                        "min": value,
+                        "max": value,
+                        "last": value,
+                        "last_timestamp": timestamp,
+                    }
+                    continue
+
+                agg["count"] += 1
+                agg["sum"] += value
+                agg["min"] = min(agg["min"], value)
+                agg["max"] = max(agg["max"], value)
+                if timestamp >= agg["last_timestamp"]:
+                    agg["last"] = value
+                    agg["last_timestamp"] = timestamp
+
+        if buckets:
+            self.upsert(conn, list(buckets.values()))
+
+    def backfill(self, engine: Engine) -> int:
+        query = (
+            select(
+                MetricSnapshot.device_id,
+                Metric.definition_id,
+                MetricSnapshot.timestamp,
+                Metric.value,
+            )
+            .join(Metric, Metric.snapshot_id == MetricSnapshot.id)
+            .order_by(MetricSnapshot.id)
+        )
+        n: int = 0
+
+        with engine.begin() as conn:
+            stream: Connection = conn.execution_options(
+                yield_per=RollupStore.BACKFILL_CHUNK_SIZE,
+            )
+            for chunk in stream.execute(query).partitions():
+                self.update(conn, (tuple(sample) for sample in chunk))
+                n += len(chunk)
+
+        return n
+
+    def pick_resolution(self, start: dt, end: dt, points: int) -> int:
+        span: float = (end - start).total_seconds()
+
+        for resolution in self.resolutions:
+            if span / resolution <= points:
+                return resolution
+
+        return self.resolutions[-1]
+
+    def query(  # noqa: PLR0913, PLR0917
+        self,
+        conn: Connection,
+        origin: str,
+        name: str,
+        start: dt,
+        end: dt,
+        points: int,
+    ) -> tuple[int, Sequence[Row]]:
+        resolution: int = self.pick_resolution(start, end, points)
+        rows: Sequence[Row] = conn.execute(
+            select(
+                MetricRollup.bucket,
+                MetricRollup.count,
+                MetricRollup.min,
+                MetricRollup.max,
+                (MetricRollup.sum / MetricRollup.count).label("avg"),
+                MetricRollup.last,
+            )
+            .join(Device, Device.id == MetricRollup.device_id)
+            .join(MetricDefinition, MetricDefinition.id == MetricRollup.definition_id)
+            .where(
+                Device.name == origin,
+                MetricDefinition.name == name,
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket >= bucket_start(start, resolution),
+                MetricRollup.bucket < end,
+            )
+            .order_by(MetricRollup.bucket),
+        ).all()
+        return resolution, rows
+
+
+def bucket_start(timestamp: dt, resolution: int) -> dt:
+    seconds: float = as_utc(timestamp).timestamp()
+    return dt.fromtimestamp(seconds - seconds % resolution, tz=tz.utc)
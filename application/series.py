@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import heapq
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Final
+
+from sqlalchemy import func, select
+
+from application.models import (
+    Device,
+    Metric,
+    MetricDefinition,
+    MetricRollup,
+    MetricSnapshot,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from datetime import datetime as dt
+
+    from sqlalchemy import ColumnElement, Select
+    from sqlalchemy.engine import Connection
+
+    from application.common._types import JSON
+
+# Packed layout: magic, point count, then count little-endian int64 epoch-ms
+# timestamps followed by count little-endian float64 values
+BINARY_MAGIC: Final[bytes] = b"SER1"
+BINARY_HEADER: Final[struct.Struct] = struct.Struct("<4sI")
+
+
+@dataclass(frozen=True, slots=True)
+class Series:
+    origin: str
+    metric: str
+    step: int | None
+    resolution: int | None  # Rollup resolution served from, None for raw rows
+    timestamps: array[int]
+    values: array[float]
+
+    def to_json(self) -> JSON:
+        return {
+            "origin": self.origin,
+            "metric": self.metric,
+            "step": self.step,
+            "resolution": self.resolution,
+            "timestamps": self.timestamps.tolist(),
+            "values": self.values.tolist(),
+        }
+
+    def to_bytes(self) -> bytes:
+        timestamps: array[int] = self.timestamps
+        values: array[float] = self.values
+
+        if sys.byteorder == "big":
+            timestamps, values = array("q", timestamps), array("d", values)
+            timestamps.byteswap()
+            values.byteswap()
+
+        return (
+            BINARY_HEADER.pack(BINARY_MAGIC, len(timestamps))
+            + timestamps.tobytes()
+            + values.tobytes()
+        )
+
+
+class SeriesQuery:
+    resolutions: tuple[int, ...]
+    epoch_ms: Callable[[ColumnElement], ColumnElement]
+
+    # `epoch_ms` turns a DateTime column into integer epoch milliseconds in
+    # the backend's SQL dialect. Raw queries can be given `archived` samples,
+    # (epoch ms, value) sorted by time, moved out of the database by the
+    # archive; they are merged in (or bucketed with the rows) as if read
+    # from it. Rollups cover archived days, so rollup queries ignore them
+    def __init__(
+        self,
+        resolutions: tuple[int, ...],
+        epoch_ms: Callable[[ColumnElement], ColumnElement],
+    ) -> None:
+        self.resolutions = resolutions
+        self.epoch_ms = epoch_ms
+
+    def load(  # noqa: PLR0913
+        self,
+        conn: Connection,
+        origin: str,
+        metric: str,
+        start: dt,
+        end: dt,
+        *,
+        step: int | None = None,
+        unit: str | None = None,
+        archived: Sequence[tuple[int, float]] = (),
+    ) -> Series:
+        definitions: Select = select(MetricDefinition.id).where(
+            MetricDefinition.name == metric,
+        )
+        if unit is not None:
+            definitions = definitions.where(MetricDefinition.unit == unit)
+        device: ColumnElement = (
+            select(Device.id).where(Device.name == origin).scalar_subquery()
+        )
+
+        resolution: int | None = self.resolution(step)
+        query: Select = (
+            self._raw(device, definitions, start, end, step)
+            if resolution is None
+            else self._rollup(device, definitions, start, end, step, resolution)
+        )
+
+        # One fetchall(), not a fetch per row as iterating the result does
+        points: Iterable[tuple] = conn.execute(query).all()
+        if resolution is None and step is not None:
+            points = _bucket(points, archived, step)
+        elif resolution is None and archived:
+            points = heapq.merge(archived, points)
+
+        columns: list[tuple] = list(zip(*points, strict=True))
+        timestamps, values = columns or ((), ())
+
+        return Series(
+            origin,
+            metric,
+            step,
+            resolution,
+            array("q", timestamps),
+            array("d", values),
+        )
+
+    # The rollup resolution a `step` is served from, None for raw rows
+    def resolution(self, step: int | None) -> int | None:
+        if step is None:
+            return None
+
+        fitting: list[int] = [r for r in self.resolutions if step % r == 0]
+        return max(fitting) if fitting else None
+
+    def _raw(
+        self,
+        device: ColumnElement,
+        definitions: Select,
+        start: dt,
+        end: dt,
+        step: int | None,
+    ) -> Select:
+        ts: ColumnElement = self.epoch_ms(MetricSnapshot.timestamp)
+        conditions: tuple[ColumnElement, ...] = (
+            MetricSnapshot.device_id == device,
+            MetricSnapshot.timestamp >= start,
+            MetricSnapshot.timestamp < end,
+            Metric.definition_id.in_(definitions),
+        )
+
+        if step is None:
+            return (
+                select(ts, Metric.value)
+                .join(MetricSnapshot, MetricSnapshot.id == Metric.snapshot_id)
+                .where(*conditions)
+                .order_by(MetricSnapshot.timestamp)
+            )
+
+        # Sums and counts rather than averages, so buckets can take in
+        # archived samples; see _bucket()
+        bucket: ColumnElement = _floor(ts, step)
+        return (
+            select(bucket, func.sum(Metric.value), func.count())
+            .join(MetricSnapshot, MetricSnapshot.id == Metric.snapshot_id)
+            .where(*conditions)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+    def _rollup(  # noqa: PLR0913, PLR0917
+        self,
+        device: ColumnElement,
+        definitions: Select,
+        start: dt,
+        end: dt,
+        step: int,
+        resolution: int,
+    ) -> Select:
+        bucket: ColumnElement = _floor(self.epoch_ms(MetricRollup.bucket), step)
+        return (
+            select(bucket, func.sum(MetricRollup.sum) / func.sum(MetricRollup.count))
+            .where(
+                MetricRollup.device_id == device,
+                MetricRollup.definition_id.in_(definitions),
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket >= start,
+                MetricRollup.bucket < end,
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+
+def _bucket(
+    rows: Iterable[tuple],
+    archived: Sequence[tuple[int, float]],
+    step: int,
+) -> list[tuple[int, float]]:
+    width: int = step * 1000
+    buckets: dict[int, list[float]] = {
+        bucket: [total, count] for bucket, total, count in rows
+    }
+
+    for ms, value in archived:
+        totals: list[float] = buckets.setdefault(ms // width * width, [0.0, 0])
+        totals[0] += value
+        totals[1] += 1
+
+    return [
+        (bucket, total / count) for bucket, (total, count) in sorted(buckets.items())
+    ]
+
+
+def _floor(ms: ColumnElement, step: int) -> ColumnElement:
+    width: int = step * 1000
+    return (ms // width) * width
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final
+
+# Nothing from the application is imported at module level: under gevent
+# workers the standard library must be patched before any of it loads
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from application.main import App
+
+SERVERS: Final[tuple[str, ...]] = ("auto", "gunicorn", "waitress")
+WORKER_CLASSES: Final[tuple[str, ...]] = ("gthread", "gevent")
+CONFIG_PATH: Final[Path] = Path(__file__).parent / "config" / "config.json"
+
+
+# Production entry point. The app is built once in the parent process, so
+# migrations and cache warming run a single time; gunicorn then forks
+# `workers` processes (gthread workers). Where gunicorn is unavailable
+# (e.g. Windows), waitress serves from one process with a thread pool
+# instead. Either way an open /stream response or parked /commands poll
+# holds a thread for as long as it lasts: streams are capped at a share of
+# `threads`, and parked polls run on `poll_threads` more, so a process
+# runs App.server_threads() threads (App._long_lived_slots). Fleets of
+# more devices than that want gevent workers (the 'gevent' extra): a
+# greenlet per connection instead of a thread
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="cotc-serve",
+        description="Serve the cotc dashboard and ingest API.",
+    )
+    parser.add_argument("--bind", help="host:port (default: server.bind)")
+    parser.add_argument("--workers", type=int, help="0 = one per CPU core")
+    parser.add_argument("--threads", type=int, help="request threads per worker")
+    parser.add_argument("--timeout", type=int, help="worker timeout in seconds")
+    parser.add_argument("--worker-class", choices=WORKER_CLASSES)
+    parser.add_argument("--server", choices=SERVERS, default="auto")
+    parser.add_argument("--debug", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args: argparse.Namespace = parse_args(argv)
+    server_cfg: dict[str, Any] = {
+        key: value
+        for key in ("bind", "workers", "threads", "timeout", "worker_class")
+        if (value := getattr(args, key)) is not None
+    }
+
+    # Before the app is even imported, so its locks, events, queues and
+    # pools are cooperative
+    if _worker_class(args) == "gevent":
+        _patch_gevent()
+
+    from application.main import App  # noqa: PLC0415
+
+    app: App = App(
+        overrides={
+            "flask": {
+                "DEBUG": args.debug,
+                "ENVIRONMENT": "development" if args.debug else "production",
+            },
+            "server": server_cfg,
+        },
+    )
+    cfg: dict[str, Any] = app.config["SERVER"]
+
+    if args.server == "waitress" or (args.server == "auto" and not _has_gunicorn()):
+        return serve_waitress(app, cfg)
+    return serve_gunicorn(app, cfg)
+
+
+def serve_gunicorn(app: App, cfg: dict[str, Any]) -> int:
+    from gunicorn.app.base import BaseApplication  # noqa: PLC0415
+
+    workers: int = cfg.get("workers") or os.cpu_count() or 1
+    worker_class: str = cfg.get("worker_class", "gthread")
+
+    def when_ready(_server: Any) -> None:  # noqa: ANN401
+        app.before_fork(workers=workers)
+
+    def post_fork(_server: Any, _worker: Any) -> None:  # noqa: ANN401
+        app.after_fork(workers=workers)
+
+    options: dict[str, Any] = {
+        "bind": cfg["bind"],
+        "workers": workers,
+        "threads": app.server_threads(),
+        "worker_class": worker_class,
+        "worker_connections": cfg.get("worker_connections", 1000),
+        "timeout": cfg["timeout"],
+        "preload_app": True,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+    }
+
+    class Server(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> App:
+            return app
+
+    app.logger.info(
+        "Serving on %s with gunicorn (%d %s workers x %d %s)",
+        cfg["bind"],
+        workers,
+        worker_class,
+        (
+            cfg["worker_connections"]
+            if worker_class == "gevent"
+            else app.server_threads()
+        ),
+        "connections" if worker_class == "gevent" else "threads",
+    )
+    Server().run()
+    return 0
+
+
+def serve_waitress(app: App, cfg: dict[str, Any]) -> int:
+    try:
+        from waitress import serve  # noqa: PLC0415
+    except ImportError:
+        print(
+            "No production server installed; install the 'server' extra",
+            file=sys.stderr,
+        )
+        return 1
+
+    app.logger.info(
+        "Serving on %s with waitress (%d threads)",
+        cfg["bind"],
+        app.server_threads(),
+    )
+    serve(app, listen=cfg["bind"], threads=app.server_threads())
+    return 0
+
+
+# The flag, else server.worker_class read straight from the config file
+def _worker_class(args: argparse.Namespace) -> str:
+    if args.worker_class is not None:
+        return args.worker_class
+    with CONFIG_PATH.open(encoding="utf-8") as f:
+        return json.load(f).get("server", {}).get("worker_class", "gthread")
+
+
+def _patch_gevent() -> None:
+    from gevent import monkey  # noqa: PLC0415
+
+    if not monkey.is_module_patched("threading"):
+        monkey.patch_all()
+
+
+def _has_gunicorn() -> bool:
+    return importlib.util.find_spec("gunicorn") is not None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+// Patches the /latest cards in place from the /stream server-sent events
+(() => {
+    const MAX_METRICS = 2;
+
+    const container = document.getElementById("latest");
+    const template = document.getElementById("latest__snapshot-template");
+    const formatter = new Intl.NumberFormat("en-US", {
+        minimumFractionDigits: 2,
+        maximumFractionDigits: 2,
+    });
+
+    const formatTime = (iso) => iso.replace("T", " ");
+
+    const findCard = (origin) =>
+        Array.from(container.children).find(
+            (card) => card.dataset.origin === origin,
+        );
+
+    const createCard = (origin) => {
+        const card = template.content.firstElementChild.cloneNode(true);
+        card.dataset.origin = origin;
+        card.querySelector('[data-field="origin"]').textContent = origin;
+
+        const next = Array.from(container.children).find(
+            (other) => other.dataset.origin > origin,
+        );
+        container.insertBefore(card, next ?? null);
+        return card;
+    };
+
+    const render = (snapshot) => {
+        const card = findCard(snapshot.origin) ?? createCard(snapshot.origin);
+        const metrics = card.querySelector('[data-field="metrics"]');
+
+        card.querySelector('[data-field="timestamp"]').textContent = formatTime(
+            snapshot.timestamp,
+        );
+        metrics.replaceChildren(
+            ...snapshot.metrics.slice(0, MAX_METRICS).flatMap(([name, value, unit]) => {
+                const label = document.createElement("div");
+                const reading = document.createElement("div");
+                label.textContent = name;
+                reading.textContent = `${formatter.format(value)} ${unit}`;
+                return [label, reading];
+            }),
+        );
+    };
+
+    if (container === null || !("EventSource" in window)) {
+        return;
+    }
+
+    const source = new EventSource(container.dataset.stream);
+    source.addEventListener("snapshot", (event) => render(JSON.parse(event.data)));
+})();
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Final
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from numpy.typing import NDArray
+
+    from application.common._types import JSON
+    from application.ingest import SnapshotRow
+    from application.series import Series
+    from application.storage import StorageBackend
+
+    type SeriesKey = tuple[str, str, str | None, dt, dt | None, int | None]
+    type Arrays = tuple[NDArray[np.int64], NDArray[np.float64]]
+
+# decay**n for the EWMA is kept above this within a block, see _ewma()
+EWMA_MIN_SCALE: Final[float] = 1e-100
+
+
+class StatsUnavailableError(RuntimeError):
+    pass
+
+
+# Summary statistics over series loaded straight into NumPy arrays (the
+# Series arrays are wrapped, not copied). Loaded series are cached by
+# (origin, metric, unit, range, step) for the origin's data generation:
+# an ingest bumps the generations of the origins it wrote, a retention
+# run all of them. Ranges left open (no "to") also move with the clock,
+# so those entries are only kept for `max_age` seconds
+class StatsEngine:
+    DEFAULT_MAX_SERIES: Final[int] = 32
+    DEFAULT_MAX_AGE: Final[float] = 10.0
+    DEFAULT_PERCENTILES: Final[tuple[float, ...]] = (50.0, 95.0, 99.0)
+    DEFAULT_ALPHA: Final[float] = 0.1
+    DEFAULT_WINDOW: Final[float] = 300.0
+
+    storage: StorageBackend
+    logger: Logger
+    max_series: int
+    max_age: float
+    percentiles: tuple[float, ...]
+    alpha: float
+    window: float
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        logger: Logger,
+        cfg: dict[str, Any],
+    ) -> None:
+        self.storage = storage
+        self.logger = logger
+        self.max_series = cfg.get("max_series", StatsEngine.DEFAULT_MAX_SERIES)
+        self.max_age = cfg.get("max_age", StatsEngine.DEFAULT_MAX_AGE)
+        self.percentiles = tuple(
+            cfg.get("percentiles", StatsEngine.DEFAULT_PERCENTILES),
+        )
+        self.alpha = cfg.get("alpha", StatsEngine.DEFAULT_ALPHA)
+        self.window = cfg.get("window", StatsEngine.DEFAULT_WINDOW)
+        self._global: int = 0
+        self._generations: dict[str, int] = {}
+        # key -> (generation, loaded at (monotonic), arrays)
+        self._series: OrderedDict[SeriesKey, tuple[tuple[int, int], float, Arrays]] = (
+            OrderedDict()
+        )
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    # Ingest listener
+    def bump(self, rows: list[SnapshotRow]) -> None:
+        with self._lock:
+            for origin in {row.origin for row in rows}:
+                self._generations[origin] = self._generations.get(origin, 0) + 1
+
+    # Retention listener; the purge count is unused
+    def bump_all(self, *_: Any) -> None:  # noqa: ANN401
+        with self._lock:
+            self._global += 1
+
+    def generation(self, origin: str) -> tuple[int, int]:
+        with self._lock:
+            return self._global, self._generations.get(origin, 0)
+
+    # `open_ended` when the range was defaulted from the current time
+    def load(  # noqa: PLR0913
+        self,
+        origin: str,
+        metric: str,
+        start: dt,
+        end: dt,
+        *,
+        open_ended: bool = False,
+        step: int | None = None,
+        unit: str | None = None,
+    ) -> Arrays:
+        if np is None:
+            err_msg: str = "numpy is not installed (install the 'analytics' extra)"
+            raise StatsUnavailableError(err_msg)
+
+        # An open end moves with the clock; the start is as requested
+        key: SeriesKey = (
+            origin,
+            metric,
+            unit,
+            start,
+            None if open_ended else end,
+            step,
+        )
+        generation: tuple[int, int] = self.generation(origin)
+        now: float = time.monotonic()
+
+        with self._lock:
+            entry: tuple[tuple[int, int], float, Arrays] | None = self._series.get(key)
+            if (
+                entry is not None
+                and entry[0] == generation
+                and (not open_ended or now - entry[1] < self.max_age)
+            ):
+                self._series.move_to_end(key)
+                return entry[2]
+
+        series: Series = self.storage.range(
+            origin, metric, start, end, step=step, unit=unit
+        )
+        arrays: Arrays = (
+            np.frombuffer(series.timestamps, dtype=np.int64),
+            np.frombuffer(series.values, dtype=np.float64),
+        )
+
+        if self.max_series:
+            with self._lock:
+                self._series[key] = (generation, now, arrays)
+                self._series.move_to_end(key)
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+        return arrays
+
+    def summary(
+        self,
+        arrays: Arrays,
+        *,
+        percentiles: Sequence[float] | None = None,
+        alpha: float | None = None,
+        window: float | None = None,
+    ) -> JSON:
+        timestamps, values = arrays
+        percentiles = self.percentiles if percentiles is None else percentiles
+        alpha = self.alpha if alpha is None else alpha
+        window = self.window if window is None else window
+
+        result: JSON = {
+            "count": len(values),
+            "min": None,
+            "max": None,
+            "mean": None,
+            "std": None,
+            "percentiles": dict.fromkeys(f"p{p:g}" for p in percentiles),
+            "ewma": {"alpha": alpha, "last": None},
+            "moving_average": {
+                "window": window,
+                "last": None,
+                "min": None,
+                "max": None,
+            },
+        }
+        if not len(values):
+            return result
+
+        result["min"] = float(values.min())
+        result["max"] = float(values.max())
+        result["mean"] = float(values.mean())
+        result["std"] = float(values.std())
+        result["percentiles"] = dict(
+            zip(
+                result["percentiles"],
+                np.percentile(values, percentiles).tolist(),
+                strict=True,
+            ),
+        )
+        result["ewma"]["last"] = float(_ewma(values, alpha)[-1])
+
+        averages: NDArray[np.float64] = _moving_average(timestamps, values, window)
+        result["moving_average"].update(
+            last=float(averages[-1]),
+            min=float(averages.min()),
+            max=float(averages.max()),
+        )
+        return result
+
+
+# Pearson's r over the timestamps both series have; metrics of one
+# snapshot share its timestamp, other origins need a common `step`
+def correlate(a: Arrays, b: Arrays) -> tuple[int, float | None]:
+    _, ia, ib = np.intersect1d(a[0], b[0], return_indices=True)
+    if len(ia) < 2:  # noqa: PLR2004
+        return len(ia), None
+
+    x: NDArray[np.float64] = a[1][ia]
+    y: NDArray[np.float64] = b[1][ib]
+    if not x.std() or not y.std():
+        return len(ia), None
+    return len(ia), float(np.corrcoef(x, y)[0, 1])
+
+
+# y[0] = x[0], y[i] = alpha * x[i] + (1 - alpha) * y[i-1]. Unrolled within a
+# block, y[i] = d**i * (y[-1] + alpha * cumsum(x[j] / d**j)) with d = 1 - alpha;
+# blocks are short enough that d**i stays representable
+def _ewma(values: NDArray[np.float64], alpha: float) -> NDArray[np.float64]:
+    decay: float = 1.0 - alpha
+    if decay <= 0.0:
+        return values
+
+    block: int = max(int(math.log(EWMA_MIN_SCALE) / math.log(decay)), 1)
+    scales: NDArray[np.float64] = decay ** np.arange(1, min(block, len(values)) + 1)
+    out: NDArray[np.float64] = np.empty_like(values)
+    last: float = float(values[0])
+
+    for i in range(0, len(values), block):
+        chunk: NDArray[np.float64] = values[i : i + block]
+        scale: NDArray[np.float64] = scales[: len(chunk)]
+        out[i : i + len(chunk)] = scale * (last + alpha * np.cumsum(chunk / scale))
+        last = float(out[i + len(chunk) - 1])
+
+    return out
+
+
+# Mean of the samples in (t - window, t] at each sample's time t
+def _moving_average(
+    timestamps: NDArray[np.int64],
+    values: NDArray[np.float64],
+    window: float,
+) -> NDArray[np.float64]:
+    sums: NDArray[np.float64] = np.concatenate(([0.0], np.cumsum(values)))
+    ends: NDArray[np.intp] = np.arange(1, len(values) + 1)
+    starts: NDArray[np.intp] = np.searchsorted(
+        timestamps,
+        timestamps - int(window * 1000),
+        side="right",
+    )
+    return (sums[ends] - sums[starts]) / (ends - starts)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Final
+
+from application.storage.base import StorageBackend
+from application.storage.postgres import PostgresBackend
+from application.storage.sqlite import SQLiteBackend
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from sqlalchemy.engine import Engine
+
+BACKENDS: Final[dict[str, type[StorageBackend]]] = {
+    SQLiteBackend.dialect: SQLiteBackend,
+    PostgresBackend.dialect: PostgresBackend,
+}
+
+
+# Picks the backend for the engine's dialect. Must run before the engine's
+# first connection, as backends hook per-connection setup (pragmas, time zone)
+def create_backend(
+    engine: Engine,
+    cfg: dict[str, Any],
+    *,
+    resolutions: Iterable[int] | None = None,
+) -> StorageBackend:
+    backend: type[StorageBackend] | None = BACKENDS.get(engine.dialect.name)
+    if backend is None:
+        err_msg: str = f"No storage backend for database {engine.dialect.name!r}"
+        raise ValueError(err_msg)
+    return backend(engine, cfg, resolutions=resolutions)
+
+
+__all__: list[str] = [
+    "BACKENDS",
+    "PostgresBackend",
+    "SQLiteBackend",
+    "StorageBackend",
+    "create_backend",
+]
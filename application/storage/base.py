@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from itertools import groupby
+from typing import TYPE_CHECKING, Any, ClassVar, Final
+
+from sqlalchemy import case, func, insert, select
+
+from application.common.util import as_utc
+from application.dimensions import Dimensions
+from application.ingest import MetricRow, SnapshotRow
+from application.migrations import run_migrations
+from application.models import (
+    Base,
+    Device,
+    Metric,
+    MetricDefinition,
+    MetricRollup,
+    MetricSnapshot,
+)
+from application.rollup import RollupStore
+from application.series import SeriesQuery
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from datetime import datetime as dt
+    from logging import Logger
+
+    from sqlalchemy import ColumnElement, Insert
+    from sqlalchemy.engine import Connection, Engine, Row
+
+    from application.archive import Archive
+    from application.common._types import JSON
+    from application.series import Series
+
+
+# Everything the app reads and writes in bulk goes through a backend: batch
+# ingest, the newest snapshot per origin, range (series) queries and rollup
+# queries, plus schema setup. Backends share the ORM models and the generic
+# SQL below; subclasses supply the dialect-specific parts (upsert syntax,
+# epoch conversion, the bulk metric insert) and their own schema tuning
+class StorageBackend(ABC):
+    DEFAULT_WRITE_TIMEOUT: Final[float] = 30.0
+
+    dialect: ClassVar[str]
+
+    reader: Engine
+    writer: Engine
+    cfg: dict[str, Any]
+    dims: Dimensions
+    rollups: RollupStore
+    series_query: SeriesQuery
+    archive: Archive | None
+
+    # `cfg` is the "storage" config section
+    def __init__(
+        self,
+        reader: Engine,
+        cfg: dict[str, Any],
+        *,
+        resolutions: Iterable[int] | None = None,
+    ) -> None:
+        self.reader = reader
+        self.cfg = cfg
+        self.writer = self.writer_engine()
+        self.dims = Dimensions(self.writer, self.insert)
+        self.rollups = RollupStore(self.upsert_rollups, resolutions)
+        self.series_query = SeriesQuery(self.rollups.resolutions, self.epoch_ms)
+        self.archive = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}[URL={self.reader.url!r}]"
+
+    # Dialect hooks
+    @abstractmethod
+    def insert(self, model: Any) -> Insert: ...  # noqa: ANN401
+
+    @abstractmethod
+    def epoch_ms(self, column: ColumnElement) -> ColumnElement: ...
+
+    @abstractmethod
+    def least(self, a: ColumnElement, b: ColumnElement) -> ColumnElement: ...
+
+    @abstractmethod
+    def greatest(self, a: ColumnElement, b: ColumnElement) -> ColumnElement: ...
+
+    # Engine for ingest, dimension and retention writes
+    def writer_engine(self) -> Engine:
+        return self.reader
+
+    def insert_metrics(self, conn: Connection, metrics: list[JSON]) -> None:
+        conn.execute(insert(Metric), metrics)
+
+    # Returns bytes reclaimed, where the backend can tell
+    def compact(self, _pages: int) -> int:
+        return 0
+
+    # Schema. Runs on every start, in every environment: migrations first
+    # (they may rename legacy tables out of the way), then anything missing
+    def setup(self, logger: Logger) -> None:
+        run_migrations(self.writer, logger)
+        self.create_schema()
+        self._backfill_rollups(logger)
+
+    def create_schema(self) -> None:
+        Base.metadata.create_all(self.writer)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.writer, checkfirst=True)
+
+    def _backfill_rollups(self, logger: Logger) -> None:
+        with self.writer.connect() as conn:
+            if conn.execute(select(MetricRollup.id).limit(1)).first() is not None:
+                return
+
+        n: int = self.rollups.backfill(self.writer)
+        if n:
+            logger.info("Rolled up %d existing metrics", n)
+
+    # Operations
+    def write(self, rows: list[SnapshotRow]) -> list[int]:
+        devices: dict[str, int] = self.dims.device_ids(r.origin for r in rows)
+        definitions: dict[tuple[str, str], int] = self.dims.definition_ids(
+            (m.name, m.unit) for r in rows for m in r.metrics
+        )
+
+        with self.writer.begin() as conn:
+            ids: list[int] = list(
+                conn.execute(
+                    insert(MetricSnapshot).returning(
+                        MetricSnapshot.id,
+                        sort_by_parameter_order=True,
+                    ),
+                    [
+                        {"device_id": devices[r.origin], "timestamp": r.timestamp}
+                        for r in rows
+                    ],
+                ).scalars(),
+            )
+
+            metrics: list[JSON] = [
+                {
+                    "definition_id": definitions[m.name, m.unit],
+                    "value": m.value,
+                    "snapshot_id": snapshot_id,
+                }
+                for row, snapshot_id in zip(rows, ids, strict=True)
+                for m in row.metrics
+            ]
+
+            if metrics:
+                self.insert_metrics(conn, metrics)
+
+            self.rollups.update(
+                conn,
+                (
+                    (
+                        devices[row.origin],
+                        definitions[m.name, m.unit],
+                        row.timestamp,
+                        m.value,
+                    )
+                    for row in rows
+                    for m in row.metrics
+                ),
+            )
+
+        return ids
+
+    def latest(self) -> list[SnapshotRow]:
+        # Newest snapshot per device and its metrics in one query, via the
+        # (device_id, timestamp, id) index
+        newest_id: ColumnElement = (
+            select(MetricSnapshot.id)
+            .where(MetricSnapshot.device_id == Device.id)
+            .order_by(MetricSnapshot.timestamp.desc(), MetricSnapshot.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        return self._snapshot_rows(
+            MetricSnapshot.id.in_(select(newest_id).select_from(Device)),
+        )
+
+    def newest_id(self) -> int:
+        with self.reader.connect() as conn:
+            return conn.execute(select(func.max(MetricSnapshot.id))).scalar() or 0
+
+    # Up to `limit` snapshots with after < id <= until, in id order
+    def snapshots_between(
+        self, after: int, until: int, limit: int
+    ) -> list[SnapshotRow]:
+        return self._snapshot_rows(
+            MetricSnapshot.id.in_(
+                select(MetricSnapshot.id)
+                .where(MetricSnapshot.id > after, MetricSnapshot.id <= until)
+                .order_by(MetricSnapshot.id)
+                .limit(limit),
+            ),
+        )
+
+    def _snapshot_rows(self, where: ColumnElement) -> list[SnapshotRow]:
+        query = (
+            select(
+                MetricSnapshot.id,
+                Device.name,
+                MetricSnapshot.timestamp,
+                MetricDefinition.name,
+                Metric.value,
+                MetricDefinition.unit,
+            )
+            .join(Device, Device.id == MetricSnapshot.device_id)
+            .outerjoin(Metric, Metric.snapshot_id == MetricSnapshot.id)
+            .outerjoin(MetricDefinition, MetricDefinition.id == Metric.definition_id)
+            .where(where)
+            .order_by(MetricSnapshot.id, Metric.id)
+        )
+
+        with self.reader.connect() as conn:
+            result: Sequence[Row] = conn.execute(query).all()
+
+        rows: list[SnapshotRow] = []
+        for snapshot_id, group in groupby(result, key=lambda r: r[0]):
+            metrics: list[Row] = list(group)
+            rows.append(
+                SnapshotRow(
+                    origin=metrics[0][1],
+                    timestamp=as_utc(metrics[0][2]),
+                    metrics=tuple(
+                        MetricRow(m[3], m[4], m[5]) for m in metrics if m[3] is not None
+                    ),
+                    id=snapshot_id,
+                ),
+            )
+        return rows
+
+    def range(  # noqa: PLR0913
+        self,
+        origin: str,
+        metric: str,
+        start: dt,
+        end: dt,
+        *,
+        step: int | None = None,
+        unit: str | None = None,
+    ) -> Series:
+        with self.reader.connect() as conn:
+            archived: list[tuple[int, float]] = []
+            if self.archive is not None and self.series_query.resolution(step) is None:
+                archived = self.archive.scan(
+                    conn, origin, metric, start, end, unit=unit
+                )
+
+            return self.series_query.load(
+                conn,
+                origin,
+                metric,
+                start,
+                end,
+                step=step,
+                unit=unit,
+                archived=archived,
+            )
+
+    def rollup(
+        self,
+        origin: str,
+        name: str,
+        start: dt,
+        end: dt,
+        points: int,
+    ) -> tuple[int, Sequence[Row]]:
+        with self.reader.connect() as conn:
+            return self.rollups.query(conn, origin, name, start, end, points)
+
+    def upsert_rollups(self, conn: Connection, buckets: list[JSON]) -> None:
+        stmt: Insert = self.insert(MetricRollup)
+        excluded: Any = stmt.excluded
+        newer: ColumnElement = excluded.last_timestamp >= MetricRollup.last_timestamp
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    "device_id",
+                    "definition_id",
+                    "resolution",
+                    "bucket",
+                ],
+                set_={
+                    "count": MetricRollup.count + excluded.count,
+                    "sum": MetricRollup.sum + excluded.sum,
+                    "min": self.least(MetricRollup.min, excluded.min),
+                    "max": self.greatest(MetricRollup.max, excluded.max),
+                    "last": case((newer, excluded.last), else_=MetricRollup.last),
+                    "last_timestamp": case(
+                        (newer, excluded.last_timestamp),
+                        else_=MetricRollup.last_timestamp,
+                    ),
+                },
+            ),
+            buckets,
+        )
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import io
+import threading
+from datetime import datetime as dt
+from datetime import timezone as tz
+from typing import TYPE_CHECKING, Any, Final
+
+from sqlalchemy import BigInteger, cast, event, extract, func, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from application.common.util import as_utc, utc_now
+from application.models import (
+    Base,
+    Device,
+    DeviceCommand,
+    Metric,
+    MetricDefinition,
+    MetricRollup,
+)
+from application.storage.base import StorageBackend
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from logging import Logger
+
+    from sqlalchemy import ColumnElement, Insert
+    from sqlalchemy.engine import Connection, Engine
+
+    from application.common._types import JSON
+    from application.ingest import SnapshotRow
+
+PARTITIONING_MODES: Final[tuple[str, ...]] = ("native", "timescale", "none")
+COPY_METRICS: Final[str] = "COPY metric (definition_id, value, snapshot_id) FROM STDIN"
+INSERT_CHUNK_SIZE: Final[int] = 1000
+
+# metric_snapshot carries the time partition key, so it must be part of the
+# primary key; ids still come from a single sequence and stay unique. metric
+# keeps snapshot_id without a foreign key, as neither native partitioned
+# tables nor hypertables can be referenced by id alone
+SNAPSHOT_TABLE: Final[str] = (
+    "CREATE TABLE IF NOT EXISTS metric_snapshot ("
+    "id BIGSERIAL, "
+    "device_id INTEGER NOT NULL REFERENCES device (id), "
+    "timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+    "PRIMARY KEY (id, timestamp))"
+)
+METRIC_SCHEMA: Final[tuple[str, ...]] = (
+    (
+        "CREATE TABLE IF NOT EXISTS metric ("
+        "id BIGSERIAL PRIMARY KEY, "
+        "definition_id INTEGER NOT NULL REFERENCES metric_definition (id), "
+        "value DOUBLE PRECISION NOT NULL, "
+        "snapshot_id BIGINT NOT NULL)"
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS ix_metric_snapshot_timestamp_id "
+        "ON metric_snapshot (timestamp, id)"
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS ix_metric_snapshot_device_timestamp_id "
+        "ON metric_snapshot (device_id, timestamp, id)"
+    ),
+    "CREATE INDEX IF NOT EXISTS ix_metric_snapshot_id ON metric (snapshot_id)",
+    (
+        "CREATE INDEX IF NOT EXISTS ix_metric_definition_snapshot_id "
+        "ON metric (definition_id, snapshot_id)"
+    ),
+)
+
+
+# PostgreSQL, optionally with TimescaleDB. Raw snapshots are partitioned by
+# time: natively (one range partition per month, created ahead of the rows
+# that need them) or as a hypertable. Metric batches go in through COPY on
+# psycopg/psycopg2 connections and multi-row INSERTs on other drivers.
+# Install the 'postgres' extra for the psycopg driver
+class PostgresBackend(StorageBackend):
+    dialect = "postgresql"
+
+    partitioning: str
+    months_ahead: int
+
+    def __init__(
+        self,
+        reader: Engine,
+        cfg: dict[str, Any],
+        *,
+        resolutions: Iterable[int] | None = None,
+    ) -> None:
+        pg_cfg: dict[str, Any] = cfg.get("postgres", {})
+        self.partitioning = pg_cfg.get("partitioning", "native")
+        if self.partitioning not in PARTITIONING_MODES:
+            err_msg: str = f"Unknown partitioning mode: {self.partitioning!r}"
+            raise ValueError(err_msg)
+
+        self.months_ahead = pg_cfg.get("partition_months_ahead", 2)
+        self.chunk_interval: str = pg_cfg.get("chunk_interval", "7 days")
+        self._partitions: set[dt] = set()
+        self._partitioned: bool = False
+        self._lock: threading.Lock = threading.Lock()
+
+        use_utc(reader)
+        super().__init__(reader, cfg, resolutions=resolutions)
+
+    def insert(self, model: Any) -> Insert:  # noqa: ANN401
+        return pg_insert(model)
+
+    def epoch_ms(self, column: ColumnElement) -> ColumnElement:
+        return cast(func.round(extract("epoch", column) * 1000), BigInteger)
+
+    def least(self, a: ColumnElement, b: ColumnElement) -> ColumnElement:
+        return func.least(a, b)
+
+    def greatest(self, a: ColumnElement, b: ColumnElement) -> ColumnElement:
+        return func.greatest(a, b)
+
+    def insert_metrics(self, conn: Connection, metrics: list[JSON]) -> None:
+        driver: str = conn.dialect.driver
+        rows: list[tuple[int, float, int]] = [
+            (m["definition_id"], m["value"], m["snapshot_id"]) for m in metrics
+        ]
+        dbapi_conn: Any = conn.connection.driver_connection
+
+        if driver == "psycopg":
+            with dbapi_conn.cursor() as cursor, cursor.copy(COPY_METRICS) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        elif driver == "psycopg2":
+            buffer: io.StringIO = io.StringIO(
+                "".join(f"{d}\t{v!r}\t{s}\n" for d, v, s in rows),
+            )
+            with dbapi_conn.cursor() as cursor:
+                cursor.copy_expert(COPY_METRICS, buffer)
+        else:
+            for i in range(0, len(metrics), INSERT_CHUNK_SIZE):
+                conn.execute(
+                    insert(Metric).values(metrics[i : i + INSERT_CHUNK_SIZE]),
+                )
+
+    def setup(self, logger: Logger) -> None:
+        super().setup(logger)
+        if self._partitioned:
+            now: dt = utc_now()
+            self.ensure_partitions(
+                _add_months(_month_start(now), n) for n in range(self.months_ahead + 1)
+            )
+        logger.info("PostgreSQL storage ready (partitioning: %s)", self.partitioning)
+
+    def create_schema(self) -> None:
+        if self.partitioning == "none":
+            super().create_schema()
+            return
+
+        with self.writer.begin() as conn:
+            Base.metadata.create_all(
+                conn,
+                tables=[
+                    Device.__table__,
+                    MetricDefinition.__table__,
+                    MetricRollup.__table__,
+                    DeviceCommand.__table__,
+                ],
+            )
+
+            if self.partitioning == "timescale":
+                if not conn.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"),
+                ).first():
+                    err_msg: str = (
+                        "Partitioning 'timescale' needs the timescaledb extension"
+                    )
+                    raise ValueError(err_msg)
+                conn.exec_driver_sql(SNAPSHOT_TABLE)
+                conn.execute(
+                    text(
+                        "SELECT create_hypertable('metric_snapshot', 'timestamp', "
+                        "chunk_time_interval => CAST(:interval AS INTERVAL), "
+                        "if_not_exists => TRUE)",
+                    ),
+                    {"interval": self.chunk_interval},
+                )
+            else:
+                conn.exec_driver_sql(f"{SNAPSHOT_TABLE} PARTITION BY RANGE (timestamp)")
+
+            for statement in METRIC_SCHEMA:
+                conn.exec_driver_sql(statement)
+
+            # An existing unpartitioned table (e.g. from 'none') is left as is
+            self._partitioned = (
+                conn.execute(
+                    text(
+                        "SELECT relkind FROM pg_class "
+                        "WHERE oid = 'metric_snapshot'::regclass",
+                    ),
+                ).scalar_one()
+                == "p"
+            )
+
+    def ensure_partitions(self, months: Iterable[dt]) -> None:
+        with self._lock:
+            missing: set[dt] = set(months) - self._partitions
+            if not missing:
+                return
+
+            with self.writer.begin() as conn:
+                for month in sorted(missing):
+                    end: dt = _add_months(month, 1)
+                    conn.exec_driver_sql(
+                        f'CREATE TABLE IF NOT EXISTS "metric_snapshot_p{month:%Y%m}" '
+                        "PARTITION OF metric_snapshot FOR VALUES "
+                        f"FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')",
+                    )
+            self._partitions |= missing
+
+    def write(self, rows: list[SnapshotRow]) -> list[int]:
+        if self._partitioned:
+            self.ensure_partitions({_month_start(r.timestamp) for r in rows})
+        return super().write(rows)
+
+
+def use_utc(engine: Engine) -> None:
+    # DateTime columns are naive UTC; pin the session time zone so aware
+    # datetimes are converted to UTC on the way in, whatever the server's
+    @event.listens_for(engine, "connect")
+    def set_time_zone(dbapi_conn: Any, _record: Any) -> None:  # noqa: ANN401
+        autocommit: bool = dbapi_conn.autocommit
+        dbapi_conn.autocommit = True
+        cursor: Any = dbapi_conn.cursor()
+        try:
+            cursor.execute("SET TIME ZONE 'UTC'")
+        finally:
+            cursor.close()
+            dbapi_conn.autocommit = autocommit
+
+
+def _month_start(timestamp: dt) -> dt:
+    utc: dt = as_utc(timestamp)
+    return dt(utc.year, utc.month, 1, tzinfo=tz.utc)
+
+
+def _add_months(month: dt, n: int) -> dt:
+    year, index = divmod(month.month - 1 + n, 12)
+    return month.replace(year=month.year + year, month=index + 1)
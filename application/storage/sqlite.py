@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Final
+
+from sqlalchemy import Integer, cast, create_engine, event, func
+from sqlalchemy.dialects.sqlite import insert
+
+from application.storage.base import StorageBackend
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from sqlalchemy import ColumnElement, Insert
+    from sqlalchemy.engine import Connection, Engine
+
+# Julian day of the Unix epoch; julianday() is the portable way to get
+# sub-second epoch offsets out of SQLite's text timestamps
+UNIX_EPOCH_JULIAN_DAY: Final[float] = 2440587.5
+MS_PER_DAY: Final[float] = 86_400_000.0
+
+
+class SQLiteBackend(StorageBackend):
+    dialect = "sqlite"
+
+    pragmas: dict[str, Any]
+
+    # The "sqlite" mapping of the storage config holds the pragmas
+    def __init__(
+        self,
+        reader: Engine,
+        cfg: dict[str, Any],
+        *,
+        resolutions: Iterable[int] | None = None,
+    ) -> None:
+        self.pragmas = cfg.get("sqlite", {})
+        apply_pragmas(reader, self.pragmas)
+        super().__init__(reader, cfg, resolutions=resolutions)
+
+    def writer_engine(self) -> Engine:
+        return writer_engine(
+            self.reader,
+            self.pragmas,
+            self.cfg.get("write_timeout", StorageBackend.DEFAULT_WRITE_TIMEOUT),
+        )
+
+    def insert(self, model: Any) -> Insert:  # noqa: ANN401
+        return insert(model)
+
+    def epoch_ms(self, column: ColumnElement) -> ColumnElement:
+        return cast(
+            func.round((func.julianday(column) - UNIX_EPOCH_JULIAN_DAY) * MS_PER_DAY),
+            Integer,
+        )
+
+    # SQLite's multi-argument min()/max() are scalar, not aggregates
+    def least(self, a: ColumnElement, b: ColumnElement) -> ColumnElement:
+        return func.min(a, b)
+
+    def greatest(self, a: ColumnElement, b: ColumnElement) -> ColumnElement:
+        return func.max(a, b)
+
+    def create_schema(self) -> None:
+        # Only takes effect on a fresh database file; lets the retention
+        # job reclaim space with incremental vacuums
+        with self.writer.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        super().create_schema()
+
+    def compact(self, pages: int) -> int:
+        with self.writer.connect() as conn:
+            before: int = _db_size(conn)
+
+            # Only databases created with auto_vacuum=INCREMENTAL can shrink
+            # without a full (write-locking) VACUUM. executescript() steps the
+            # pragma to completion; execute() would free a single page
+            if pages and _pragma(conn, "auto_vacuum") == 2:  # noqa: PLR2004
+                conn.connection.driver_connection.executescript(
+                    f"PRAGMA incremental_vacuum({pages});",
+                )
+
+            conn.exec_driver_sql("PRAGMA optimize")
+            conn.commit()
+            return before - _db_size(conn)
+
+
+def apply_pragmas(engine: Engine, pragmas: dict[str, Any]) -> None:
+    # Runs on every new DBAPI connection, before the pool hands it out, so
+    # per-connection settings (cache_size, mmap_size, busy_timeout) hold for
+    # all of them; journal_mode=WAL is persistent once set on the file
+    if not pragmas:
+        return
+
+    for name in pragmas:
+        if not name.isidentifier():
+            err_msg: str = f"Invalid SQLite pragma name: {name!r}"
+            raise ValueError(err_msg)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn: Any, _record: Any) -> None:  # noqa: ANN401
+        cursor: Any = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def writer_engine(reader: Engine, pragmas: dict[str, Any], timeout: float) -> Engine:
+    # SQLite allows one writer at a time. A dedicated single-connection pool
+    # queues writers in-process (in order, without sleeping) rather than
+    # letting them race for the file lock through the busy handler; readers
+    # keep their own pool and, under WAL, are never blocked by the writer.
+    # In-memory SQLite (where a second engine would be a second database)
+    # writes through the reader engine
+    if reader.url.database in {None, "", ":memory:"}:
+        return reader
+
+    writer: Engine = create_engine(
+        reader.url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=timeout,
+    )
+    apply_pragmas(writer, pragmas)
+    return writer
+
+
+def _pragma(conn: Connection, name: str) -> int:
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar_one()
+
+
+def _db_size(conn: Connection) -> int:
+    return _pragma(conn, "page_count") * _pragma(conn, "page_size")
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import threading
+from queue import Empty, Full, Queue
+from typing import TYPE_CHECKING, Any, Final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from application.ingest import SnapshotRow
+
+
+class Subscription:
+    queue: Queue[bytes]
+    evicted: bool
+
+    def __init__(self, size: int) -> None:
+        self.queue = Queue(size)
+        self.evicted = False
+
+    def events(self, heartbeat: float) -> Iterator[bytes]:
+        while not self.evicted:
+            try:
+                yield self.queue.get(timeout=heartbeat)
+            except Empty:  # noqa: PERF203
+                yield StreamHub.HEARTBEAT
+
+
+class StreamHub:
+    HEARTBEAT: Final[bytes] = b": keep-alive\n\n"
+
+    max_clients: int
+    client_queue_size: int
+    heartbeat: float
+    evictions: int
+
+    def __init__(self, cfg: dict[str, Any]) -> None:
+        self.max_clients = cfg.get("max_clients", 100)
+        self.client_queue_size = cfg.get("client_queue_size", 64)
+        self.heartbeat = cfg.get("heartbeat", 15.0)
+        self.evictions = 0
+        self._subscribers: set[Subscription] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, backlog: list[SnapshotRow]) -> Subscription | None:
+        sub: Subscription = Subscription(self.client_queue_size)
+
+        # Current state first, so (re)connecting clients start up to date
+        for row in backlog[-self.client_queue_size :]:
+            sub.queue.put_nowait(StreamHub.encode(row))
+
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            self._subscribers.add(sub)
+
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, rows: list[SnapshotRow]) -> None:
+        events: list[bytes] = [StreamHub.encode(row) for row in rows]
+
+        with self._lock:
+            subscribers: list[Subscription] = list(self._subscribers)
+
+        for sub in subscribers:
+            try:
+                for event in events:
+                    sub.queue.put_nowait(event)
+            except Full:  # noqa: PERF203
+                self._evict(sub)
+
+    def _evict(self, sub: Subscription) -> None:
+        sub.evicted = True
+        self.evictions += 1
+        self.unsubscribe(sub)
+
+    @staticmethod
+    def encode(row: SnapshotRow) -> bytes:
+        data: str = json.dumps(row.to_json(), separators=(",", ":"))
+        return f"event: snapshot\ndata: {data}\n\n".encode()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from datetime import datetime as dt  # noqa: TC003 (resolved by pydantic at runtime)
+from json import JSONDecodeError, loads
+from typing import TYPE_CHECKING, Annotated, Any, Final
+
+from pydantic import (
+    AfterValidator,
+    BaseModel,
+    ConfigDict,
+    Field,
+    StrictFloat,
+    StrictStr,
+    TypeAdapter,
+    ValidationError,
+)
+
+from application.common.util import as_utc
+
+if TYPE_CHECKING:
+    from pydantic_core import ErrorDetails
+
+    from application.common._types import JSON
+
+
+# A validation error, rather than an OverflowError, for times whose UTC
+# equivalent falls outside datetime's range
+def _utc(value: dt) -> dt:
+    try:
+        return as_utc(value)
+    except OverflowError as e:
+        err_msg: str = "Timestamp out of range"
+        raise ValueError(err_msg) from e
+
+
+class MetricPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    name: StrictStr
+    # Strict floats still accept ints, but not "1.5" or true; nor NaN or
+    # Infinity, which the JSON parser would otherwise let through
+    value: Annotated[StrictFloat, Field(allow_inf_nan=False)]
+    unit: StrictStr
+
+
+class SnapshotPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    origin: StrictStr
+    timestamp: Annotated[dt, AfterValidator(_utc)]
+    metrics: list[MetricPayload]
+
+
+class CommandPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    origin: Annotated[StrictStr, Field(min_length=1)]
+    command: Annotated[StrictStr, Field(min_length=1)]
+    args: dict[str, Any] = Field(default_factory=dict)
+    ttl: Annotated[float, Field(gt=0)] | None = None  # Seconds until it expires
+
+
+# Built once; validate_json() parses and validates in a single pass in Rust
+SNAPSHOTS: Final[TypeAdapter[list[SnapshotPayload]]] = TypeAdapter(
+    list[SnapshotPayload],
+)
+
+
+class PayloadError(ValueError):
+    results: list[JSON]
+
+    def __init__(self, message: str, results: list[JSON] | None = None) -> None:
+        super().__init__(message)
+        self.results = results or []
+
+
+def validate_snapshots(payload: bytes | str | Any) -> list[SnapshotPayload]:  # noqa: ANN401
+    try:
+        if isinstance(payload, bytes | str):
+            return SNAPSHOTS.validate_json(_unwrap(payload))
+        return SNAPSHOTS.validate_python(payload)
+    except ValidationError as e:
+        raise _payload_error(e.errors(include_url=False, include_input=False)) from e
+
+
+def validate_command(payload: Any) -> CommandPayload:  # noqa: ANN401
+    try:
+        return CommandPayload.model_validate(payload)
+    except ValidationError as e:
+        messages: list[str] = [
+            f"{'.'.join(str(part) for part in error['loc']) or 'command'}: "
+            f"{error['msg']}"
+            for error in e.errors(include_url=False, include_input=False)
+        ]
+        err_msg: str = "Invalid command"
+        raise PayloadError(err_msg, [{"errors": messages}]) from e
+
+
+def _unwrap(raw: bytes | str) -> bytes | str:
+    # Older collectors post json.dumps(payload) as the JSON body, so the
+    # document is a string holding the real array; peel that layer off
+    if raw.lstrip()[:1] not in {b'"', '"'}:
+        return raw
+
+    try:
+        inner: Any = loads(raw)
+    except JSONDecodeError as e:
+        err_msg: str = f"Invalid JSON: {e}"
+        raise PayloadError(err_msg) from e
+
+    return inner if isinstance(inner, str) else raw
+
+
+def _payload_error(errors: list[ErrorDetails]) -> PayloadError:
+    by_index: dict[int, list[str]] = {}
+
+    for error in errors:
+        loc: tuple[int | str, ...] = error["loc"]
+
+        if not loc or not isinstance(loc[0], int):
+            return PayloadError(
+                "Invalid JSON data" if error["type"] == "list_type" else error["msg"],
+            )
+
+        field: str = ".".join(str(part) for part in loc[1:]) or "snapshot"
+        by_index.setdefault(loc[0], []).append(f"{field}: {error['msg']}")
+
+    return PayloadError(
+        "Invalid snapshots",
+        [
+            {"index": i, "status": "error", "errors": messages}
+            for i, messages in sorted(by_index.items())
+        ],
+    )
@@ -0,0 +1,180 @@
+# Concurrent read+write throughput with and without the SQLite storage
+# profile. Each profile gets a fresh database file; writer threads POST
+# batches to /metrics while reader threads page /history, all through the
+# Flask test client, for a fixed duration. From the repository root:
+#
+#     python -m benchmarks.sqlite_profile --duration 10 --writers 2 --readers 4
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from application.common.util import utc_now
+from application.main import App
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime as dt
+
+    from flask.testing import FlaskClient
+
+PROFILES: dict[str, dict[str, Any]] = {
+    # SQLite defaults: rollback journal, synchronous=FULL, small page cache
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def build_app(path: Path, pragmas: dict[str, Any]) -> App:
+    return App(
+        overrides={
+            "flask": {"DEBUG": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"},
+            "server": {"console_echo": False},
+            "storage": {"sqlite": pragmas},
+        },
+    )
+
+
+def snapshots(origin: str, n: int, seq: int) -> bytes:
+    now: dt = utc_now()
+    return json.dumps(
+        [
+            {
+                "origin": origin,
+                "timestamp": (now + timedelta(microseconds=seq * n + i)).isoformat(),
+                "metrics": [
+                    {"name": "CPU Usage", "value": (seq + i) % 100, "unit": "%"},
+                    {"name": "RAM Usage", "value": 4096.0 + i, "unit": "MB"},
+                ],
+            }
+            for i in range(n)
+        ],
+    ).encode()
+
+
+def run_profile(name: str, pragmas: dict[str, Any], args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        app: App = build_app(Path(tmp) / "bench.sqlite3", pragmas)
+        logging.disable(logging.CRITICAL)
+
+        seed: FlaskClient = app.test_client()
+        for seq in range(args.seed // args.batch):
+            seed.post(
+                "/metrics",
+                data=snapshots("seed", args.batch, seq),
+                content_type="application/json",
+            )
+
+        stop: threading.Event = threading.Event()
+        counts: dict[str, list[int]] = {"writes": [], "reads": [], "errors": []}
+        lock: threading.Lock = threading.Lock()
+
+        def worker(kind: str, action: Callable[[FlaskClient, int], int]) -> None:
+            client: FlaskClient = app.test_client()
+            ok: int = 0
+            errors: int = 0
+            seq: int = 0
+            while not stop.is_set():
+                try:
+                    status: int = action(client, seq)
+                except Exception:  # noqa: BLE001
+                    status = 500
+                if status < 400:  # noqa: PLR2004
+                    ok += 1
+                else:
+                    errors += 1
+                seq += 1
+            with lock:
+                counts[kind].append(ok)
+                counts["errors"].append(errors)
+
+        def write(client: FlaskClient, seq: int) -> int:
+            return client.post(
+                "/metrics",
+                data=snapshots(threading.current_thread().name, args.batch, seq),
+                content_type="application/json",
+            ).status_code
+
+        def read(client: FlaskClient, _seq: int) -> int:
+            return client.get("/history?limit=50").status_code
+
+        threads: list[threading.Thread] = [
+            threading.Thread(target=worker, args=("writes", write), name=f"w{i}")
+            for i in range(args.writers)
+        ] + [
+            threading.Thread(target=worker, args=("reads", read), name=f"r{i}")
+            for i in range(args.readers)
+        ]
+
+        start: float = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed: float = time.perf_counter() - start
+
+        app.db.reader.dispose()
+        app.db.writer.dispose()
+        logging.disable(logging.NOTSET)
+
+    return {
+        "profile": name,
+        "seconds": round(elapsed, 2),
+        "write_batches_per_s": round(sum(counts["writes"]) / elapsed, 1),
+        "snapshots_per_s": round(sum(counts["writes"]) * args.batch / elapsed, 1),
+        "reads_per_s": round(sum(counts["reads"]) / elapsed, 1),
+        "errors": sum(counts["errors"]),
+    }
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Concurrent read+write throughput per SQLite profile.",
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=5000)
+    parser.add_argument("--profile", choices=tuple(PROFILES), action="append")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args: argparse.Namespace = parser.parse_args()
+
+    results: list[dict] = [
+        run_profile(name, PROFILES[name], args) for name in args.profile or PROFILES
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'profile':<10}{'batches/s':>12}{'snapshots/s':>14}"
+        f"{'reads/s':>10}{'errors':>8}",
+    )
+    for r in results:
+        print(
+            f"{r['profile']:<10}{r['write_batches_per_s']:>12}"
+            f"{r['snapshots_per_s']:>14}{r['reads_per_s']:>10}{r['errors']:>8}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# Latency and throughput of the ingest, latest and history paths. Builds a
+# synthetic fleet in a temporary SQLite database, then drives each scenario
+# through the Flask test client and reports p50/p99 latency, requests/s and
+# the process's peak RSS while the scenario ran. From the repository root:
+#
+#     python -m benchmarks.suite --devices 20 --metrics 8 --days 2 \
+#         --output before.json
+#     python -m benchmarks.suite --devices 20 --metrics 8 --days 2 \
+#         --compare before.json
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, Self
+
+import psutil
+
+from application.common.util import encode_cursor, utc_now
+from benchmarks.fleet import Fleet, build_app
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime as dt
+    from types import TracebackType
+
+    from flask.testing import FlaskClient
+
+    from application.common._types import JSON
+    from application.main import App
+
+    type Action = Callable[[FlaskClient, int], int]
+
+BYTES_PER_MB: Final[float] = 1_000_000.0
+RSS_SAMPLE_INTERVAL: Final[float] = 0.005
+
+
+class RssSampler:
+    # psutil has no per-interval peak, so a thread samples RSS while the
+    # scenario runs; short spikes between samples can be missed
+    peak: int
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._process: psutil.Process = psutil.Process()
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run,
+            name="rss-sampler",
+            daemon=True,
+        )
+
+    def __enter__(self) -> Self:
+        self.peak = self._process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+def scenarios(fleet: Fleet, args: argparse.Namespace, mid: dt) -> dict[str, Action]:
+    now: dt = utc_now()
+    mid_cursor: str = encode_cursor(mid, 0)
+
+    def ingest(client: FlaskClient, seq: int) -> int:
+        return client.post(
+            "/metrics",
+            data=fleet.payload(args.batch, now, seq),
+            content_type="application/json",
+        ).status_code
+
+    def latest(client: FlaskClient, _seq: int) -> int:
+        return client.get("/latest").status_code
+
+    def history(client: FlaskClient, _seq: int) -> int:
+        return client.get("/history", query_string={"limit": args.page}).status_code
+
+    def history_origin(client: FlaskClient, seq: int) -> int:
+        return client.get(
+            "/history",
+            query_string={
+                "limit": args.page,
+                "origin": fleet.origins[seq % fleet.devices],
+            },
+        ).status_code
+
+    def history_deep(client: FlaskClient, _seq: int) -> int:
+        return client.get(
+            "/history",
+            query_string={"limit": args.page, "before": mid_cursor},
+        ).status_code
+
+    return {
+        "ingest": ingest,
+        "latest": latest,
+        "history": history,
+        "history_origin": history_origin,
+        "history_deep": history_deep,
+    }
+
+
+def run_scenario(app: App, name: str, action: Action, args: argparse.Namespace) -> JSON:
+    for seq in range(args.warmup):
+        action(app.test_client(), -1 - seq)
+
+    per_thread: int = max(args.requests // args.threads, 1)
+    latencies: list[float] = []
+    errors: list[int] = []
+
+    def worker(offset: int) -> None:
+        client: FlaskClient = app.test_client()
+        own: list[float] = []
+        failed: int = 0
+        for i in range(per_thread):
+            start: float = time.perf_counter()
+            status: int = action(client, offset + i)
+            own.append(time.perf_counter() - start)
+            if status >= 400:  # noqa: PLR2004
+                failed += 1
+        latencies.extend(own)
+        errors.append(failed)
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=worker, args=(t * per_thread,), name=f"{name}-{t}")
+        for t in range(args.threads)
+    ]
+
+    with RssSampler() as rss:
+        start: float = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed: float = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "peak_rss_mb": round(rss.peak / BYTES_PER_MB, 1),
+    }
+
+
+def run(args: argparse.Namespace) -> JSON:
+    fleet: Fleet = Fleet(args.devices, args.metrics, args.days, args.interval)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logging.disable(logging.CRITICAL)
+        app: App = build_app(Path(tmp) / "bench.sqlite3")
+
+        end: dt = utc_now()
+        seed_start: float = time.perf_counter()
+        seeded: int = fleet.seed_into(app, end)
+        seed_seconds: float = time.perf_counter() - seed_start
+        # The latest cache is warmed at startup, before the seed went in
+        app.db.sync_latest()
+
+        # Cursor for a page halfway back through the history
+        mid: dt = end - timedelta(days=fleet.days / 2)
+        actions: dict[str, Action] = scenarios(fleet, args, mid)
+
+        results: list[JSON] = [
+            run_scenario(app, name, actions[name], args)
+            for name in args.scenario or actions
+        ]
+
+        app.db.reader.dispose()
+        app.db.writer.dispose()
+        logging.disable(logging.NOTSET)
+
+    return {
+        "meta": {
+            "timestamp": end.isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "params": {
+            "devices": fleet.devices,
+            "metrics": fleet.metrics,
+            "days": fleet.days,
+            "interval": fleet.interval,
+            "batch": args.batch,
+            "page": args.page,
+            "requests": args.requests,
+            "threads": args.threads,
+        },
+        "seed": {"snapshots": seeded, "seconds": round(seed_seconds, 2)},
+        "results": results,
+    }
+
+
+def compare(current: JSON, baseline: JSON) -> list[JSON]:
+    before: dict[str, JSON] = {r["scenario"]: r for r in baseline["results"]}
+    rows: list[JSON] = []
+
+    for result in current["results"]:
+        old: JSON | None = before.get(result["scenario"])
+        if old is None:
+            continue
+        rows.append(
+            {
+                "scenario": result["scenario"],
+                **{
+                    key: _change(old[key], result[key])
+                    for key in ("requests_per_s", "p50_ms", "p99_ms", "peak_rss_mb")
+                },
+            },
+        )
+
+    return rows
+
+
+def print_table(report: JSON, changes: list[JSON] | None) -> None:
+    print(
+        f"{report['seed']['snapshots']} snapshots seeded "
+        f"in {report['seed']['seconds']}s",
+    )
+    print(
+        f"{'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+        f"{'peak RSS MB':>13}{'errors':>8}",
+    )
+    for r in report["results"]:
+        print(
+            f"{r['scenario']:<16}{r['requests_per_s']:>10}{r['p50_ms']:>10}"
+            f"{r['p99_ms']:>10}{r['peak_rss_mb']:>13}{r['errors']:>8}",
+        )
+
+    if changes:
+        print("\nChange vs baseline (%)")
+        for c in changes:
+            print(
+                f"{c['scenario']:<16}{c['requests_per_s']:>+10.1f}"
+                f"{c['p50_ms']:>+10.1f}{c['p99_ms']:>+10.1f}"
+                f"{c['peak_rss_mb']:>+13.1f}",
+            )
+
+
+def main() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Latency, throughput and memory of the ingest and read paths.",
+    )
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--metrics", type=int, default=5, help="per snapshot")
+    parser.add_argument("--days", type=float, default=1.0, help="of history")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=50, help="snapshots per POST")
+    parser.add_argument("--page", type=int, default=50, help="history page size")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=("ingest", "latest", "history", "history_origin", "history_deep"),
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON report")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args: argparse.Namespace = parser.parse_args()
+
+    report: JSON = run(args)
+
+    changes: list[JSON] | None = None
+    if args.compare is not None:
+        with Path.open(args.compare, encoding="utf-8") as file:
+            changes = compare(report, json.load(file))
+        report["compare"] = {"baseline": str(args.compare), "change_pct": changes}
+
+    if args.output is not None:
+        with Path.open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(report, changes)
+
+    return 1 if any(r["errors"] for r in report["results"]) else 0
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    # Nearest-rank, which keeps p99 an observed latency
+    index: int = max(int(len(sorted_values) * q + 0.5) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _change(old: float, new: float) -> float:
+    return round((new - old) / old * 100, 1) if old else 0.0
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
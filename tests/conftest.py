@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from application.main import App
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from pathlib import Path
+
+
+# Fresh apps, each on its own SQLite file; `overrides` as for App(), per section
+@pytest.fixture
+def make_app(tmp_path: Path) -> Iterator[Callable[..., App]]:
+    apps: list[App] = []
+
+    def make(overrides: dict[str, Any] | None = None) -> App:
+        db: Path = tmp_path / f"db{len(apps)}.sqlite3"
+        cfg: dict[str, Any] = {
+            "flask": {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db}",
+            },
+            "server": {"console_echo": False},
+            "archive": {"path": str(tmp_path / "archive"), "chunk_pause": 0},
+        }
+        for section, values in (overrides or {}).items():
+            cfg.setdefault(section, {}).update(values)
+
+        app: App = App(cfg)
+        apps.append(app)
+        return app
+
+    yield make
+
+    for app in apps:
+        if app.db.retention is not None:
+            app.db.retention.close()
+        app.db.reader.dispose()
+        app.db.writer.dispose()
+
+
+@pytest.fixture
+def app(make_app: Callable[..., App]) -> App:
+    return make_app()
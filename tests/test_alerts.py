@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime as dt
+    from pathlib import Path
+
+    from application.alerts import AlertFeed
+    from application.main import App
+
+RULE: dict[str, Any] = {
+    "name": "cpu-high",
+    "metric": "CPU Usage",
+    "op": ">",
+    "threshold": 90,
+    "for": 2,
+}
+
+
+def _ingest(app: App, values: list[float]) -> None:
+    now: dt = utc_now()
+    app.db.add_snapshots(
+        [
+            {
+                "origin": f"host-{i % 2}",
+                "timestamp": (now + timedelta(seconds=i // 2)).isoformat(),
+                "metrics": [{"name": "CPU Usage", "value": value, "unit": "%"}],
+            }
+            for i, value in enumerate(values)
+        ],
+    )
+
+
+# The parent evaluates what two workers (sharing one database) commit, and
+# the workers serve what it publishes, each alert once
+def test_parent_evaluates_rows_from_all_workers(
+    make_app: Callable[..., App],
+    tmp_path: Path,
+) -> None:
+    overrides: dict[str, Any] = {
+        "flask": {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'shared.db'}"},
+        "alerts": {
+            "rules": [RULE],
+            "feed": {"interval": 3600, "path": str(tmp_path / "alerts.json")},
+        },
+    }
+    parent: App = make_app(overrides)
+    workers: list[App] = [make_app(overrides), make_app(overrides)]
+
+    parent.before_fork(workers=2)
+    feed: AlertFeed | None = parent.alert_feed
+    assert feed is not None
+    for worker in workers:
+        worker.alerts.follow(feed.path)
+
+    _ingest(workers[0], [95.0, 50.0])
+    _ingest(workers[1], [96.0, 50.0])
+    assert workers[0].alerts.to_json()["active"] == []
+
+    # Rows are read one poll behind the newest id
+    assert feed.poll_once() == 0
+    assert feed.poll_once() == 4
+
+    for worker in workers:
+        alerts: dict = worker.test_client().get("/api/alerts").get_json()
+        assert [(a["rule"], a["origin"]) for a in alerts["active"]] == [
+            ("cpu-high", "host-0"),
+        ]
+        assert [e["status"] for e in alerts["recent"]] == ["firing"]
+
+    feed.close()
+
+
+def test_single_process_evaluates_on_ingest(make_app: Callable[..., App]) -> None:
+    app: App = make_app({"alerts": {"rules": [RULE]}})
+
+    _ingest(app, [95.0, 50.0, 96.0, 50.0])
+
+    assert app.alert_feed is None
+    assert [a["origin"] for a in app.alerts.to_json()["active"]] == ["host-0"]
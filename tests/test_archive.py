@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime as dt
+from datetime import timedelta
+from datetime import timezone as tz
+from typing import TYPE_CHECKING
+
+from sqlalchemy import func, select
+
+from application.archive import Archiver
+from application.models import MetricSnapshot
+
+if TYPE_CHECKING:
+    from application.main import App
+
+DAY: dt = dt(2025, 1, 10, tzinfo=tz.utc)
+NOW: dt = DAY + timedelta(days=30)
+
+
+def _archiver(app: App) -> Archiver:
+    assert app.db.archive is not None
+    return Archiver(app.db.storage, app.db.archive, app.logger, app.config["ARCHIVE"])
+
+
+def _snapshot(app: App, at: dt, values: list[float]) -> None:
+    app.db.add_snapshot(
+        {
+            "origin": "host",
+            "timestamp": at.isoformat(),
+            "metrics": [{"name": "CPU Usage", "value": v, "unit": "%"} for v in values],
+        },
+    )
+
+
+def _snapshots(app: App) -> int:
+    with app.db.reader.connect() as conn:
+        return conn.execute(select(func.count(MetricSnapshot.id))).scalar_one()
+
+
+def test_archives_day_and_serves_it_from_segments(app: App) -> None:
+    for i in range(5):
+        _snapshot(app, DAY + timedelta(minutes=i), [float(i)])
+    before = app.db.series("host", "CPU Usage", DAY, DAY + timedelta(days=1))
+
+    assert _archiver(app).run_once(NOW) == 5
+    assert _snapshots(app) == 0
+
+    after = app.db.series("host", "CPU Usage", DAY, DAY + timedelta(days=1))
+    assert after.timestamps == before.timestamps
+    assert after.values == before.values
+
+
+def test_metricless_last_snapshot_is_deleted_and_run_ends(app: App) -> None:
+    _snapshot(app, DAY + timedelta(hours=1), [1.0])
+    _snapshot(app, DAY + timedelta(hours=2), [2.0])
+    _snapshot(app, DAY + timedelta(hours=3), [])
+
+    stop: threading.Event = threading.Event()
+    timer: threading.Timer = threading.Timer(10, stop.set)
+    timer.start()
+    try:
+        archived: int = _archiver(app).run_once(NOW, stop)
+    finally:
+        timer.cancel()
+
+    assert not stop.is_set()
+    assert archived == 2
+    assert _snapshots(app) == 0
+
+
+def test_run_stops_when_a_day_deletes_nothing(app: App) -> None:
+    _snapshot(app, DAY, [1.0])
+    archiver: Archiver = _archiver(app)
+    archiver._delete_day = lambda *_: 0  # type: ignore[method-assign]  # noqa: SLF001
+
+    assert archiver.run_once(NOW) == 1
+    assert _snapshots(app) == 1
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+from unittest import mock
+
+import pytest
+import requests
+
+from application.collector.agent import CollectorConfig
+from application.collector.commands import CommandPoller
+
+if TYPE_CHECKING:
+    from application.main import App
+
+
+@pytest.mark.parametrize("timeout", ["nan", "inf", "-inf"])
+def test_poll_rejects_non_finite_timeout(app: App, timeout: str) -> None:
+    response = app.test_client().get(f"/commands/host?timeout={timeout}")
+
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "timeout must be finite"
+
+
+def test_poll_returns_after_timeout(app: App) -> None:
+    response = app.test_client().get("/commands/host?timeout=0")
+
+    assert response.status_code == 200
+    assert response.get_json()["commands"] == []
+
+
+# Stands in for the poller's stop event: records the first backoff and stops
+class StopAfterOne:
+    def __init__(self) -> None:
+        self.delays: list[float] = []
+
+    def is_set(self) -> bool:
+        return bool(self.delays)
+
+    def wait(self, delay: float) -> bool:
+        self.delays.append(delay)
+        return True
+
+
+def _turned_away(retry_after: str | None) -> requests.Response:
+    response: requests.Response = requests.Response()
+    response.status_code = 503
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+@pytest.mark.parametrize(
+    ("retry_after", "low", "high"),
+    [("30", 30.0, 45.0), (None, 1.0, 2.0)],
+)
+def test_poller_honours_retry_after(
+    retry_after: str | None,
+    low: float,
+    high: float,
+) -> None:
+    poller: CommandPoller = CommandPoller(
+        CollectorConfig(url="http://server/metrics", origin="host"),
+        logging.getLogger(__name__),
+        {},
+    )
+    stop: StopAfterOne = StopAfterOne()
+    poller._stop = stop  # noqa: SLF001
+    with mock.patch.object(
+        poller.session,
+        "get",
+        return_value=_turned_away(retry_after),
+    ):
+        poller._run()  # noqa: SLF001
+
+    assert len(stop.delays) == 1
+    assert low <= stop.delays[0] <= high
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from application.instrumentation import QUERY_START_KEY, Instrumentation
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.engine import Engine
+
+
+# A statement that raises gets no after_cursor_execute; the next one on the
+# same pooled connection must still be timed from its own start
+def test_failed_statement_leaves_no_start_behind(tmp_path: Path) -> None:
+    instruments: Instrumentation = Instrumentation(tmp_path)
+    engine: Engine = create_engine("sqlite://", poolclass=StaticPool)
+    instruments.instrument_engine(engine, "test")
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("SELECT * FROM missing")
+        time.sleep(0.05)
+        conn.exec_driver_sql("SELECT 1")
+
+        assert QUERY_START_KEY not in conn.info
+
+    text: str = instruments.render()
+    assert 'cotc_db_query_duration_seconds_count{engine="test"' in text
+    sums: list[float] = [
+        float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line.startswith("cotc_db_query_duration_seconds_sum")
+    ]
+    assert sums
+    assert sum(sums) < 0.05
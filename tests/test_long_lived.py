@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from application.main import App
+
+
+@pytest.mark.parametrize(
+    ("threads", "streams"),
+    [(2, 1), (4, 1), (8, 2), (16, 4)],
+)
+def test_streams_keep_most_threads_free(
+    make_app: Callable[..., App],
+    threads: int,
+    streams: int,
+) -> None:
+    app: App = make_app({"server": {"threads": threads}})
+
+    assert app.stream.max_clients == streams
+    assert app.stream.max_clients < threads
+
+
+# Parked polls run on threads of their own, however few `threads` there are
+@pytest.mark.parametrize("threads", [2, 8])
+def test_parked_polls_get_their_own_threads(
+    make_app: Callable[..., App],
+    threads: int,
+) -> None:
+    app: App = make_app({"server": {"threads": threads, "poll_threads": 100}})
+
+    assert app.commands.max_waiters == 100
+    assert app.server_threads() == threads + 100
+
+
+def test_gevent_workers_keep_configured_limits(make_app: Callable[..., App]) -> None:
+    app: App = make_app({"server": {"threads": 2, "worker_class": "gevent"}})
+
+    assert app.stream.max_clients == app.config["STREAM"]["max_clients"]
+    assert app.commands.max_waiters == app.config["COMMANDS"]["max_waiters"]
+    assert app.server_threads() == 2
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from application import migrations
+from application.migrations import run_migrations
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from sqlalchemy.engine import Connection, Engine
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def legacy(tmp_path: Path) -> Iterator[Engine]:
+    engine: Engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE metric_snapshot "
+            "(id INTEGER PRIMARY KEY, origin VARCHAR, timestamp DATETIME)",
+        )
+        conn.exec_driver_sql(
+            "CREATE TABLE metric (id INTEGER PRIMARY KEY, name VARCHAR, "
+            "value FLOAT, unit VARCHAR, snapshot_id INTEGER)",
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_origin ON metric_snapshot (origin)")
+        conn.exec_driver_sql(
+            "INSERT INTO metric_snapshot VALUES "
+            "(1, 'host-a', '2024-01-01T00:00:00+00:00')",
+        )
+        conn.exec_driver_sql("INSERT INTO metric VALUES (1, 'cpu', 0.5, '%', 1)")
+    yield engine
+    engine.dispose()
+
+
+def _tables(engine: Engine) -> set[str]:
+    return set(inspect(engine).get_table_names())
+
+
+def _version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar_one()
+
+
+def test_migrations_convert_a_legacy_database_once(legacy: Engine) -> None:
+    assert run_migrations(legacy, LOGGER) == [
+        "normalize_timestamps",
+        "normalize_dimensions",
+    ]
+    assert {"device", "metric_definition"} <= _tables(legacy)
+    assert _version(legacy) == len(migrations.MIGRATIONS)
+
+    assert run_migrations(legacy, LOGGER) == []
+
+
+def test_failed_step_leaves_schema_and_version_untouched(
+    legacy: Engine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def broken(conn: Connection) -> bool:
+        conn.exec_driver_sql('ALTER TABLE "metric" RENAME TO "_legacy_metric"')
+        conn.exec_driver_sql("DROP INDEX ix_origin")
+        err_msg: str = "step failed"
+        raise RuntimeError(err_msg)
+
+    monkeypatch.setattr(
+        migrations,
+        "MIGRATIONS",
+        (migrations.normalize_timestamps, broken),
+    )
+
+    with pytest.raises(RuntimeError, match="step failed"):
+        run_migrations(legacy, LOGGER)
+
+    # The first step committed on its own; the broken one left nothing
+    assert _version(legacy) == 1
+    assert _tables(legacy) == {"metric", "metric_snapshot"}
+    assert [i["name"] for i in inspect(legacy).get_indexes("metric_snapshot")] == [
+        "ix_origin",
+    ]
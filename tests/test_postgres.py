@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+from application.common.util import as_utc, utc_now
+from application.retention import RetentionJob
+from application.storage import PostgresBackend
+from application.storage.postgres import _add_months, _month_start
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from datetime import datetime as dt
+
+    from sqlalchemy.engine import URL, Engine
+
+    from application.main import App
+    from application.series import Series
+
+# Runs against the PostgreSQL database in DATABASE_URL, each test in a
+# schema of its own (dropped afterwards); skipped without one
+DATABASE_URL: str | None = os.environ.get("DATABASE_URL")
+if not DATABASE_URL:
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+pytest.importorskip("psycopg")
+
+PG_URL: URL = make_url(DATABASE_URL).set(drivername="postgresql+psycopg")
+
+
+@pytest.fixture
+def pg_app(make_app: Callable[..., App]) -> Iterator[App]:
+    schema: str = f"cotc_test_{uuid4().hex[:12]}"
+    admin: Engine = create_engine(PG_URL)
+    with admin.begin() as conn:
+        conn.exec_driver_sql(f'CREATE SCHEMA "{schema}"')
+
+    url: URL = PG_URL.update_query_dict({"options": f"-csearch_path={schema}"})
+    app: App = make_app(
+        {
+            "flask": {
+                "SQLALCHEMY_DATABASE_URI": url.render_as_string(hide_password=False),
+            },
+            "retention": {"enabled": False},
+        },
+    )
+    yield app
+
+    app.db.reader.dispose()
+    app.db.writer.dispose()
+    with admin.begin() as conn:
+        conn.exec_driver_sql(f'DROP SCHEMA "{schema}" CASCADE')
+    admin.dispose()
+
+
+def _ingest(app: App, origin: str, points: list[tuple[dt, float]]) -> None:
+    body, status = app.db.add_snapshots(
+        [
+            {
+                "origin": origin,
+                "timestamp": at.isoformat(),
+                "metrics": [{"name": "CPU Usage", "value": value, "unit": "%"}],
+            }
+            for at, value in points
+        ],
+    )
+    assert status == 200, body  # noqa: PLR2004
+
+
+def _partitions(app: App) -> set[str]:
+    with app.db.reader.connect() as conn:
+        return set(
+            conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = 'metric_snapshot'::regclass",
+                ),
+            ).scalars(),
+        )
+
+
+def _timestamps(app: App) -> list[dt]:
+    with app.db.reader.connect() as conn:
+        return [
+            as_utc(ts)
+            for ts in conn.execute(
+                text("SELECT timestamp FROM metric_snapshot ORDER BY id"),
+            ).scalars()
+        ]
+
+
+def test_ingest_and_latest(pg_app: App) -> None:
+    now: dt = utc_now()
+    _ingest(pg_app, "host-a", [(now - timedelta(minutes=1), 10.0), (now, 20.0)])
+    _ingest(pg_app, "host-b", [(now, 30.0)])
+
+    assert isinstance(pg_app.db.storage, PostgresBackend)
+    latest: dict[str, Any] = {
+        row.origin: (row.timestamp, [m.value for m in row.metrics])
+        for row in pg_app.db.newest()
+    }
+    assert latest == {"host-a": (now, [20.0]), "host-b": (now, [30.0])}
+
+
+def test_range_raw_and_rolled_up(pg_app: App) -> None:
+    hour: dt = utc_now().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2,
+    )
+    _ingest(
+        pg_app,
+        "host",
+        [(hour + timedelta(minutes=i), float(i)) for i in range(10)],
+    )
+
+    raw: Series = pg_app.db.series("host", "CPU Usage", hour, hour + timedelta(hours=1))
+    assert raw.timestamps.tolist() == [
+        int((hour + timedelta(minutes=i)).timestamp() * 1000) for i in range(10)
+    ]
+    assert raw.values.tolist() == [float(i) for i in range(10)]
+
+    hourly: Series = pg_app.db.series(
+        "host",
+        "CPU Usage",
+        hour,
+        hour + timedelta(hours=1),
+        step=3600,
+    )
+    assert hourly.resolution == 3600  # noqa: PLR2004
+    assert hourly.timestamps.tolist() == [int(hour.timestamp() * 1000)]
+    assert hourly.values.tolist() == pytest.approx([4.5])
+
+
+def test_retention_purges_aged_rows(pg_app: App) -> None:
+    now: dt = utc_now()
+    _ingest(pg_app, "host", [(now - timedelta(days=40), 1.0), (now, 2.0)])
+
+    result: dict[str, Any] = RetentionJob(
+        pg_app.db.storage,
+        pg_app.logger,
+        {"raw_days": 30, "chunk_pause": 0},
+    ).run_once()
+
+    assert result["rows_purged"] >= 1
+    assert _timestamps(pg_app) == [now]
+
+
+def test_partitions_created_ahead_and_on_write(pg_app: App) -> None:
+    storage: PostgresBackend = pg_app.db.storage
+    month: dt = _month_start(utc_now())
+    ahead: set[str] = {
+        f"metric_snapshot_p{_add_months(month, n):%Y%m}"
+        for n in range(storage.months_ahead + 1)
+    }
+    assert ahead <= _partitions(pg_app)
+
+    later: dt = _add_months(month, storage.months_ahead + 3)
+    _ingest(pg_app, "host", [(later, 1.0)])
+
+    assert f"metric_snapshot_p{later:%Y%m}" in _partitions(pg_app)
+    assert _timestamps(pg_app) == [later]
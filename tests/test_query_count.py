@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import datetime as dt
+from datetime import timedelta
+from datetime import timezone as tz
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from application.main import App
+
+START: dt = dt(2025, 1, 1, tzinfo=tz.utc)
+
+
+def _history_queries(make_app: Callable[..., App], n: int) -> int:
+    # Render caches off, so every request renders from the database
+    app: App = make_app(
+        {
+            "flask": {"DEBUG": True},
+            "render_cache": {"max_pages": 0, "max_fragments": 0},
+        },
+    )
+    app.db.add_snapshots(
+        [
+            {
+                "origin": f"host-{i % 3}",
+                "timestamp": (START + timedelta(seconds=i)).isoformat(),
+                "metrics": [
+                    {"name": "CPU Usage", "value": float(i), "unit": "%"},
+                    {"name": "RAM Usage", "value": float(i), "unit": "%"},
+                ],
+            }
+            for i in range(n)
+        ],
+    )
+
+    response = app.test_client().get("/history?limit=100")
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count("CPU Usage") >= n
+    return int(response.headers["X-Query-Count"])
+
+
+def test_history_queries_do_not_grow_with_rows(make_app: Callable[..., App]) -> None:
+    assert _history_queries(make_app, 1) == _history_queries(make_app, 50)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from sqlalchemy import delete, select
+
+from application.common.util import utc_now
+from application.models import Metric, MetricSnapshot
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+
+    from application.main import App
+
+
+def _ingest(app: App, origin: str, at: dt) -> int:
+    app.db.add_snapshot(
+        {
+            "origin": origin,
+            "timestamp": at.isoformat(),
+            "metrics": [{"name": "CPU Usage", "value": 1.0, "unit": "%"}],
+        },
+    )
+    with app.db.reader.connect() as conn:
+        return conn.execute(select(MetricSnapshot.id)).scalar_one()
+
+
+# Once the table is emptied SQLite hands out the same id again
+def test_history_row_of_a_reused_id_is_rendered_afresh(app: App) -> None:
+    now: dt = utc_now()
+    first: int = _ingest(app, "old-host", now - timedelta(minutes=1))
+    assert "old-host" in app.test_client().get("/history").text
+
+    with app.db.writer.begin() as conn:
+        conn.execute(delete(Metric))
+        conn.execute(delete(MetricSnapshot))
+    assert _ingest(app, "new-host", now) == first
+
+    body: str = app.test_client().get("/history").text
+    assert "new-host" in body
+    assert "old-host" not in body
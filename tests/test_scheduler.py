@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, ClassVar
+
+import pytest
+
+from application.collector.scheduler import SourceScheduler
+from application.collector.sources import Source
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from application.common._types import JSON
+
+LOGGER: logging.Logger = logging.getLogger("test-scheduler")
+
+
+class StubSource(Source):
+    kind: ClassVar[str] = "stub"
+
+    def __init__(
+        self,
+        origin: str,
+        poll: Callable[[], Awaitable[list[JSON]]],
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        super().__init__(origin, **kwargs)
+        self._poll = poll
+
+    async def poll(self) -> list[JSON]:
+        return await self._poll()
+
+
+async def _reading() -> list[JSON]:
+    return [{"name": "CPU Usage", "value": 1.0, "unit": "%"}]
+
+
+async def _hang() -> list[JSON]:
+    await asyncio.sleep(3600)
+    return []
+
+
+async def _fail() -> list[JSON]:
+    raise RuntimeError("source down")
+
+
+def _run(scheduler: SourceScheduler, seconds: float) -> None:
+    async def main() -> None:
+        asyncio.get_running_loop().call_later(seconds, scheduler.stop)
+        await scheduler.run()
+
+    asyncio.run(main())
+
+
+def _scheduler(sources: list[Source], emitted: list[JSON]) -> SourceScheduler:
+    return SourceScheduler(sources, emitted.append, LOGGER, flush_interval=0.01)
+
+
+def test_hung_source_does_not_block_others() -> None:
+    emitted: list[JSON] = []
+    fast: StubSource = StubSource("fast", _reading, interval=0.02)
+    hung: StubSource = StubSource("hung", _hang, interval=0.02, timeout=0.1)
+    scheduler: SourceScheduler = _scheduler([fast, hung], emitted)
+
+    _run(scheduler, 0.5)
+
+    assert sum(1 for e in emitted if e["origin"] == "fast") >= 10  # noqa: PLR2004
+    assert not any(e["origin"] == "hung" for e in emitted)
+    assert scheduler.stats[hung.name]["timeouts"] >= 1
+
+
+def test_polls_beyond_max_in_flight_are_skipped() -> None:
+    hung: StubSource = StubSource("hung", _hang, interval=0.02, timeout=60)
+    scheduler: SourceScheduler = _scheduler([hung], [])
+
+    _run(scheduler, 0.3)
+
+    assert scheduler.stats[hung.name]["polls"] == 1
+    assert scheduler.stats[hung.name]["skipped"] >= 5  # noqa: PLR2004
+
+
+def test_failing_source_backs_off() -> None:
+    failing: StubSource = StubSource("down", _fail, interval=0.01, max_backoff=10)
+    scheduler: SourceScheduler = _scheduler([failing], [])
+
+    _run(scheduler, 0.5)
+
+    # Without backoff this would be around 50 polls
+    assert 1 <= scheduler.stats[failing.name]["failures"] <= 8  # noqa: PLR2004
+
+
+def test_backoff_grows_and_is_capped() -> None:
+    source: StubSource = StubSource("down", _fail, interval=1.0, max_backoff=10.0)
+    scheduler: SourceScheduler = _scheduler([source], [])
+
+    scheduler._failures[source] = 2  # noqa: SLF001
+    assert 2.0 <= scheduler._backoff(source) <= 4.0  # noqa: SLF001, PLR2004
+    scheduler._failures[source] = 20  # noqa: SLF001
+    assert 5.0 <= scheduler._backoff(source) <= 10.0  # noqa: SLF001, PLR2004
+
+
+def test_merge_combines_distinct_metrics_into_one_snapshot() -> None:
+    emitted: list[JSON] = []
+    scheduler: SourceScheduler = _scheduler([], emitted)
+
+    scheduler.merge("host", [{"name": "CPU Usage", "value": 1.0, "unit": "%"}])
+    scheduler.merge("host", [{"name": "RAM Usage", "value": 2.0, "unit": "%"}])
+    scheduler.flush()
+
+    assert len(emitted) == 1
+    assert {m["name"]: m["value"] for m in emitted[0]["metrics"]} == {
+        "CPU Usage": 1.0,
+        "RAM Usage": 2.0,
+    }
+
+
+def test_merge_flushes_before_a_duplicate_metric_key() -> None:
+    emitted: list[JSON] = []
+    scheduler: SourceScheduler = _scheduler([], emitted)
+
+    scheduler.merge("host", [{"name": "CPU Usage", "value": 1.0, "unit": "%"}])
+    scheduler.merge("host", [{"name": "CPU Usage", "value": 2.0, "unit": "%"}])
+    assert [m["value"] for m in emitted[0]["metrics"]] == [1.0]
+
+    scheduler.flush()
+    assert [[m["value"] for m in e["metrics"]] for e in emitted] == [[1.0], [2.0]]
+
+
+@pytest.mark.parametrize("origin", ["a", "b"])
+def test_flush_one_origin_leaves_the_others(origin: str) -> None:
+    emitted: list[JSON] = []
+    scheduler: SourceScheduler = _scheduler([], emitted)
+
+    for o in ("a", "b"):
+        scheduler.merge(o, [{"name": "CPU Usage", "value": 1.0, "unit": "%"}])
+    scheduler.flush(origin)
+
+    assert [e["origin"] for e in emitted] == [origin]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import pytest
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from datetime import datetime as dt
+
+    from application.main import App
+
+
+@pytest.fixture
+def app_with_data(app: App) -> App:
+    now: dt = utc_now()
+    app.db.add_snapshot(
+        {
+            "origin": "host",
+            "timestamp": (now - timedelta(minutes=1)).isoformat(),
+            "metrics": [{"name": "CPU Usage", "value": 1.0, "unit": "%"}],
+        },
+    )
+    return app
+
+
+@pytest.mark.parametrize("route", ["/api/series", "/api/stats"])
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"step": "99999999999999999999"},
+        {"step": "0"},
+        {"step": str(2 * 86400)},
+        {"from": "9999-12-31T23:59:59-05:00"},
+        {"to": "0001-01-01T00:00:00+00:00"},
+    ],
+)
+def test_out_of_range_arguments(
+    app_with_data: App,
+    route: str,
+    query: dict[str, str],
+) -> None:
+    if route == "/api/stats":
+        pytest.importorskip("numpy")
+
+    response = app_with_data.test_client().get(
+        route,
+        query_string={"origin": "host", "metric": "CPU Usage", **query},
+    )
+
+    assert response.status_code == 400
+
+
+def test_step_up_to_the_span(app_with_data: App) -> None:
+    series: dict = (
+        app_with_data.test_client()
+        .get(
+            "/api/series",
+            query_string={"origin": "host", "metric": "CPU Usage", "step": 86400},
+        )
+        .get_json()
+    )
+
+    assert series["values"] == [1.0]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from application import serve
+
+
+def test_serve_imports_nothing_from_the_app() -> None:
+    code: str = (
+        "import sys, application.serve; "
+        "print(sorted(m for m in sys.modules if m.startswith('application')))"
+    )
+    out: str = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+    assert out.strip() == "['application', 'application.serve']"
+
+
+def test_gevent_is_patched_before_the_app_is_imported(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    loaded: list[bool] = []
+
+    # Stops main() there, before it builds an app on the real database
+    def patch_gevent() -> None:
+        loaded.append("application.main" in sys.modules)
+        raise SystemExit(0)
+
+    monkeypatch.delitem(sys.modules, "application.main", raising=False)
+    monkeypatch.setattr(serve, "_patch_gevent", patch_gevent)
+
+    with pytest.raises(SystemExit):
+        serve.main(["--worker-class", "gevent"])
+    assert loaded == [False]
+
+
+def test_worker_class_falls_back_to_the_config_file() -> None:
+    assert serve._worker_class(serve.parse_args(["--worker-class", "gevent"])) == (
+        "gevent"
+    )
+    assert serve._worker_class(serve.parse_args([])) == "gthread"
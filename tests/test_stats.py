@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from datetime import datetime as dt
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import pytest
+
+from application.common.util import utc_now
+
+if TYPE_CHECKING:
+    from flask.testing import FlaskClient
+
+    from application.main import App
+
+pytest.importorskip("numpy")
+
+
+def _ingest(app: App, at: dt, value: float) -> None:
+    app.db.add_snapshot(
+        {
+            "origin": "host",
+            "timestamp": at.isoformat(),
+            "metrics": [{"name": "CPU Usage", "value": value, "unit": "%"}],
+        },
+    )
+
+
+def test_summary(app: App) -> None:
+    now: dt = utc_now()
+    for i in range(1, 101):
+        _ingest(app, now - timedelta(minutes=101 - i), float(i))
+
+    stats: dict = (
+        app.test_client().get("/api/stats?origin=host&metric=CPU Usage").get_json()
+    )
+
+    assert stats["count"] == 100
+    assert (stats["min"], stats["max"]) == (1.0, 100.0)
+    assert stats["percentiles"]["p50"] == pytest.approx(50.5)
+
+
+def test_open_ended_ranges_with_different_starts_are_cached_apart(app: App) -> None:
+    now: dt = utc_now()
+    _ingest(app, now - timedelta(hours=3), 10.0)
+    _ingest(app, now - timedelta(minutes=30), 20.0)
+    client: FlaskClient = app.test_client()
+
+    def count(start: dt) -> int:
+        query: dict[str, str] = {
+            "origin": "host",
+            "metric": "CPU Usage",
+            "from": start.isoformat(),
+        }
+        return client.get("/api/stats", query_string=query).get_json()["count"]
+
+    assert count(now - timedelta(hours=4)) == 2
+    assert count(now - timedelta(hours=1)) == 1
+    assert count(now - timedelta(hours=4)) == 2
+
+
+@pytest.mark.parametrize("window", ["nan", "inf", "-inf", "1e300", "0", "-5"])
+def test_window_out_of_range(app: App, window: str) -> None:
+    now: dt = utc_now()
+    _ingest(app, now - timedelta(minutes=2), 1.0)
+    _ingest(app, now - timedelta(minutes=1), 2.0)
+
+    response = app.test_client().get(
+        "/api/stats",
+        query_string={"origin": "host", "metric": "CPU Usage", "window": window},
+    )
+
+    assert response.status_code == 400
+    assert "window" in response.get_json()["message"]
+
+
+def test_window_up_to_the_span(app: App) -> None:
+    now: dt = utc_now()
+    _ingest(app, now - timedelta(minutes=2), 1.0)
+    _ingest(app, now - timedelta(minutes=1), 2.0)
+
+    stats: dict = (
+        app.test_client()
+        .get(
+            "/api/stats",
+            query_string={"origin": "host", "metric": "CPU Usage", "window": 86400},
+        )
+        .get_json()
+    )
+
+    assert stats["moving_average"]["last"] == pytest.approx(1.5)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from application.main import App
+
+SNAPSHOT: str = (
+    '[{"origin": "host", "timestamp": "%s", '
+    '"metrics": [{"name": "CPU Usage", "value": %s, "unit": "%%"}]}]'
+)
+
+
+@pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_values_are_rejected(app: App, value: str) -> None:
+    body: str = SNAPSHOT % ("2025-01-01T00:00:00Z", value)
+    response = app.test_client().post(
+        "/metrics", data=body, content_type="application/json"
+    )
+
+    assert response.status_code == 400
+    assert "value" in response.get_json()["results"][0]["errors"][0]
+
+
+def test_timestamp_out_of_range_is_rejected(app: App) -> None:
+    body: str = SNAPSHOT % ("9999-12-31T23:59:59-05:00", "1.0")
+    response = app.test_client().post(
+        "/metrics", data=body, content_type="application/json"
+    )
+
+    assert response.status_code == 400
+    assert "timestamp" in response.get_json()["results"][0]["errors"][0]
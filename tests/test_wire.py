@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from application.common import wire
+
+if TYPE_CHECKING:
+    from application.main import App
+
+
+def _payload(value: float = 1.0) -> bytearray:
+    return bytearray(
+        wire.encode(
+            [
+                {
+                    "origin": "host",
+                    "timestamp": "2025-01-01T00:00:00+00:00",
+                    "metrics": [{"name": "CPU Usage", "value": value, "unit": "%"}],
+                },
+            ],
+        ),
+    )
+
+
+def _with_micros(micros: int) -> bytes:
+    data: bytearray = _payload()
+    offset: int = len(data) - wire.METRIC.size - wire.SNAPSHOT.size
+    origin, _, n_metrics = wire.SNAPSHOT.unpack_from(data, offset)
+    wire.SNAPSHOT.pack_into(data, offset, origin, micros, n_metrics)
+    return bytes(data)
+
+
+def test_round_trip() -> None:
+    [(origin, timestamp, metrics)] = wire.decode(bytes(_payload(42.0)))
+
+    assert origin == "host"
+    assert timestamp.isoformat() == "2025-01-01T00:00:00+00:00"
+    assert metrics == [("CPU Usage", 42.0, "%")]
+
+
+@pytest.mark.parametrize("micros", [2**62, -(2**62)])
+def test_timestamp_out_of_range_is_malformed(micros: int) -> None:
+    with pytest.raises(ValueError, match="Malformed"):
+        wire.decode(_with_micros(micros))
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_value_is_rejected(value: float) -> None:
+    with pytest.raises(ValueError, match="Non-finite"):
+        wire.decode(bytes(_payload(value)))
+
+
+def test_malformed_compact_payload_is_a_bad_request(app: App) -> None:
+    response = app.test_client().post(
+        "/metrics",
+        data=_with_micros(2**62),
+        content_type=wire.COMPACT_CONTENT_TYPE,
+    )
+
+    assert response.status_code == 400